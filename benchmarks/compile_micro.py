@@ -0,0 +1,124 @@
+'''
+Microbenchmarks of the rule generators of HueBridge (compile path only, no network I/O).
+
+The private generators (__sceneRules, __rulesForMotion, __rulesForSwitch, __rulesForExternal,
+__rulesForWakeup and __updateReferences) are run over parameterized synthetic configurations
+against an in-memory bridge. For each generator and parameter value, time per call and
+allocations per call (via tracemalloc) are reported.
+
+Usage (from the repository root):
+    python -m benchmarks.compile_micro [--scenes 1,5,10,25,50] [--windows 1,5,10,20]
+        [--sensors 1,2,5,10] [--repeat 50] [--json results.json]
+'''
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+from hue import HueBridge
+from hue.ir import Condition
+from hue.memory_bridge import MemoryBridge
+from hue.transport import MemoryTransport
+
+from .synthetic_home import makeHome
+
+API_KEY = "benchmark"
+UNLIMITED = {"rules": 100000, "sensors": 100000, "scenes": 100000, "schedules": 100000, "resourcelinks": 100000}
+
+def makeBridge(scenes, windows, sensors):
+    """ Return HueBridge with a deployed single-room synthetic house and the room configuration """
+    data, configs = makeHome(1, scenes, windows, sensors)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        h = HueBridge("memory", API_KEY, transport=MemoryTransport(MemoryBridge(data, API_KEY, UNLIMITED)))
+        # deploy once, so all referenced sensors, scenes and schedules exist
+        for config, name in configs:
+            h.configure(config, name)
+    config = configs[0][0]
+    return h, {c["type"]: c for c in config}
+
+def measure(fn, reset, repeat):
+    """ Return (median time per call, allocated blocks per call, allocated bytes per call) """
+    times = []
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(repeat):
+            reset()
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        reset()
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        fn()
+        after = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+    blocks = 0
+    size = 0
+    for stat in after.compare_to(before, "filename"):
+        if stat.count_diff > 0:
+            blocks += stat.count_diff
+            size += stat.size_diff
+    times.sort()
+    return times[len(times) // 2], blocks, size
+
+def benchmarks(h, room):
+    """ Return dictionary of generator name to (function, reset) for a bridge and room configuration """
+    reset = h._HueBridge__prepare
+    switch = room["switch"]
+    external = room["external"]
+    sceneRef, sceneBinding = [(k, v) for k, v in external["bindings"].items() if "configs" in v][0]
+    state = {"group": external["group"], "state": external["state"], "stateUse": "primary"}
+    conditions = [Condition(address="/sensors/1/state/lastupdated", operator="dx")]
+    rules = []
+
+    def collectRules():
+        # generate fresh rules of the whole room as input for reference resolution
+        reset()
+        h.plan([room["state"], room["contact"], switch, external, room["motion"], room["wakeup"]], "benchmark")
+        rules[:] = h._HueBridge__rulesToCreate
+        reset()
+
+    return {
+        "sceneRules": (lambda: h._HueBridge__sceneRules(sceneBinding, external["name"], sceneRef, state, conditions, []), reset),
+        "rulesForMotion": (lambda: h._HueBridge__rulesForMotion(room["motion"]), reset),
+        "rulesForSwitch": (lambda: h._HueBridge__rulesForSwitch(switch), reset),
+        "rulesForExternal": (lambda: h._HueBridge__rulesForExternal(external), reset),
+        "rulesForWakeup": (lambda: h._HueBridge__rulesForWakeup(room["wakeup"]), reset),
+        "updateReferences": (lambda: h._HueBridge__updateReferences(rules), collectRules)
+    }
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Microbenchmarks of rule generators")
+    parser.add_argument("--scenes", default="1,5,10,25,50", help="scenes per configs list")
+    parser.add_argument("--windows", default="1,5,10,20", help="time windows per multi-scene config")
+    parser.add_argument("--sensors", default="1,2,5,10", help="motion sensors per group")
+    parser.add_argument("--repeat", type=int, default=50, help="calls per measurement")
+    parser.add_argument("--json", help="write results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    sweeps = []
+    for v in [int(x) for x in args.scenes.split(",")]:
+        sweeps.append(("scenes", v, {"scenes": v, "windows": 2, "sensors": 1}))
+    for v in [int(x) for x in args.windows.split(",")]:
+        sweeps.append(("windows", v, {"scenes": max(4, v), "windows": v, "sensors": 1}))
+    for v in [int(x) for x in args.sensors.split(",")]:
+        sweeps.append(("sensors", v, {"scenes": 4, "windows": 2, "sensors": v}))
+
+    results = []
+    print("{:18s} {:>8s} {:>6s} {:>12s} {:>10s} {:>12s}".format("generator", "param", "value", "time/call", "blocks", "bytes"))
+    for param, value, p in sweeps:
+        h, room = makeBridge(p["scenes"], p["windows"], p["sensors"])
+        for name, (fn, reset) in benchmarks(h, room).items():
+            t, blocks, size = measure(fn, reset, args.repeat)
+            results.append({"generator": name, "param": param, "value": value, "time": t, "blocks": blocks, "bytes": size})
+            print("{:18s} {:>8s} {:6d} {:10.1f}us {:10d} {:12d}".format(name, param, value, t * 1e6, blocks, size))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(json.dumps(results, indent=1))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
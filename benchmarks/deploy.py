@@ -0,0 +1,158 @@
+'''
+End-to-end deploy benchmark with synthetic houses.
+
+For each house size, a fake bridge (see hue.fake_server) is seeded with a synthetic house
+(see synthetic_home), all rooms are deployed and then deployed again (replacing the rules
+of the first deploy). Compile time, request count, bytes sent and wall-clock commit time
+are recorded and appended to a JSON history file. The results are compared with the
+previous run in the history to catch regressions.
+
+Usage (from the repository root):
+    python -m benchmarks.deploy [--rooms 1,5,10] [--scenes 4] [--windows 2] [--latency 0.005]
+        [--jitter 0.002] [--rate 100] [--memory] [--history benchmarks/history.json]
+        [--profile DIR [--profile-mode cprofile|sampling]] [--log-level ERROR]
+
+With --profile, phases of the first deploy are profiled and profile files are written
+per room and phase into DIR (see hue.profiling).
+'''
+import argparse
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+from hue import HueBridge
+from hue.fake_server import FakeBridgeServer
+from hue.memory_bridge import MemoryBridge
+from hue.profiling import Profiler
+from hue.transport import MemoryTransport
+
+from .synthetic_home import makeHome
+
+API_KEY = "benchmark"
+
+# relative increase of a metric compared to previous run reported as regression
+REGRESSION_THRESHOLD = 0.2
+
+def deploy(h, configs):
+    """ Deploy all room configurations and return measurements """
+    stats = h.requestStats()
+    compileTime = 0.0
+    commitTime = 0.0
+    for config, name in configs:
+        start = time.perf_counter()
+        h.plan(config, name)
+        compileTime += time.perf_counter() - start
+        start = time.perf_counter()
+        h.commit(name)
+        commitTime += time.perf_counter() - start
+    after = h.requestStats()
+    return {
+        "compileTime": compileTime,
+        "commitTime": commitTime,
+        "requests": after["requests"] - stats["requests"],
+        "bytesSent": after["bytesSent"] - stats["bytesSent"],
+        "bytesReceived": after["bytesReceived"] - stats["bytesReceived"]
+    }
+
+def runSize(rooms, args):
+    """ Run benchmark for a house with given number of rooms """
+    data, configs = makeHome(rooms, args.scenes, args.windows, args.motion_sensors)
+    server = None
+    if args.memory:
+        transport = MemoryTransport(MemoryBridge(data, API_KEY, {"rules": 100000, "sensors": 100000, "scenes": 100000,
+                                                                "schedules": 100000, "resourcelinks": 100000}))
+        address = "memory"
+    else:
+        server = FakeBridgeServer(data, API_KEY, 0, args.latency, args.jitter, args.rate,
+                                  {"rules": 100000, "sensors": 100000, "scenes": 100000,
+                                   "schedules": 100000, "resourcelinks": 100000}).start()
+        transport = None
+        address = server.address
+    try:
+        start = time.perf_counter()
+        h = HueBridge(address, API_KEY, maxConcurrency=args.concurrency, transport=transport)
+        refreshTime = time.perf_counter() - start
+        if args.profile:
+            h.profiler = Profiler(os.path.join(args.profile, str(rooms)), args.profile_mode)
+        first = deploy(h, configs)
+        h.profiler = None
+        second = deploy(h, configs)
+        h.close()
+    finally:
+        if server:
+            server.stop()
+    return {"rooms": rooms, "refreshTime": refreshTime, "deploy": first, "redeploy": second}
+
+def gitRevision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+def compare(previous, current):
+    """ Return list of regressions of current run compared to previous run """
+    regressions = []
+    old = {r["rooms"]: r for r in previous["results"]}
+    for r in current["results"]:
+        if not r["rooms"] in old:
+            continue
+        for phase in ["deploy", "redeploy"]:
+            for metric in ["requests", "bytesSent", "compileTime", "commitTime"]:
+                before = old[r["rooms"]][phase][metric]
+                after = r[phase][metric]
+                if before > 0 and (after - before) / before > REGRESSION_THRESHOLD:
+                    regressions.append("{} rooms {} {}: {:.4g} -> {:.4g}".format(r["rooms"], phase, metric, before, after))
+    return regressions
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="End-to-end deploy benchmark")
+    parser.add_argument("--rooms", default="1,5,10", help="comma-separated list of house sizes")
+    parser.add_argument("--scenes", type=int, default=4, help="scenes per multi-scene config")
+    parser.add_argument("--windows", type=int, default=2, help="time windows per multi-scene config")
+    parser.add_argument("--motion-sensors", type=int, default=1, help="motion sensors per room")
+    parser.add_argument("--latency", type=float, default=0.005, help="fake bridge latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.002, help="fake bridge latency jitter in seconds")
+    parser.add_argument("--rate", type=float, help="fake bridge throughput cap in requests per second")
+    parser.add_argument("--concurrency", type=int, default=4, help="maximum concurrency of commit")
+    parser.add_argument("--memory", action="store_true", help="use in-memory transport instead of fake HTTP bridge")
+    parser.add_argument("--history", default="benchmarks/history.json", help="JSON history file (ignored by git)")
+    parser.add_argument("--profile", help="directory for profiles of the first deploy")
+    parser.add_argument("--profile-mode", default="cprofile", choices=["cprofile", "sampling"], help="profiler to use")
+    parser.add_argument("--log-level", default="ERROR", help="log level of bridge operations (default ERROR)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    run = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "revision": gitRevision(),
+        "params": {k: v for k, v in vars(args).items() if not k in ["history", "profile", "profile_mode", "log_level"]},
+        "results": []
+    }
+    for rooms in [int(r) for r in args.rooms.split(",")]:
+        r = runSize(rooms, args)
+        run["results"].append(r)
+        for phase in ["deploy", "redeploy"]:
+            m = r[phase]
+            print("{:4d} rooms {:8s}: compile {:7.3f}s, commit {:7.3f}s, {:6d} requests, {:9d} bytes sent".format(
+                rooms, phase, m["compileTime"], m["commitTime"], m["requests"], m["bytesSent"]))
+
+    history = []
+    if os.path.exists(args.history):
+        with open(args.history, "r", encoding="utf-8") as f:
+            history = json.loads(f.read())
+    regressions = []
+    comparable = [h for h in history if h["params"] == run["params"]]
+    if comparable:
+        regressions = compare(comparable[-1], run)
+        for r in regressions:
+            print("REGRESSION: " + r)
+    history.append(run)
+    with open(args.history, "w", encoding="utf-8") as f:
+        f.write(json.dumps(history, indent=1))
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,232 @@
+'''
+Behavioral regression check of the rule generators against a recorded baseline.
+
+The shipped configurations of hue_rule_generator.py are planned on an in-memory bridge seeded with
+the lights, groups, scenes, switches and motion sensors they reference and replayed through
+hue.simulator with random event scripts (button presses, motion, daylight and external inputs,
+including door contacts). After each event, the observable state is recorded: on and bri of the
+lights, any_on and all_on of the seeded groups and the state of CLIP sensors by name (except period
+sensors). Rule names, IDs and the number of rules and conditions may change, the observable behavior
+may not.
+
+Traces are compared for the rules generated by default (conditions on /config/localtime) and with
+period sensors (HueBridge(..., periodSensors=True)); both must match the baseline recorded in the
+default mode. The checked-in baseline (equivalence_baseline.json) was recorded from the generator
+before motion sensor rules were compiled from a transition table (hue.motion) and before equivalent
+scene rules were merged (HueBridge.__collapseRules).
+
+Usage (from the repository root):
+    python -m benchmarks.equivalence                  # compare with the checked-in baseline
+    python -m benchmarks.equivalence --baseline REV   # compare with the hue package of git revision REV
+    python -m benchmarks.equivalence --record FILE [--tree DIR]
+                                                      # record the baseline (of the hue package in DIR)
+'''
+import argparse
+import contextlib
+import hashlib
+import importlib.util
+import io
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "equivalence_baseline.json")
+API_KEY = "equivalence"
+UNLIMITED = {"rules": 100000, "sensors": 100000, "scenes": 100000, "schedules": 100000, "resourcelinks": 100000}
+
+# seeds of the event scripts, simulated days per script and events per block of the baseline
+SEEDS = [1, 2, 3]
+DAYS = 4
+BLOCK = 50
+
+# buttons pressed on switches
+BUTTONS = ["on", "off", "brighter", "darker", "1", "2", "3", "4", "tl", "tr", "bl", "br"]
+
+def loadConfigs():
+    """ Return list of (config, name) of the shipped configurations (except the test configuration) """
+    spec = importlib.util.spec_from_file_location("hue_rule_generator", os.path.join(ROOT, "hue_rule_generator.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return [(getattr(module, n), n) for n in sorted(dir(module)) if n.startswith("CONFIG_") and n != "CONFIG_TEST"]
+
+def seedData(configs):
+    """ Return tuple (bridge data, switches, motion sensors, external values) for configurations """
+    groups, lights, switches, motions, scenes, externals = set(), set(), set(), set(), set(), set()
+    def walk(o, group = None):
+        if isinstance(o, dict):
+            group = o.get("group", group)
+            if "group" in o:
+                groups.add(o["group"])
+            for light in o.get("lights", []) + ([o["light"]] if "light" in o else []):
+                lights.add(light)
+            if o.get("type") == "switch":
+                switches.add(o["name"])
+            elif o.get("type") == "motion":
+                motions.update(o.get("sensors", [o["name"]]))
+            elif o.get("type") in ["external", "contact"]:
+                externals.update(o["bindings"].keys() if o["type"] == "external" else o["bindings"].values())
+            if "scene" in o and group:
+                scenes.add((group, o["scene"]))
+            if o.get("type") == "scene" and "value" in o and group:
+                scenes.add((group, o["value"]))
+            for v in o.values():
+                walk(v, group)
+        elif isinstance(o, list):
+            for v in o:
+                walk(v, group)
+    for config, name in configs:
+        walk(config)
+
+    data = {"lights": {}, "groups": {}, "sensors": {}, "scenes": {}, "config": {"localtime": "2018-11-19T00:00:00"}}
+    for light in sorted(lights):
+        data["lights"][str(len(data["lights"]) + 1)] = {"name": light}
+    groupID = {}
+    for group in sorted(groups):
+        # two lights of its own per group, so rooms can be told apart
+        own = []
+        for i in range(2):
+            own.append(str(len(data["lights"]) + 1))
+            data["lights"][own[-1]] = {"name": group + " " + str(i)}
+        groupID[group] = str(len(groupID) + 1)
+        data["groups"][groupID[group]] = {"name": group, "lights": own, "type": "Room"}
+    sensorID = 100
+    for switch in sorted(switches):
+        data["sensors"][str(sensorID)] = {"name": switch, "type": "ZLLSwitch", "uniqueid": "sw%d" % sensorID}
+        sensorID += 1
+    for motion in sorted(motions):
+        uniqueid = "00:17:88:01:02:03:%02x:05-02" % sensorID
+        data["sensors"][str(sensorID)] = {"name": motion, "type": "ZLLPresence", "uniqueid": uniqueid + "-0406"}
+        data["sensors"][str(sensorID + 1)] = {"name": motion + " light", "type": "ZLLLightLevel", "uniqueid": uniqueid + "-0400"}
+        sensorID += 2
+    for i, (group, scene) in enumerate(sorted(scenes)):
+        if scene in ["off", "dim"] or not group in groupID:
+            continue
+        data["scenes"]["s%03d" % i] = {"name": scene, "group": groupID[group], "lights": data["groups"][groupID[group]]["lights"]}
+    return data, sorted(switches), sorted(motions), sorted(externals)
+
+def script(seed, switches, motions, externals):
+    """ Return random event script for hue.simulator """
+    rnd = random.Random(seed)
+    events = []
+    t = 0
+    while t < DAYS * 86400:
+        t += rnd.randint(1, 900)
+        k = rnd.random()
+        if k < 0.35:
+            motion = rnd.choice(motions)
+            events.append((t, "motion", motion, True))
+            events.append((t + rnd.randint(5, 600), "motion", motion, False))
+        elif k < 0.65:
+            events.append((t, "press", rnd.choice(switches), rnd.choice(BUTTONS)))
+        elif k < 0.9:
+            events.append((t, "external", rnd.choice(externals)))
+        else:
+            events.append((t, "dark", rnd.choice(motions), rnd.random() < 0.5))
+    events.sort(key=lambda e: e[0])
+    return events
+
+def trace(configs, periodSensors = False):
+    """ Return dictionary of seed to list of observable states after each event """
+    from hue import HueBridge
+    from hue.memory_bridge import MemoryBridge
+    from hue.simulator import Simulator
+    from hue.transport import MemoryTransport
+
+    data, switches, motions, externals = seedData(configs)
+    kwargs = {"periodSensors": True} if periodSensors else {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        h = HueBridge("memory", API_KEY, maxConcurrency=1, transport=MemoryTransport(MemoryBridge(data, API_KEY, UNLIMITED)), **kwargs)
+    result = {}
+    for seed in SEEDS:
+        sim = Simulator.fromBridge(h, configs, record=False)
+        states = []
+        for event in script(seed, switches, motions, externals):
+            sim.run([event], until=event[0])
+            sensors = {}
+            for sensorID, sensor in sim.data["sensors"].items():
+                if sensor.get("type", "").startswith("CLIP") and not sensor["name"].startswith("Period "):
+                    prefix = "/sensors/" + sensorID + "/state/"
+                    sensors[sensor["name"]] = sim.value(prefix + "status") if sim.value(prefix + "status") is not None else sim.value(prefix + "flag")
+            lights = [(sim.value("/lights/" + i + "/state/on"), sim.value("/lights/" + i + "/state/bri")) for i in sorted(data["lights"])]
+            groups = [(sim.value("/groups/" + i + "/state/any_on"), sim.value("/groups/" + i + "/state/all_on")) for i in sorted(data["groups"])]
+            states.append(repr((event, lights, groups, sorted(sensors.items()))))
+        result[str(seed)] = states
+    return result
+
+def digest(states):
+    """ Return dictionary with number of events, digest of the whole trace and digests of blocks """
+    md5 = lambda lines: hashlib.md5("\n".join(lines).encode("utf-8")).hexdigest()
+    return {
+        "events": len(states),
+        "digest": md5(states),
+        "blocks": [md5(states[i:i + BLOCK]) for i in range(0, len(states), BLOCK)]
+    }
+
+def record(path):
+    configs = loadConfigs()
+    baseline = dict((seed, digest(states)) for seed, states in trace(configs).items())
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(baseline, indent=1, sort_keys=True))
+
+def recordRevision(revision, path):
+    """ Record baseline of the hue package of git revision into path """
+    with tempfile.TemporaryDirectory() as tree:
+        archive = subprocess.run(["git", "archive", revision, "hue"], cwd=ROOT, stdout=subprocess.PIPE, check=True).stdout
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(tree)
+        if subprocess.run([sys.executable, os.path.abspath(__file__), "--tree", tree, "--record", path]).returncode != 0:
+            # e.g., revisions before hue.simulator
+            raise Exception("Cannot record baseline of revision " + revision)
+
+def compare(baseline, configs):
+    """ Compare traces of current generator in both modes with baseline and return list of differences """
+    problems = []
+    for mode, periodSensors in [("localtime", False), ("period", True)]:
+        for seed, states in sorted(trace(configs, periodSensors).items()):
+            expected = baseline[seed]
+            actual = digest(states)
+            if actual["digest"] == expected["digest"]:
+                print("{:10s} seed {}: {} events equal".format(mode, seed, actual["events"]))
+                continue
+            block = next((i for i, (a, b) in enumerate(zip(actual["blocks"], expected["blocks"])) if a != b),
+                         min(len(actual["blocks"]), len(expected["blocks"])))
+            first = states[block * BLOCK] if block * BLOCK < len(states) else "end of trace"
+            problems.append("{} seed {}: traces differ in events {}-{} (first event of block: {})".format(
+                mode, seed, block * BLOCK, (block + 1) * BLOCK - 1, first[:200]))
+            print("{:10s} seed {}: DIFFERENT".format(mode, seed))
+    return problems
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Compare simulated behavior of generated rules with a baseline")
+    parser.add_argument("--baseline", help="git revision to compare with (default: checked-in baseline)")
+    parser.add_argument("--record", help="record baseline of the generator to this file")
+    parser.add_argument("--tree", help="directory with the hue package to record (default: this repository)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level="ERROR")
+    sys.path.insert(0, os.path.abspath(args.tree) if args.tree else ROOT)
+
+    if args.record:
+        record(args.record)
+        return 0
+    if args.baseline:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "baseline.json")
+            recordRevision(args.baseline, path)
+            with open(path, "r", encoding="utf-8") as f:
+                baseline = json.loads(f.read())
+    else:
+        with open(BASELINE, "r", encoding="utf-8") as f:
+            baseline = json.loads(f.read())
+    problems = compare(baseline, loadConfigs())
+    for p in problems:
+        print("DIFFERENT " + p)
+    return 1 if problems else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,129 @@
+'''
+Generator of synthetic houses for benchmarks.
+
+A house consists of bridge data in the format returned by GET /api/<key> (lights, groups,
+scenes and hardware sensors) and room configurations in the format described in README.md.
+'''
+
+SCENE_NAMES = ["Bright", "Relax", "Read", "Concentrate", "Energize", "Dimmed", "TV", "Evening"]
+
+def makeRoomConfig(index, scenes = 4, windows = 2, motionSensors = 1):
+    """ Return configuration of a synthetic room using switch, external input, motion sensors and wakeup """
+    room = "Room " + str(index)
+    ext = lambda n: str(100 + index * 10 + n)
+    configs = [{"scene": sceneName(i)} for i in range(scenes)]
+    times = {}
+    for w in range(windows):
+        start = w * 24 // windows
+        end = (w + 1) * 24 // windows % 24
+        times["T{:02d}:00:00/T{:02d}:00:00".format(start, end)] = w % scenes + 1
+    motion = {
+        "type": "motion",
+        "name": room + " sensor",
+        "group": room,
+        "timeout": "00:03:00",
+        "dimtime": "00:00:15",
+        "contact": room + " door",
+        "closedtimeout": "01:00:00",
+        "bindings": {
+            "on": { "type": "redirect", "value": ext(1) }
+        }
+    }
+    if motionSensors > 1:
+        motion["sensors"] = [room + " sensor " + str(m) for m in range(motionSensors)]
+    return [
+        {
+            "type": "state",
+            "name": room + " state"
+        },
+        {
+            "type": "contact",
+            "name": room + " door",
+            "bindings": {
+                "open": ext(5),
+                "closed": ext(6)
+            }
+        },
+        {
+            "type": "switch",
+            "name": room + " switch",
+            "group": room,
+            "bindings": {
+                "on": { "type": "redirect", "value": ext(1) },
+                "off": { "type": "redirect", "value": ext(2) },
+                "brighter": { "type": "dim", "value": 30 },
+                "darker": { "type": "dim", "value": -30 }
+            }
+        },
+        {
+            "type": "external",
+            "name": room + " switch",
+            "group": room,
+            "state": room + " state",
+            "bindings": {
+                ext(1): {
+                    "type": "scene",
+                    "reset": "off",
+                    "configs": configs,
+                    "times": times
+                },
+                ext(2): { "type": "off" },
+                ext(3): {
+                    "type": "scene",
+                    "value": "Night",
+                    "timeout": "00:20:00",
+                    "action": "toggle"
+                }
+            }
+        },
+        motion,
+        {
+            "type": "wakeup",
+            "name": room,
+            "group": room,
+            "start": "W124/T06:20:00",
+            "duration": 10
+        }
+    ]
+
+def sceneName(i):
+    return SCENE_NAMES[i % len(SCENE_NAMES)] + ("" if i < len(SCENE_NAMES) else " " + str(i // len(SCENE_NAMES)))
+
+def makeHome(rooms, scenes = 4, windows = 2, motionSensors = 1, lights = 3):
+    """
+    Return tuple of (bridge data, list of (config, name)) for a synthetic house.
+
+    Each room has a light group with the given number of lights, scenes used by the configuration,
+    a switch, motion sensor(s) with light level sensor(s) and the configuration from makeRoomConfig().
+    """
+    data = {"lights": {}, "groups": {}, "scenes": {}, "sensors": {}}
+    sensorID = 1
+    lightID = 1
+    for r in range(rooms):
+        room = "Room " + str(r)
+        groupID = str(r + 1)
+        groupLights = []
+        for l in range(lights):
+            data["lights"][str(lightID)] = {"name": room + " light " + str(l), "state": {"on": False, "bri": 254}}
+            groupLights.append(str(lightID))
+            lightID += 1
+        data["groups"][groupID] = {"name": room, "type": "Room", "lights": groupLights, "sensors": [],
+                                   "state": {"all_on": False, "any_on": False}, "action": {"on": False}}
+        for i in range(scenes):
+            data["scenes"]["scn{:04d}{:04d}".format(r, i)] = {"name": sceneName(i), "type": "GroupScene", "group": groupID,
+                                                            "lights": groupLights, "recycle": False, "locked": False, "appdata": {}}
+        data["scenes"]["scn{:04d}9999".format(r)] = {"name": "Night", "type": "GroupScene", "group": groupID,
+                                                     "lights": groupLights, "recycle": False, "locked": False, "appdata": {}}
+        data["sensors"][str(sensorID)] = {"name": room + " switch", "type": "ZLLSwitch", "uniqueid": "00:17:88:01:10:{:02x}:{:02x}:00-02-fc00".format(r // 256, r % 256),
+                                          "state": {"buttonevent": 1002, "lastupdated": "none"}}
+        sensorID += 1
+        names = [room + " sensor"] if motionSensors <= 1 else [room + " sensor " + str(m) for m in range(motionSensors)]
+        for m, name in enumerate(names):
+            mac = "00:17:88:01:{:02x}:{:02x}:{:02x}:{:02x}".format(r // 256, r % 256, m, 1)
+            data["sensors"][str(sensorID)] = {"name": name, "type": "ZLLPresence", "uniqueid": mac + "-02-0406",
+                                              "state": {"presence": False, "lastupdated": "none"}}
+            data["sensors"][str(sensorID + 1)] = {"name": name + " light", "type": "ZLLLightLevel", "uniqueid": mac + "-02-0400",
+                                                  "state": {"dark": True, "daylight": False, "lastupdated": "none"}}
+            sensorID += 2
+    configs = [(makeRoomConfig(r, scenes, windows, motionSensors), "Room " + str(r)) for r in range(rooms)]
+    return data, configs
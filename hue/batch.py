@@ -0,0 +1,674 @@
+'''
+Batch evaluation of generated rules over many randomized event traces.
+
+BatchSimulator runs thousands of independent event traces ("lanes") through the rules of a
+simulated bridge (see hue.simulator) at once. All lanes advance in lock step: in each step,
+every lane advances its time by a random delay (firing expired ddx/stable timers and
+schedules) and then receives one random input event. Inputs are derived from the
+configurations by inputsForConfigs():
+   - button presses of switch bindings (button names mapped via BUTTON_MAP)
+   - motion on/off and dark/bright of motion sensors
+   - external input values of external bindings and contact sensors (open/closed)
+   - group on/off by the app for groups of switches and motion sensors
+Lanes start at times evenly spread over a day, so all time ranges of time-based bindings
+are covered.
+
+Attributes are stored as arrays over lanes and rule conditions are evaluated as boolean
+masks (requires numpy). A step costs about the same for few and many lanes, so batching pays off
+from about 100 lanes: below, running hue.simulator per trace is as fast. For the shipped house
+(14 rooms), houseReport() with 2000 lanes takes about 5s for 30 steps and 17s for 100 steps
+(160-190k lane events per second).
+Semantics follow hue.simulator, except that:
+   - actions of all rules fired by a change are applied before the rules triggered by them
+     are evaluated (rounds instead of single actions)
+   - only relative schedules (PT...) are run
+   - only on and bri of lights are simulated
+
+Example:
+    batch = BatchSimulator.fromBridge(h, configs, lanes=2000)
+    batch.run(200)
+    print(json.dumps(batch.report(), indent=1))
+'''
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .hue_bridge import BUTTON_MAP
+from .simulator import EPSILON, MATCH_DURATION, Simulator, compileCondition, parseDuration
+
+INF = float("inf")
+
+def inputsForConfigs(sim, configs):
+    """ Return list of inputs (label, address, body) for configurations (list of (config, name)) on Simulator sim """
+    inputs = []
+    labels = set()
+
+    def add(label, address, body):
+        if not label in labels:
+            labels.add(label)
+            inputs.append((label, address, body))
+
+    extinput = "/sensors/" + sim.find("sensors", "ExternalInput") + "/state"
+    for config, name in configs:
+        for desc in config:
+            tp = desc["type"]
+            if tp == "switch":
+                address = "/sensors/" + sim.find("sensors", desc["name"]) + "/state"
+                for button in desc["bindings"].keys():
+                    # any-release bindings react to release after press
+                    code = BUTTON_MAP.get(button.replace("-any", ""), button)
+                    add(desc["name"] + " " + button, address, {"buttonevent": int(code)})
+            elif tp == "external":
+                for value in desc["bindings"].keys():
+                    add("external " + value, extinput, {"status": int(value)})
+            elif tp == "contact":
+                for event, value in desc["bindings"].items():
+                    add(desc["name"] + " " + event, extinput, {"status": int(value)})
+            elif tp == "motion":
+                for sensor in desc.get("sensors", [desc["name"]]):
+                    address = "/sensors/" + sim.find("sensors", sensor) + "/state"
+                    add(sensor + " motion", address, {"presence": True})
+                    add(sensor + " no motion", address, {"presence": False})
+                    address = "/sensors/" + sim.lightLevelSensor(sensor) + "/state"
+                    add(sensor + " dark", address, {"dark": True, "daylight": False})
+                    add(sensor + " bright", address, {"dark": False, "daylight": True})
+            if "group" in desc and tp in ["switch", "external", "motion"]:
+                address = "/groups/" + sim.find("groups", desc["group"]) + "/action"
+                add(desc["group"] + " on", address, {"on": True})
+                add(desc["group"] + " off", address, {"on": False})
+    return inputs
+
+class BatchSimulator():
+    """
+    Simulation of many independent randomized event traces (lanes).
+
+    Sim is a Simulator with loaded configuration, whose state is the initial state of all
+    lanes. Inputs is a list of (label, address, body) with input events to choose from
+    uniformly (see inputsForConfigs()); without inputs (e.g., for a room with schedules only),
+    only time advances. Delays between events are exponentially distributed with mean meanGap
+    seconds. Lanes in which changes still trigger rules after maxRounds rounds are counted as
+    rule storms. Only rules reachable from the inputs and schedules are evaluated, others are
+    reported as never fired.
+    """
+
+    def __init__(self, sim, inputs, lanes = 1000, seed = 0, meanGap = 300.0, maxRounds = 50):
+        if not numpy:
+            raise Exception("Batch evaluation requires numpy")
+        self.lanes = lanes
+        self.inputs = inputs
+        self.meanGap = meanGap
+        self.maxRounds = maxRounds
+        self.steps = 0
+        self.__rng = numpy.random.default_rng(seed)
+        self.__data = sim.data
+        # lanes start evenly spread over a day
+        self.__start = sim.start
+        self.__t = sim.now + numpy.arange(lanes) * (86400.0 / lanes)
+        self.__times = {}
+        self.__rows = {}
+        self.__values = []
+        self.__changedAt = []
+        self.__stateRows = {}
+        for address, value in sim.values().items():
+            if type(value) in [bool, int, float]:
+                row = self.__row(address)
+                self.__values[row][:] = value
+        self.__groupLights = sim.groupLights()
+        self.__groupSensors = sim.groupSensors()
+        self.__lightGroups = {}
+        for groupID, lights in self.__groupLights.items():
+            for lightID in lights:
+                self.__lightGroups.setdefault(lightID, []).append(groupID)
+        self.__sensorGroups = {}
+        for groupID, sensors in self.__groupSensors.items():
+            for sensorID in sensors:
+                self.__sensorGroups.setdefault(sensorID, []).append(groupID)
+        self.__groupRows = {}
+        # light on row -> list of (group, array of number of lights on) for groups of the light and groups
+        # with changed number of lights on (see __aggregates())
+        self.__onCounts = {}
+        self.__dirtyGroups = set()
+        # light states stored in scenes by storelightstate: (scene, light) -> (on, bri) arrays
+        self.__sceneStates = {}
+        self.__compile()
+
+        # state variables (status of CLIP status sensors) for statistics
+        for sensorID, sensor in self.__data["sensors"].items():
+            if sensor.get("type") == "CLIPGenericStatus" and sensor.get("name") != "ExternalInput":
+                row = self.__row("/sensors/" + sensorID + "/state/status")
+                self.__stateRows[row] = {"sensor": sensorID, "name": sensor["name"], "transitions": {},
+                                         "visited": set(numpy.unique(self.__values[row][~numpy.isnan(self.__values[row])]).tolist())}
+        self.__firings = numpy.zeros(len(self.__rules), dtype=numpy.int64)
+        self.__covered = {}
+        self.__storms = numpy.zeros(lanes, dtype=bool)
+        self.__inputCounts = numpy.zeros(len(inputs), dtype=numpy.int64)
+
+    @staticmethod
+    def fromBridge(bridge, configs, lanes = 1000, seed = 0, **kwargs):
+        """ Return batch simulator for configurations (list of (config, name)) planned on HueBridge bridge with inputs of all configurations """
+        sim = Simulator.fromBridge(bridge, configs, record=False)
+        return BatchSimulator(sim, inputsForConfigs(sim, configs), lanes, seed, **kwargs)
+
+    def __row(self, address):
+        """ Return row of attribute (allocated on first use) """
+        row = self.__rows.get(address)
+        if row is None:
+            row = self.__rows[address] = len(self.__values)
+            self.__values.append(numpy.full(self.lanes, numpy.nan))
+            self.__changedAt.append(numpy.full(self.lanes, -INF))
+        return row
+
+    def __compileAction(self, address, method, body):
+        """ Return action as tuple (kind, target, body) """
+        parts = address.split("/")
+        tp = parts[1] if len(parts) > 2 and method == "PUT" else None
+        if tp == "sensors" and len(parts) == 4 and parts[3] == "state" and parts[2] in self.__data["sensors"]:
+            return ("sensor", parts[2], body)
+        elif tp == "lights" and len(parts) == 4 and parts[3] == "state":
+            return ("lights", [parts[2]], body)
+        elif tp == "groups" and len(parts) == 4 and parts[3] == "action" and parts[2] in self.__groupLights:
+            if "scene" in body:
+                return ("scene", body["scene"], body)
+            return ("lights", self.__groupLights[parts[2]], body)
+        elif tp == "scenes" and len(parts) == 3 and body.get("storelightstate"):
+            return ("store", parts[2], body)
+        elif tp == "schedules" and len(parts) == 3 and parts[2] in self.__scheduleIndex:
+            return ("schedule", self.__scheduleIndex[parts[2]], body)
+        return ("unsupported", address, body)
+
+    def __compile(self):
+        # relative schedules
+        self.__schedules = []
+        self.__scheduleIndex = {}
+        commands = []
+        for scheduleID, schedule in self.__data["schedules"].items():
+            localtime = schedule.get("localtime", "")
+            m = MATCH_DURATION.match(localtime)
+            if m and not m.group(1):
+                self.__scheduleIndex[scheduleID] = len(self.__schedules)
+                self.__schedules.append((scheduleID, parseDuration(localtime.split("A")[0])))
+                commands.append(schedule["command"])
+        self.__scheduleCommands = [self.__compileAction("/" + c["address"].split("/", 3)[3], c["method"], c.get("body", {})) for c in commands]
+        self.__scheduleDeadlines = [numpy.full(self.lanes, INF) for j in self.__schedules]
+        self.__armedSchedules = set()
+        for scheduleID, j in self.__scheduleIndex.items():
+            if self.__data["schedules"][scheduleID].get("status") == "enabled":
+                self.__scheduleDeadlines[j] = self.__t + self.__schedules[j][1]
+                self.__armedSchedules.add(j)
+
+        self.__inputs = [self.__compileAction(address, "PUT", body) for label, address, body in self.inputs]
+
+        # rules in the order of their IDs
+        self.__rules = []
+        ids = sorted(self.__data["rules"].keys(), key=lambda i: (len(i), i))
+        for ruleID in ids:
+            rule = self.__data["rules"][ruleID]
+            if rule.get("status", "enabled") != "enabled":
+                continue
+            conditions = []
+            for c in rule["conditions"]:
+                address, op, value = compileCondition(c)
+                row = self.__row(address) if address != "/config/localtime" else None
+                if op in ["eq", "gt", "lt"] and type(value) is str:
+                    # attributes are numeric, string values never match
+                    value = numpy.nan
+                conditions.append((row, op, value))
+            actions = [self.__compileAction(a["address"], a["method"], a.get("body", {})) for a in rule["actions"]]
+            self.__rules.append((ruleID, rule["name"], conditions, actions))
+
+        # only rules which can fire are evaluated, the others are just reported
+        self.__byRow = {}
+        self.__timers = []
+        self.__timersByRow = {}
+        for pos in self.__reachable():
+            for row, op, value in self.__rules[pos][2]:
+                if op in ["ddx", "stable", "not stable"]:
+                    self.__timersByRow.setdefault(row, []).append((len(self.__timers), value))
+                    self.__timers.append((pos, row))
+                if row is not None:
+                    positions = self.__byRow.setdefault(row, [])
+                    if not positions or positions[-1] != pos:
+                        positions.append(pos)
+        # deadlines of timers and schedules (only armed ones, i.e., with a deadline in any lane, are checked)
+        self.__deadlines = [numpy.full(self.lanes, INF) for k in self.__timers]
+        self.__armed = set()
+
+    def __writes(self, action, writes):
+        """ Add attributes changed by compiled action to writes (row -> set of values or None for any value) """
+        def write(address, value = None):
+            row = self.__rows.get(address)
+            if row is None:
+                # not used in any condition
+                return
+            if value is None or type(value) not in [bool, int, float]:
+                writes[row] = None
+            elif writes.setdefault(row, set()) is not None:
+                writes[row].add(float(value))
+
+        def lights(lightIDs, body):
+            for lightID in lightIDs:
+                for k in ["on", "bri"]:
+                    if k in body:
+                        write("/lights/" + lightID + "/state/" + k, body[k])
+                if "bri_inc" in body:
+                    write("/lights/" + lightID + "/state/bri")
+                for groupID in self.__lightGroups.get(lightID, []):
+                    write("/groups/" + groupID + "/state/any_on")
+                    write("/groups/" + groupID + "/state/all_on")
+
+        kind, target, body = action
+        if kind == "sensor":
+            prefix = "/sensors/" + target + "/state/"
+            for k, v in body.items():
+                write(prefix + k, v)
+            write(prefix + "lastupdated")
+            for groupID in self.__sensorGroups.get(target, []):
+                write("/groups/" + groupID + "/presence/state/presence")
+                write("/groups/" + groupID + "/lightlevel/state/dark")
+        elif kind == "lights":
+            lights(target, body)
+        elif kind == "scene":
+            scene = self.__data["scenes"].get(target) or {}
+            lights(scene.get("lights", []), {"on": None, "bri": None})
+
+    def __reachable(self):
+        """
+        Return positions of rules, which can fire starting from inputs and armed schedules.
+
+        A rule can fire, if an attribute of its conditions changes and each of its eq conditions
+        can become true (its value is the initial value of the attribute or written by an input or
+        an action of another rule, which can fire). Rules of other rooms depending on ExternalInput
+        are thus not evaluated in a batch with inputs of a single room.
+        """
+        writes = {}
+        schedules = set(self.__armedSchedules)
+        for action in self.__inputs:
+            self.__writes(action, writes)
+        reachable = set()
+        done = set()
+        while True:
+            for j in schedules - done:
+                self.__writes(self.__scheduleCommands[j], writes)
+            done |= schedules
+            found = False
+            for pos, (ruleID, name, conditions, actions) in enumerate(self.__rules):
+                if pos in reachable or not any(row in writes for row, op, value in conditions):
+                    continue
+                possible = True
+                for row, op, value in conditions:
+                    if op in ["dx", "ddx"] and not row in writes:
+                        possible = False
+                    elif op == "eq" and not self.__values[row][0] == value and writes.get(row, ()) is not None and \
+                            not float(value) in writes.get(row, ()):
+                        possible = False
+                if possible:
+                    reachable.add(pos)
+                    found = True
+                    for action in actions:
+                        self.__writes(action, writes)
+                        if action[0] == "schedule" and action[2].get("status") == "enabled":
+                            schedules.add(action[1])
+            if not found and schedules <= done:
+                return sorted(reachable)
+
+    def __mark(self, row, mask, changes):
+        """ Register change of attribute in lanes of mask """
+        prev = changes.get(row)
+        changes[row] = mask if prev is None else prev | mask
+        t = self.__t
+        self.__changedAt[row][mask] = t[mask]
+        for k, delay in self.__timersByRow.get(row, ()):
+            self.__deadlines[k][mask] = t[mask] + delay
+            self.__armed.add(k)
+
+    def __set(self, row, value, mask, changes):
+        """ Set attribute to value (scalar or array) in lanes of mask """
+        old = self.__values[row]
+        if type(value) is numpy.ndarray:
+            changed = mask & (old != value) & ~(numpy.isnan(old) & numpy.isnan(value))
+        else:
+            changed = mask & (old != value)
+        if changed.any():
+            new = value[changed] if type(value) is numpy.ndarray else value
+            state = self.__stateRows.get(row)
+            if state is not None:
+                # count transitions (old value as real part, new value as imaginary part)
+                pairs, counts = numpy.unique(old[changed] + 1j * (value[changed] if type(value) is numpy.ndarray else value), return_counts=True)
+                for pair, n in zip(pairs.tolist(), counts.tolist()):
+                    key = (pair.real, pair.imag)
+                    state["transitions"][key] = state["transitions"].get(key, 0) + n
+                    state["visited"].add(pair.imag)
+            counts = self.__onCounts.get(row)
+            if counts:
+                delta = (new == 1) * 1 - (old[changed] == 1)
+                for groupID, c in counts:
+                    c[changed] += delta
+                    self.__dirtyGroups.add(groupID)
+            old[changed] = new
+            self.__mark(row, changed, changes)
+
+    def __updateGroup(self, groupID, mask, changes):
+        rows = self.__groupRows.get(groupID)
+        if rows is None:
+            rows = self.__groupRows[groupID] = self.__aggregates(groupID)
+        values = self.__values
+        if groupID in self.__dirtyGroups:
+            self.__dirtyGroups.discard(groupID)
+            for counts, n, anyRow, allRow in rows[0]:
+                self.__set(anyRow, counts > 0, mask, changes)
+                self.__set(allRow, counts == n, mask, changes)
+        for sensorRows, aggregate, row in rows[1]:
+            self.__set(row, aggregate(numpy.stack([values[r] == 1 for r in sensorRows]), axis=0), mask, changes)
+
+    def __aggregates(self, groupID):
+        """
+        Return rows of aggregated attributes of group: ([(lights on, number of lights, any_on, all_on)],
+        [(sensor rows, aggregate, row)])
+
+        The number of lights on is kept up to date by __set() from now on, so groups with many lights
+        (e.g., group 0) are not aggregated over all their lights for each change of a light and any_on
+        and all_on are only updated if a light of the group was switched (group is dirty).
+        """
+        lights = []
+        if self.__groupLights[groupID]:
+            rows = [self.__row("/lights/" + l + "/state/on") for l in self.__groupLights[groupID]]
+            counts = numpy.zeros(self.lanes, dtype=numpy.int64)
+            for r in rows:
+                counts += self.__values[r] == 1
+                self.__onCounts.setdefault(r, []).append((groupID, counts))
+            self.__dirtyGroups.add(groupID)
+            lights.append((counts, len(rows), self.__row("/groups/" + groupID + "/state/any_on"), self.__row("/groups/" + groupID + "/state/all_on")))
+        sensors = []
+        for attribute, aggregate, address in [("presence", numpy.any, "/presence/state/presence"), ("dark", numpy.all, "/lightlevel/state/dark")]:
+            rows = [self.__rows["/sensors/" + s + "/state/" + attribute] for s in self.__groupSensors.get(groupID, [])
+                    if "/sensors/" + s + "/state/" + attribute in self.__rows]
+            if rows:
+                sensors.append((rows, aggregate, self.__row("/groups/" + groupID + address)))
+        return (lights, sensors)
+
+    def __updateLights(self, lights, body, mask, changes, groups = None):
+        """ Apply state body to lights, update their groups (or add them to groups to update later) """
+        update = groups is None
+        groups = set() if update else groups
+        for lightID in lights:
+            onRow = self.__row("/lights/" + lightID + "/state/on")
+            briRow = self.__row("/lights/" + lightID + "/state/bri")
+            if "on" in body:
+                self.__set(onRow, body["on"], mask, changes)
+            if "bri" in body:
+                self.__set(briRow, body["bri"], mask, changes)
+            if "bri_inc" in body:
+                bri = numpy.clip(self.__values[briRow] + body["bri_inc"], 1, 254)
+                self.__set(briRow, bri, mask & (self.__values[onRow] == 1), changes)
+            groups.update(self.__lightGroups.get(lightID, []))
+        if update:
+            for groupID in sorted(groups):
+                self.__updateGroup(groupID, mask, changes)
+
+    def __apply(self, action, mask, changes):
+        """ Apply compiled action in lanes of mask """
+        kind, target, body = action
+        if kind == "sensor":
+            prefix = "/sensors/" + target + "/state/"
+            for k, v in body.items():
+                if type(v) in [bool, int, float]:
+                    self.__set(self.__row(prefix + k), v, mask, changes)
+            row = self.__row(prefix + "lastupdated")
+            self.__values[row][mask] = self.__t[mask]
+            self.__mark(row, mask, changes)
+            for groupID in self.__sensorGroups.get(target, []):
+                self.__updateGroup(groupID, mask, changes)
+        elif kind == "lights":
+            self.__updateLights(target, body, mask, changes)
+        elif kind == "scene":
+            scene = self.__data["scenes"].get(target)
+            if not scene:
+                return
+            lightstates = scene.get("lightstates") or {}
+            groups = set()
+            for lightID in scene.get("lights", []):
+                stored = self.__sceneStates.get((target, lightID))
+                if stored:
+                    on, bri = stored
+                    self.__set(self.__row("/lights/" + lightID + "/state/on"), on, mask & ~numpy.isnan(on), changes)
+                    self.__set(self.__row("/lights/" + lightID + "/state/bri"), bri, mask & ~numpy.isnan(bri), changes)
+                    groups.update(self.__lightGroups.get(lightID, []))
+                else:
+                    self.__updateLights([lightID], lightstates.get(lightID, {"on": True}), mask, changes, groups)
+            for groupID in sorted(groups):
+                self.__updateGroup(groupID, mask, changes)
+        elif kind == "store":
+            scene = self.__data["scenes"].get(target)
+            for lightID in scene.get("lights", []) if scene else []:
+                stored = self.__sceneStates.get((target, lightID))
+                if not stored:
+                    stored = self.__sceneStates[(target, lightID)] = (numpy.full(self.lanes, numpy.nan), numpy.full(self.lanes, numpy.nan))
+                stored[0][mask] = self.__values[self.__row("/lights/" + lightID + "/state/on")][mask]
+                stored[1][mask] = self.__values[self.__row("/lights/" + lightID + "/state/bri")][mask]
+        elif kind == "schedule":
+            status = body.get("status")
+            if status == "enabled":
+                self.__scheduleDeadlines[target][mask] = self.__t[mask] + self.__schedules[target][1]
+                self.__armedSchedules.add(target)
+            elif status == "disabled":
+                self.__scheduleDeadlines[target][mask] = INF
+
+    def __inTime(self, value):
+        """ Return mask of lanes with local time in range value (cached until time advances) """
+        inside = self.__times.get(value)
+        if inside is None:
+            inside = self.__times[value] = self.__computeInTime(value)
+        return inside
+
+    def __computeInTime(self, value):
+        weekdays, begin, end = value
+        start = self.__start
+        t = self.__t + (start.hour * 3600 + start.minute * 60 + start.second)
+        seconds = numpy.mod(t, 86400)
+        day = numpy.floor_divide(t, 86400).astype(numpy.int64) + start.weekday()
+        if begin <= end:
+            inside = (seconds >= begin) & (seconds < end)
+        else:
+            inside = (seconds >= begin) | (seconds < end)
+            # range started on the previous day
+            day = day - (seconds < end)
+        return inside & ((weekdays >> (6 - numpy.mod(day, 7))) & 1 == 1)
+
+    def __matches(self, pos, trigger, changes, ddx):
+        """ Return mask of lanes of trigger in which conditions of rule are met (ddx is (row, mask) of an expired timer) """
+        values = self.__values
+        result = trigger
+        for row, op, value in self.__rules[pos][2]:
+            if op == "eq":
+                result = result & (values[row] == value)
+            elif op == "gt":
+                result = result & (values[row] > value)
+            elif op == "lt":
+                result = result & (values[row] < value)
+            elif op == "dx":
+                m = changes.get(row)
+                if m is None:
+                    return None
+                result = result & m
+            elif op == "ddx":
+                if ddx is None or ddx[0] != row:
+                    return None
+                result = result & ddx[1]
+            elif op == "stable":
+                result = result & (self.__t - self.__changedAt[row] >= value - EPSILON)
+            elif op == "not stable":
+                result = result & (self.__t - self.__changedAt[row] < value - EPSILON)
+            elif op == "in":
+                result = result & self.__inTime(value)
+            else:
+                result = result & ~self.__inTime(value)
+            if not result.any():
+                return None
+        return result
+
+    def __fire(self, matched, changes):
+        """ Count fired rules (list of (position, mask)) and apply their actions in rule order """
+        for pos, mask in sorted(matched, key=lambda m: m[0]):
+            self.__firings[pos] += int(mask.sum())
+            covered = self.__covered.get(pos)
+            self.__covered[pos] = mask if covered is None else covered | mask
+            for action in self.__rules[pos][3]:
+                self.__apply(action, mask, changes)
+
+    def __cascade(self, changes):
+        """ Evaluate rules triggered by changes (dictionary of row to mask) until there are no more changes """
+        rounds = 0
+        while changes:
+            rounds += 1
+            if rounds > self.maxRounds:
+                for mask in changes.values():
+                    self.__storms |= mask
+                return
+            triggers = {}
+            for row, mask in changes.items():
+                for pos in self.__byRow.get(row, ()):
+                    prev = triggers.get(pos)
+                    triggers[pos] = mask if prev is None else prev | mask
+            matched = []
+            for pos, trigger in triggers.items():
+                mask = self.__matches(pos, trigger, changes, None)
+                if mask is not None:
+                    matched.append((pos, mask))
+            changes = {}
+            self.__fire(matched, changes)
+
+    def __advance(self, target):
+        """ Advance time of each lane to target, firing expired timers and schedules """
+        while True:
+            timers = [(k, self.__deadlines[k]) for k in sorted(self.__armed)]
+            schedules = [(j, self.__scheduleDeadlines[j]) for j in sorted(self.__armedSchedules)]
+            nxt = numpy.full(self.lanes, INF)
+            for k, deadlines in timers + schedules:
+                numpy.minimum(nxt, deadlines, out=nxt)
+            due = nxt <= target
+            if not due.any():
+                break
+            self.__t = numpy.where(due, nxt, self.__t)
+            self.__times = {}
+            changes = {}
+            matched = []
+            for k, deadlines in timers:
+                mask = due & (deadlines <= self.__t)
+                if mask.any():
+                    deadlines[mask] = INF
+                    pos, row = self.__timers[k]
+                    result = self.__matches(pos, mask, changes, (row, mask))
+                    if result is not None:
+                        matched.append((pos, result))
+                    if deadlines.min() == INF:
+                        self.__armed.discard(k)
+            self.__fire(matched, changes)
+            for j, deadlines in schedules:
+                mask = due & (deadlines <= self.__t)
+                if mask.any():
+                    deadlines[mask] = INF
+                    self.__apply(self.__scheduleCommands[j], mask, changes)
+                    if deadlines.min() == INF:
+                        self.__armedSchedules.discard(j)
+            self.__cascade(changes)
+        self.__t = numpy.maximum(self.__t, target)
+        self.__times = {}
+
+    def run(self, steps):
+        """ Simulate given number of steps (random delay and random input event in each lane) """
+        for step in range(steps):
+            self.__advance(self.__t + self.__rng.exponential(self.meanGap, self.lanes))
+            if not self.__inputs:
+                # e.g., a room with only schedules, time advances nevertheless
+                self.steps += 1
+                continue
+            choice = self.__rng.integers(len(self.__inputs), size=self.lanes)
+            self.__inputCounts += numpy.bincount(choice, minlength=len(self.__inputs))
+            # each lane receives one input, so changes of all inputs are processed together
+            changes = {}
+            for i, action in enumerate(self.__inputs):
+                mask = choice == i
+                if mask.any():
+                    self.__apply(action, mask, changes)
+            self.__cascade(changes)
+            self.steps += 1
+
+    def report(self, rules = None, sensors = None):
+        """
+        Return statistics of simulated lanes (optionally only for given rule and sensor IDs):
+           - rules - list of rules with number of firings and lanes in which they fired
+           - unfired - names of rules which never fired
+           - groups - fraction of lanes with any light of group on at the end
+           - states - for state sensors, number of lanes in each final state, observed transitions,
+             values used in conditions, but never reached (unreachable) and reached values never
+             left again (absorbing)
+           - storms - number of lanes with a rule storm
+        """
+        result = []
+        unfired = []
+        for pos, (ruleID, name, conditions, actions) in enumerate(self.__rules):
+            if rules is not None and not ruleID in rules:
+                continue
+            covered = self.__covered.get(pos)
+            lanes = int(covered.sum()) if covered is not None else 0
+            result.append({"id": ruleID, "name": name, "firings": int(self.__firings[pos]), "lanes": lanes})
+            if not lanes:
+                unfired.append(name)
+
+        groups = {}
+        for groupID, group in self.__data["groups"].items():
+            row = self.__rows.get("/groups/" + groupID + "/state/any_on")
+            if row is not None:
+                groups[group["name"]] = float((self.__values[row] == 1).mean())
+
+        states = {}
+        for row, state in self.__stateRows.items():
+            if sensors is not None and not state["sensor"] in sensors:
+                continue
+            used = set()
+            for ruleID, name, conditions, actions in self.__rules:
+                for r, op, value in conditions:
+                    if r == row and op == "eq" and not numpy.isnan(value):
+                        used.add(float(value))
+            final = self.__values[row]
+            final = final[~numpy.isnan(final)]
+            values, counts = numpy.unique(final, return_counts=True)
+            left = set(a for (a, b) in state["transitions"].keys())
+            entered = set(b for (a, b) in state["transitions"].keys())
+            states[state["name"]] = {
+                "final": dict((_label(v), int(n)) for v, n in zip(values.tolist(), counts.tolist())),
+                "transitions": dict((_label(a) + "->" + _label(b), n) for (a, b), n in sorted(state["transitions"].items())),
+                "unreachable": [_label(v) for v in sorted(used - state["visited"])],
+                "absorbing": [_label(v) for v in sorted(entered - left)]
+            }
+
+        return {
+            "lanes": self.lanes,
+            "steps": self.steps,
+            "inputs": dict((label, int(n)) for (label, address, body), n in zip(self.inputs, self.__inputCounts.tolist())),
+            "rules": result,
+            "unfired": unfired,
+            "groups": groups,
+            "states": states,
+            "storms": int(self.__storms.sum())
+        }
+
+def houseReport(bridge, configs, lanes = 1000, steps = 100, seed = 0, **kwargs):
+    """
+    Return dictionary of configuration name to report of a batch simulation of the configuration.
+
+    All configurations (list of (config, name)) are planned on HueBridge bridge, but each is
+    simulated with its own inputs and reported with its own rules and sensors. Other arguments
+    are passed to BatchSimulator.
+    """
+    sim = Simulator.fromBridge(bridge, configs, record=False)
+    reports = {}
+    for config, name in configs:
+        batch = BatchSimulator(sim, inputsForConfigs(sim, [(config, name)]), lanes, seed, **kwargs)
+        batch.run(steps)
+        reports[name] = batch.report(sim.rooms[name]["rules"], sim.rooms[name]["sensors"])
+    return reports
+
+def _label(value):
+    return str(int(value)) if float(value).is_integer() else str(value)
@@ -0,0 +1,66 @@
+'''
+Adaptive concurrency control for requests sent to the bridge.
+'''
+import threading
+
+class AimdLimiter():
+    """
+    Limit of in-flight requests adjusted by additive increase/multiplicative decrease (AIMD).
+
+    Each successful request with latency below the target increases the limit by about
+    one per window of requests, each error or slow request multiplies the limit by decrease
+    factor. The limit is always kept in range [minLimit, maxLimit].
+    """
+
+    def __init__(self, minLimit = 1, maxLimit = 4, latencyTarget = 1.0, decrease = 0.5):
+        if minLimit < 1 or maxLimit < minLimit:
+            raise Exception("Invalid concurrency range [" + str(minLimit) + ".." + str(maxLimit) + "]")
+        self.minLimit = minLimit
+        self.maxLimit = maxLimit
+        self.latencyTarget = latencyTarget
+        self.decrease = decrease
+        self.limit = float(minLimit)
+        self.inflight = 0
+        self.requests = 0
+        self.errors = 0
+        self.totalLatency = 0.0
+        self.peakLimit = minLimit
+        self.__cond = threading.Condition()
+
+    def acquire(self):
+        """ Wait until a request may be sent """
+        with self.__cond:
+            while self.inflight >= int(self.limit):
+                self.__cond.wait()
+            self.inflight += 1
+
+    def release(self):
+        """ Mark in-flight request as done """
+        with self.__cond:
+            self.inflight -= 1
+            self.__cond.notify_all()
+
+    def record(self, latency, ok):
+        """ Record latency and outcome of a request and adjust the limit """
+        with self.__cond:
+            self.requests += 1
+            self.totalLatency += latency
+            if not ok:
+                self.errors += 1
+            if not ok or latency > self.latencyTarget:
+                self.limit = max(float(self.minLimit), self.limit * self.decrease)
+            else:
+                self.limit = min(float(self.maxLimit), self.limit + 1.0 / self.limit)
+            self.peakLimit = max(self.peakLimit, int(self.limit))
+            self.__cond.notify_all()
+
+    def stats(self):
+        """ Return statistics about requests seen so far """
+        with self.__cond:
+            return {
+                "limit": int(self.limit),
+                "peakLimit": self.peakLimit,
+                "requests": self.requests,
+                "errors": self.errors,
+                "avgLatency": self.totalLatency / self.requests if self.requests else 0.0
+            }
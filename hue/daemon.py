@@ -0,0 +1,217 @@
+'''
+Daemon mode: watch room configurations and apply changes to the bridges as they are edited.
+
+Usage:
+    python -m hue.daemon manifest.json [--interval SECONDS] [--assume-deployed] [--log-level LEVEL]
+
+The manifest has the format of fleet mode (see hue.fleet), room configurations are typically kept
+in separate JSON files referenced by the manifest. The daemon keeps one HueBridge per bridge with
+its indexed bridge data in memory, so the bridge is read only once at start. The manifest and the
+room configuration files are polled for changes (modification time and size). After a change, the
+manifest is loaded again and only rooms whose configuration differs from the last applied one are
+planned and committed on the long-lived HueBridge (deleting the objects of the previous version of
+the room and creating the new ones), so an edit reaches the bridge in about a second.
+
+At start, all rooms are configured once, unless --assume-deployed is given (then the current
+configurations are taken as applied). Rooms removed from the manifest are not deleted from the
+bridge. If a commit fails, the bridge data is read again (the state of the bridge is unknown) and
+the room is retried at the next change of a watched file. Limits of rule firings and light commands
+of the manifest (maxFirings, maxCommands) are checked for the changed rooms before committing,
+timeout is the deadline of each commit.
+
+Only JSON files are watched: configurations defined in Python (e.g., CONFIG_* of
+hue_rule_generator.py) are not reloaded, they have to be written to JSON room configuration files
+(e.g., json.dump(CONFIG_..., f)) to be applied by the daemon.
+
+Tables of canonical rule conditions and actions (see hue.ir) are dropped after each poll which
+configured rooms, so they don't grow with each edit of a long-running daemon.
+'''
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+from .deadline import DeadlineExceeded
+from .fleet import loadManifest
+from .hue_bridge import HueBridge
+from .ir import clearInterned
+from .storms import checkLimits, StormLimitExceeded
+
+log = logging.getLogger(__name__)
+
+# default polling interval in seconds
+POLL_INTERVAL = 0.5
+
+class ConfigDaemon():
+    """
+    Watcher of a fleet manifest applying changed room configurations.
+
+    BridgeFactory is called with a BridgeJob (see hue.orchestrator) and returns a HueBridge for it
+    (default HueBridge(job.bridge, job.apiKey)), e.g., to use another transport. Run() writes a
+    progress line per configured room to out.
+    """
+
+    def __init__(self, manifestPath, interval = POLL_INTERVAL, assumeDeployed = False, bridgeFactory = None, out = sys.stdout):
+        self.manifestPath = manifestPath
+        self.interval = interval
+        self.out = out
+        self.bridgeFactory = bridgeFactory or (lambda job: HueBridge(job.bridge, job.apiKey))
+        self.__assumeDeployed = assumeDeployed
+        self.__signature = None
+        self.__bridges = {}
+        self.__stop = threading.Event()
+
+    def __watchedFiles(self):
+        """ Return list of the manifest and room configuration files referenced by it """
+        files = [self.manifestPath]
+        try:
+            with open(self.manifestPath, "r", encoding="utf-8") as f:
+                manifest = json.loads(f.read())
+        except (OSError, ValueError):
+            return files
+        base = os.path.dirname(os.path.abspath(self.manifestPath))
+        for b in manifest.get("bridges", []):
+            for room in b.get("rooms", []):
+                if isinstance(room.get("config"), str):
+                    files.append(os.path.join(base, room["config"]))
+        return files
+
+    def __currentSignature(self):
+        signature = []
+        for path in self.__watchedFiles():
+            try:
+                st = os.stat(path)
+                signature.append((path, st.st_mtime_ns, st.st_size))
+            except OSError:
+                signature.append((path, None, None))
+        return signature
+
+    def poll(self):
+        """
+        Apply room configurations changed since the last call and return list of results.
+
+        Each result is a dictionary with bridge, room, status ("ok", "error", "timeout" or "limits"),
+        time in seconds and error (if any). Returns an empty list if nothing changed.
+        """
+        signature = self.__currentSignature()
+        if signature == self.__signature:
+            return []
+        self.__signature = signature
+        try:
+            manifest, jobs = loadManifest(self.manifestPath)
+        except Exception as e:
+            # typically a file saved in the middle of an edit, wait for the next change
+            log.error("Cannot load manifest %s or its room configurations: %s", self.manifestPath, e)
+            return []
+        limits = None
+        if manifest.get("maxFirings") is not None or manifest.get("maxCommands") is not None:
+            limits = {"maxFirings": manifest.get("maxFirings"), "maxCommands": manifest.get("maxCommands")}
+
+        results = []
+        for job in jobs:
+            results += self.__apply(job, limits, manifest.get("timeout"))
+        for name in set(self.__bridges.keys()) - set(job.name for job in jobs):
+            log.warning("Bridge %s removed from manifest, its rooms are left on the bridge", name)
+            del self.__bridges[name]
+        self.__assumeDeployed = False
+        if results:
+            # objects of committed rooms are not needed anymore, don't keep them interned
+            clearInterned()
+        return results
+
+    def __apply(self, job, limits, timeout):
+        """ Configure changed rooms of job on its long-lived HueBridge """
+        state = self.__bridges.get(job.name)
+        if state is None or state["bridge"] != job.bridge or state["apiKey"] != job.apiKey:
+            start = time.time()
+            try:
+                h = self.bridgeFactory(job)
+            except Exception as e:
+                log.error("Cannot read bridge %s (%s): %s", job.name, job.bridge, e)
+                return [{"bridge": job.name, "room": None, "status": "error", "time": time.time() - start, "error": str(e)}]
+            log.info("Read bridge %s (%s) in %.2fs", job.name, job.bridge, time.time() - start)
+            state = {"bridge": job.bridge, "apiKey": job.apiKey, "hue": h, "applied": {}}
+            self.__bridges[job.name] = state
+            if self.__assumeDeployed:
+                for config, room in job.rooms:
+                    state["applied"][room] = json.dumps(config, sort_keys=True)
+        h = state["hue"]
+        applied = state["applied"]
+
+        changed = [(config, room) for config, room in job.rooms if applied.get(room) != json.dumps(config, sort_keys=True)]
+        for room in set(applied.keys()) - set(room for config, room in job.rooms):
+            log.warning("Room %s removed from bridge %s, its rules are left on the bridge", room, job.name)
+            del applied[room]
+        if not changed:
+            return []
+
+        results = []
+        if limits is not None:
+            try:
+                checkLimits(h, changed, **limits)
+            except Exception as e:
+                log.error("Not configuring %s on bridge %s: %s", ", ".join(room for config, room in changed), job.name, e)
+                status = "limits" if isinstance(e, StormLimitExceeded) else "error"
+                return [{"bridge": job.name, "room": room, "status": status, "time": 0, "error": str(e)} for config, room in changed]
+
+        for config, room in changed:
+            start = time.time()
+            result = {"bridge": job.name, "room": room, "status": "ok", "error": None}
+            try:
+                h.configure(config, room, timeout)
+                applied[room] = json.dumps(config, sort_keys=True)
+            except Exception as e:
+                result["status"] = "timeout" if isinstance(e, DeadlineExceeded) else "error"
+                result["error"] = str(e)
+                applied.pop(room, None)
+                log.error("Configuring %s on bridge %s failed: %s", room, job.name, e, extra={"room": room})
+                try:
+                    # objects may have been changed before the failure
+                    h.refresh()
+                except Exception as e:
+                    log.error("Cannot read bridge %s (%s): %s", job.name, job.bridge, e)
+                    del self.__bridges[job.name]
+                    result["time"] = time.time() - start
+                    results.append(result)
+                    break
+            result["time"] = time.time() - start
+            if result["status"] == "ok":
+                log.info("Configured %s on bridge %s in %.2fs", room, job.name, result["time"], extra={"room": room})
+            results.append(result)
+        return results
+
+    def run(self):
+        """ Poll for changes until stop() is called """
+        self.__stop.clear()
+        while not self.__stop.is_set():
+            for r in self.poll():
+                self.out.write("[{}] {}: {} in {:.2f}s{}\n".format(r["bridge"], r["room"] or "refresh", r["status"], r["time"],
+                               ": " + r["error"] if r["error"] else ""))
+                self.out.flush()
+            self.__stop.wait(self.interval)
+
+    def stop(self):
+        """ Stop run() after the current poll """
+        self.__stop.set()
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Watch room configurations and apply changes to Hue bridges")
+    parser.add_argument("manifest", help="JSON manifest with bridges and room configurations (see hue.fleet)")
+    parser.add_argument("--interval", type=float, default=POLL_INTERVAL, help="polling interval in seconds (default {})".format(POLL_INTERVAL))
+    parser.add_argument("--assume-deployed", action="store_true", help="do not configure rooms at start, only changes")
+    parser.add_argument("--log-level", default="WARNING", help="log level of bridge operations (default WARNING)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    daemon = ConfigDaemon(args.manifest, args.interval, args.assume_deployed)
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
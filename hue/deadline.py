@@ -0,0 +1,37 @@
+'''
+Overall time budget for configuring the bridge.
+'''
+import time
+
+class DeadlineExceeded(Exception):
+    """
+    Raised when the time budget ran out before all operations were done.
+
+    Completed contains the list of operations which were done on the bridge before
+    the budget ran out (e.g., "DELETE rules/12" or "POST rules -> 57").
+    """
+
+    def __init__(self, message, completed = None):
+        Exception.__init__(self, message)
+        self.completed = completed if completed is not None else []
+
+class Deadline():
+    """ Point in time by which the work must be done """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.time() + seconds
+
+    @staticmethod
+    def of(value):
+        """ Return a Deadline for a deadline or number of seconds (or None for no deadline) """
+        if value is None or isinstance(value, Deadline):
+            return value
+        return Deadline(value)
+
+    def remaining(self):
+        """ Return remaining time in seconds (negative, if expired) """
+        return self.expires - time.time()
+
+    def expired(self):
+        return self.remaining() <= 0
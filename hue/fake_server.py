@@ -0,0 +1,160 @@
+'''
+Local stand-in for a Hue bridge serving the subset of API v1 used by HueBridge over HTTP.
+
+It is backed by MemoryBridge and simulates per-request latency with jitter, a throughput
+cap of the bridge and resource table limits, so it can be used as the target for load
+and latency benchmarks of the commit path.
+
+Usage:
+    python -m hue.fake_server [--port 8080] [--key KEY] [--seed bridge.json] [--latency 0.05]
+        [--jitter 0.02] [--rate 20] [--limit rules=250 ...]
+
+The seed file contains the bridge data in the format returned by GET /api/<key>.
+'''
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+from .memory_bridge import MemoryBridge
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # send headers and body in one segment to avoid delayed ACK stalls on keep-alive connections
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        # keep the console quiet, the server is used for benchmarking
+        pass
+
+    def __handle(self, method):
+        fake = self.server.fake
+        length = int(self.headers.get("Content-Length", 0))
+        data = self.rfile.read(length) if length else None
+        fake.throttle()
+        status, result = fake.handle(method, self.path, data)
+        text = json.dumps(result).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(text)))
+        self.end_headers()
+        self.wfile.write(text)
+
+    def do_GET(self):
+        self.__handle("GET")
+
+    def do_POST(self):
+        self.__handle("POST")
+
+    def do_PUT(self):
+        self.__handle("PUT")
+
+    def do_DELETE(self):
+        self.__handle("DELETE")
+
+class FakeBridgeServer():
+    """
+    Fake bridge HTTP server.
+
+    Each request is delayed by latency plus a uniformly distributed jitter (both in seconds).
+    If rate is set, the bridge processes at most rate requests per second, further requests
+    are queued. Limits override sizes of resource tables of the MemoryBridge.
+    """
+
+    def __init__(self, data = None, apiKey = "fake", port = 0, latency = 0.0, jitter = 0.0, rate = None, limits = None):
+        self.bridge = MemoryBridge(data, apiKey, limits)
+        self.apiKey = apiKey
+        self.latency = latency
+        self.jitter = jitter
+        self.rate = rate
+        self.requests = 0
+        self.__nextSlot = 0.0
+        self.__lock = threading.Lock()
+        self.__server = _Server(("127.0.0.1", port), _Handler)
+        self.__server.fake = self
+        self.__thread = None
+
+    @property
+    def address(self):
+        """ Address of the server usable as bridge address for HueBridge """
+        return "127.0.0.1:" + str(self.__server.server_address[1])
+
+    def throttle(self):
+        """ Delay the current request according to latency, jitter and throughput cap """
+        delay = self.latency + (random.uniform(0, self.jitter) if self.jitter else 0)
+        if self.rate:
+            with self.__lock:
+                now = time.time()
+                slot = max(now, self.__nextSlot)
+                self.__nextSlot = slot + 1.0 / self.rate
+            delay += slot - now
+        if delay > 0:
+            time.sleep(delay)
+
+    def handle(self, method, path, data):
+        """ Handle request for a full path /api/<key>/... and return (status, data) """
+        with self.__lock:
+            self.requests += 1
+        parts = path.split("?")[0].split("/")
+        if len(parts) < 3 or parts[1] != "api":
+            return 404, MemoryBridge.error(4, path, "method, " + method + ", not available for resource, " + path)
+        if parts[2] != self.apiKey:
+            return 200, MemoryBridge.error(1, "/", "unauthorized user")
+        body = None
+        if data:
+            try:
+                body = json.loads(data.decode("utf-8"))
+            except ValueError:
+                return 200, MemoryBridge.error(2, "/" + "/".join(parts[3:]), "body contains invalid json")
+        return self.bridge.handle(method, "/".join(parts[3:]), body)
+
+    def start(self):
+        """ Start serving in a background thread """
+        self.__thread = threading.Thread(target=self.__server.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.__server.shutdown()
+        self.__server.server_close()
+        if self.__thread:
+            self.__thread.join()
+
+    def serveForever(self):
+        self.__server.serve_forever()
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Fake Hue bridge for benchmarking")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--key", default="fake", help="API key accepted by the bridge")
+    parser.add_argument("--seed", help="JSON file with initial bridge data")
+    parser.add_argument("--latency", type=float, default=0.0, help="per-request latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="additional random latency in seconds")
+    parser.add_argument("--rate", type=float, help="maximum requests per second")
+    parser.add_argument("--limit", action="append", default=[], help="resource table limit, e.g. rules=250")
+    args = parser.parse_args(argv)
+
+    data = None
+    if args.seed:
+        with open(args.seed, "r", encoding="utf-8") as f:
+            data = json.loads(f.read())
+    limits = {}
+    for l in args.limit:
+        tp, value = l.split("=")
+        limits[tp] = int(value)
+    server = FakeBridgeServer(data, args.key, args.port, args.latency, args.jitter, args.rate, limits)
+    print("Fake bridge listening on " + server.address + ", API key " + args.key)
+    try:
+        server.serveForever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
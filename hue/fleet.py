@@ -0,0 +1,165 @@
+'''
+Fleet mode: deploy room configurations to many bridges with a bounded worker pool.
+
+Usage:
+    python -m hue.fleet manifest.json [--workers N] [--timeout SECONDS] [--max-failures N]
+        [--max-firings N] [--max-commands N] [--log-level LEVEL]
+
+The manifest is a JSON file with the following structure:
+    {
+        "workers": 8,           # optional, size of the worker pool
+        "timeout": 600,         # optional, per-bridge timeout in seconds
+        "maxFailures": 2,       # optional, consecutive room failures opening the circuit of a bridge
+        "maxFirings": 50,       # optional, maximum rule firings per input event (see hue.storms)
+        "maxCommands": 10,      # optional, maximum light commands per input event
+        "bridges": [
+            {
+                "name": "Home",
+                "bridge": "192.168.1.2",
+                "apiKey": "...",
+                "rooms": [
+                    { "name": "Wohnzimmer", "config": "rooms/wohnzimmer.json" },
+                    { "name": "Keller", "config": [ ...inline configuration... ] }
+                ]
+            }
+        ]
+    }
+
+Room configuration files contain the configuration list as described in README.md.
+Relative paths are resolved against the directory of the manifest. Bridge names (by default the
+bridge address) must be unique, so several entries for the same bridge need distinct names.
+
+If a limit of rule firings or light commands is set, the rules of each bridge are checked for
+rule storms before committing and bridges exceeding a limit are not configured.
+'''
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .orchestrator import BridgeJob, CircuitBreaker, runBridgeJob
+
+def loadManifest(path):
+    """ Load fleet manifest and return tuple of (manifest, list of BridgeJob) """
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.loads(f.read())
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for b in manifest["bridges"]:
+        rooms = []
+        for room in b["rooms"]:
+            config = room["config"]
+            if isinstance(config, str):
+                with open(os.path.join(base, config), "r", encoding="utf-8") as f:
+                    config = json.loads(f.read())
+            rooms.append((config, room["name"]))
+        name = b.get("name", b["bridge"])
+        if name in [job.name for job in jobs]:
+            # progress and results are reported by name
+            raise Exception("Duplicate bridge name '" + name + "' in manifest " + path + ", set distinct names")
+        jobs.append(BridgeJob(name, b["bridge"], b["apiKey"], rooms))
+    return manifest, jobs
+
+class FleetRunner():
+    """ Run bridge jobs on a bounded thread pool with per-bridge circuit breaker and timeout """
+
+    def __init__(self, jobs, workers = 8, timeout = None, maxFailures = 2, out = sys.stdout, limits = None):
+        self.jobs = jobs
+        self.workers = workers
+        self.timeout = timeout
+        self.maxFailures = maxFailures
+        self.limits = limits
+        self.out = out
+        self.__lock = threading.Lock()
+
+    def __progress(self, job, line):
+        with self.__lock:
+            self.out.write("[" + job.name + "] " + line + "\n")
+            self.out.flush()
+
+    def __run(self, job):
+        return runBridgeJob(job, CircuitBreaker(self.maxFailures), self.timeout, self.__progress, self.limits)
+
+    def run(self):
+        """ Run all jobs, streaming progress lines, and return the summary """
+        start = time.time()
+        results = [None] * len(self.jobs)
+        with ThreadPoolExecutor(max_workers=max(1, min(self.workers, len(self.jobs)))) as pool:
+            futures = {pool.submit(self.__run, job): i for i, job in enumerate(self.jobs)}
+            for future in as_completed(futures):
+                i = futures[future]
+                r = future.result()
+                results[i] = r
+                self.__progress(self.jobs[i], "done: {} in {:.2f}s".format(r["status"], r["time"]))
+        return FleetRunner.summarize(results, time.time() - start)
+
+    @staticmethod
+    def summarize(results, wallTime):
+        """ Build fleet summary from per-bridge results """
+        summary = {
+            "bridges": results,
+            "wallTime": wallTime,
+            "requests": 0,
+            "bytesSent": 0,
+            "bytesReceived": 0,
+            "failures": []
+        }
+        for r in results:
+            if r["stats"]:
+                for k in ["requests", "bytesSent", "bytesReceived"]:
+                    summary[k] += r["stats"][k]
+            if r["status"] != "ok":
+                summary["failures"].append({"name": r["name"], "status": r["status"], "error": r["error"]})
+        return summary
+
+def printSummary(summary, out = sys.stdout):
+    """ Print fleet summary returned by FleetRunner.run() """
+    out.write("Fleet summary:\n")
+    for r in summary["bridges"]:
+        stats = r["stats"] or {"requests": 0, "bytesSent": 0, "bytesReceived": 0}
+        out.write(" - {}: {} in {:.2f}s, {} requests, {} bytes sent, {} bytes received\n".format(
+            r["name"], r["status"], r["time"], stats["requests"], stats["bytesSent"], stats["bytesReceived"]))
+    out.write("Total: {} bridges in {:.2f}s, {} requests, {} bytes sent, {} bytes received, {} failures\n".format(
+        len(summary["bridges"]), summary["wallTime"], summary["requests"],
+        summary["bytesSent"], summary["bytesReceived"], len(summary["failures"])))
+    for f in summary["failures"]:
+        out.write(" FAILED {} ({}): {}\n".format(f["name"], f["status"], f["error"]))
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Deploy room configurations to a fleet of Hue bridges")
+    parser.add_argument("manifest", help="JSON manifest with bridges and room configurations")
+    parser.add_argument("--workers", type=int, help="number of bridges to configure in parallel")
+    parser.add_argument("--timeout", type=float, help="per-bridge timeout in seconds")
+    parser.add_argument("--max-failures", type=int, help="consecutive room failures which stop a bridge")
+    parser.add_argument("--max-firings", type=int, help="maximum rule firings per input event (checked before deploy)")
+    parser.add_argument("--max-commands", type=int, help="maximum light commands per input event (checked before deploy)")
+    parser.add_argument("--json", help="write summary as JSON to this file")
+    parser.add_argument("--log-level", default="WARNING", help="log level of bridge operations (default WARNING)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    manifest, jobs = loadManifest(args.manifest)
+    limits = None
+    maxFirings = args.max_firings if args.max_firings is not None else manifest.get("maxFirings")
+    maxCommands = args.max_commands if args.max_commands is not None else manifest.get("maxCommands")
+    if maxFirings is not None or maxCommands is not None:
+        limits = {"maxFirings": maxFirings, "maxCommands": maxCommands}
+    runner = FleetRunner(
+        jobs,
+        workers=args.workers or manifest.get("workers", 8),
+        timeout=args.timeout if args.timeout is not None else manifest.get("timeout"),
+        maxFailures=args.max_failures or manifest.get("maxFailures", 2),
+        limits=limits)
+    summary = runner.run()
+    printSummary(summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(json.dumps(summary, indent=2))
+    return 1 if summary["failures"] else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,15 +3,32 @@ Created on 20 Nov 2018
 
 @author: Ivan Schreter
 '''
-import requests
+import contextlib
+import datetime
 import json
+import logging
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 import pprint
+import zlib
+
+from .concurrency import AimdLimiter
+from .deadline import Deadline, DeadlineExceeded
+from .instrumentation import Instrumentation
+from .ir import Action, Condition, GroupSpec, Rule, SceneSpec, SensorSpec
+from .motion import MotionCompiler, SOURCE, STATES, Transition
+from .references import Ref, SymbolTable, resolveAll
+from .retry import BridgeError, RetryPolicy, RESOURCE_NOT_AVAILABLE, classifyResponse
+from .transport import HttpTransport, TransportConnectError, TransportError, TransportTimeout
+
+log = logging.getLogger(__name__)
 
-VAR_PATTERN = re.compile("\\${([^}:]+):([^}]+)}")
-SCENE_PATTERN = re.compile("^([^:]+):(.*)$")
 OFF_BINDING = { "type": "scene", "configs": [ {"scene": "off"} ] }
+# maximum number of conditions of a rule on the bridge
+MAX_CONDITIONS = 8
 MATCH_HUEAPP_SCENEDATA = re.compile('^(.....)_r([0-9][0-9])_d([0-9][0-9])$')
 
 BUTTON_MAP = {
@@ -82,19 +99,202 @@ class HueBridge():
         "darker-any-release": { "type": "dim", "value": 0, "tt": 0 }
     }
 
-    def __init__(self, bridge, apiKey):
+    def __init__(self, bridge, apiKey, minConcurrency = 1, maxConcurrency = 4, latencyTarget = 1.0, retryPolicy = None, transport = None, instrumentation = None, profiler = None, periodSensors = False, deadline = None):
+        """
+        Connect to the bridge and read its configuration.
+
+        Independent requests in commit are sent in parallel. The number of requests in flight
+        is adapted to the measured latency and error rate of the bridge, but kept within
+        [minConcurrency, maxConcurrency]. Requests slower than latencyTarget (in seconds)
+        are considered overload. The limit is kept across commits of this instance.
+
+        Transient errors are retried according to retryPolicy (default RetryPolicy()).
+
+        All requests are sent via transport (default HttpTransport to the bridge), see hue.transport.
+
+        Each request is recorded by instrumentation (default Instrumentation() without report),
+        see hue.instrumentation.
+
+        If profiler is set, phases of plan and commit are profiled, see hue.profiling.
+
+        If periodSensors is set, time ranges of scene bindings are tested by eq conditions on a CLIP
+        period sensor per times mapping (updated by weekly schedules, shared by rooms) instead of
+        conditions on /config/localtime (see __periodCondition()).
+
+        Deadline (seconds or a Deadline object) bounds the initial refresh, see refresh().
+        """
         self.bridge = bridge
         self.apiKey = apiKey
         self.urlbase = "http://" + bridge + "/api/" + apiKey;
-        self.refresh()
+        self.__maxConcurrency = maxConcurrency
+        # kept across commits, so each room starts at the concurrency learned for the bridge
+        self.__limiter = AimdLimiter(minConcurrency, maxConcurrency, latencyTarget)
+        self.__deadline = None
+        self.__completed = []
+        # name of configuration being planned or committed (for log records)
+        self.__room = None
+        self.__retryPolicy = retryPolicy if retryPolicy else RetryPolicy()
+        self.__transport = transport if transport else HttpTransport(bridge, apiKey, maxConcurrency)
+        self.__stats = {"requests": 0, "bytesSent": 0, "bytesReceived": 0}
+        self.__statsLock = threading.Lock()
+        # guards indexes and symbols updated by helpers running on worker threads of a commit phase
+        self.__indexLock = threading.Lock()
+        self.instrumentation = instrumentation if instrumentation else Instrumentation()
+        self.profiler = profiler
+        self.periodSensors = periodSensors
+        self.refresh(deadline)
+
+    def close(self):
+        """ Close the transport to the bridge """
+        self.__transport.close()
+
+    def requestStats(self):
+        """ Return number of requests and bytes sent to/received from the bridge so far """
+        with self.__statsLock:
+            return dict(self.__stats)
+
+    def concurrencyStats(self):
+        """ Return statistics of the concurrency limiter (over all requests so far) """
+        return self.__limiter.stats()
+
+    @contextlib.contextmanager
+    def __profile(self, phase):
+        """ Profile a phase of the current room (if profiling is enabled) """
+        if not self.profiler:
+            yield
+            return
+        with self.profiler.profile(self.__room, phase):
+            yield
+
+    def __runPhase(self, items, fn, ordered = False):
+        """
+        Run fn for each item of a commit phase and return list of results in order of items.
+
+        Items are processed in parallel, limited by the adaptive concurrency limiter, or one
+        after another if ordered is set. After the first failure or when the deadline expires
+        no further items are started and the exception is re-raised.
+        """
+        limiter = self.__limiter
+        failed = []
+
+        def run(item):
+            limiter.acquire()
+            try:
+                if failed:
+                    return None
+                if self.__deadline and self.__deadline.expired():
+                    failed.append((item, DeadlineExceeded("Deadline of {}s exceeded".format(self.__deadline.seconds))))
+                    return None
+                try:
+                    return fn(item)
+                except Exception as e:
+                    failed.append((item, e))
+                    return None
+            finally:
+                limiter.release()
+
+        if ordered or self.__maxConcurrency <= 1 or len(items) <= 1:
+            results = [run(item) for item in items]
+        else:
+            with ThreadPoolExecutor(max_workers=min(self.__maxConcurrency, len(items))) as pool:
+                results = list(pool.map(run, items))
+        if failed:
+            if not isinstance(failed[0][1], DeadlineExceeded):
+                log.error("Data: %s", pprint.pformat(failed[0][0]), extra={"room": self.__room})
+            raise failed[0][1]
+        return results
+
+    def __call(self, method, resource, body, what):
+        """
+        Send a request for a resource (relative to API URL) to the bridge and return parsed response.
+
+        Transient errors are retried according to the retry policy, other errors raise BridgeError
+        with message prefixed by what. If a deadline is set, the timeout of the request is shortened
+        to the remaining time and DeadlineExceeded is raised when it runs out.
+        """
+        data = json.dumps(body) if body is not None else None
+        deadline = self.__deadline
+        if deadline and deadline.expired():
+            raise DeadlineExceeded(what + ": deadline of {}s exceeded".format(deadline.seconds))
+
+        sent = len(data.encode("utf-8")) if data else 0
+        attempts = []
+
+        def send(timeout):
+            attempts.append(timeout)
+            start = time.time()
+            try:
+                status, text = self.__transport.request(method, resource, data, timeout)
+            except TransportTimeout as e:
+                self.instrumentation.record(method, resource, None, time.time() - start, sent, 0, True)
+                self.__limiter.record(time.time() - start, False)
+                # the bridge might have processed the request, so only retry idempotent requests
+                raise BridgeError(what + ": " + str(e), method != "POST")
+            except TransportConnectError as e:
+                self.instrumentation.record(method, resource, None, time.time() - start, sent, 0, True)
+                self.__limiter.record(time.time() - start, False)
+                raise BridgeError(what + ": " + str(e), True)
+            except TransportError as e:
+                self.instrumentation.record(method, resource, None, time.time() - start, sent, 0, True)
+                self.__limiter.record(time.time() - start, False)
+                # e.g., connection aborted after the request was sent, retry only idempotent requests
+                raise BridgeError(what + ": " + str(e), method != "POST")
+            latency = time.time() - start
+            received = len(text.encode("utf-8"))
+            with self.__statsLock:
+                self.__stats["requests"] += 1
+                self.__stats["bytesSent"] += sent
+                self.__stats["bytesReceived"] += received
+            try:
+                result = classifyResponse(what, status, text)
+            except BridgeError as e:
+                # transient errors indicate overload, let the concurrency limiter back off
+                self.__limiter.record(latency, not e.retryable)
+                if method == "DELETE" and len(attempts) > 1 and e.errorTypes == [RESOURCE_NOT_AVAILABLE]:
+                    # a previous attempt (e.g., timed out) was already processed by the bridge
+                    log.info("%s: already deleted by a previous attempt", what, extra={"room": self.__room, "resource": resource})
+                    self.instrumentation.record(method, resource, status, latency, sent, received)
+                    return [{"success": "/" + resource + " deleted"}]
+                self.instrumentation.record(method, resource, status, latency, sent, received, True)
+                raise
+            # one latency sample per HTTP request, also for commit items sending several requests
+            self.__limiter.record(latency, True)
+            self.instrumentation.record(method, resource, status, latency, sent, received)
+            log.debug("%s %s: status %s in %.3fs", method, resource, status, latency,
+                      extra={"room": self.__room, "resource": resource, "latency": latency})
+            return result
+
+        try:
+            result = self.__retryPolicy.call(send, None, deadline.expires if deadline else None)
+        except BridgeError as e:
+            if deadline and deadline.expired():
+                raise DeadlineExceeded(str(e) + " (deadline of {}s exceeded)".format(deadline.seconds))
+            raise
+        if method != "GET":
+            # keep track of changes done on the bridge
+            if method == "POST" and type(result) is list and "success" in result[0] and "id" in result[0]["success"]:
+                self.__completed.append(method + " " + resource + " -> " + result[0]["success"]["id"])
+            else:
+                self.__completed.append(method + " " + resource)
+        return result
+
+    def refresh(self, deadline = None):
+        """
+        Read all data from the bridge (and create the external input sensor, if missing).
+
+        Deadline is an optional time budget in seconds (or a Deadline object) propagated to all
+        requests as shrinking timeout, DeadlineExceeded is raised when it runs out.
+        """
+        self.__deadline = Deadline.of(deadline)
+        try:
+            self.__refresh()
+        finally:
+            self.__deadline = None
 
-    def refresh(self):
+    def __refresh(self):
         # read all data from the bridge
-        tmp = requests.get(self.urlbase)
-        if tmp.status_code != 200:
-            raise "Cannot read bridge data"
-        tmp.encoding = 'utf-8'
-        self.__all = json.loads(tmp.text)
+        with self.instrumentation.inPhase("refresh"):
+            self.__all = self.__call("GET", None, None, "Cannot read bridge data")
         self.__sensors = self.__all["sensors"]
         self.__sensors_idx = HueBridge.__make_index(self.__sensors, 'sensors')
         self.__lights = self.__all["lights"]
@@ -118,16 +318,17 @@ class HueBridge():
                         g = j
                         break
                 if not g:
-                    print("Warning: missing group ID for scene '" + n + "', lights", lights, "(ignoring)")
+                    log.warning("Missing group ID for scene '%s', lights %s (ignoring)", n, lights, extra={"resource": "scenes", "id": i})
                     continue
                 else:
-                    print("NOTE: Found group ID " + g + " for light scene " + n)
+                    log.info("Found group ID %s for light scene %s", g, n, extra={"resource": "scenes", "id": i})
             else:
                 g = s["group"]
             if not g in self.__scenes_idx:
                 self.__scenes_idx[g] = {}
             if n in self.__scenes_idx[g]:
-                print("WARNING: Duplicate scene name '" + n + "' for group " + g + " ('" + self.__groups[g]["name"] + "'), IDs " + i + " and " + self.__scenes_idx[g][n])
+                log.warning("Duplicate scene name '%s' for group %s ('%s'), IDs %s and %s", n, g, self.__groups[g]["name"], i, self.__scenes_idx[g][n],
+                            extra={"resource": "scenes", "id": i})
                 if "group" in s:
                     # prefer group scene
                     self.__scenes_idx[g][n] = i
@@ -136,10 +337,11 @@ class HueBridge():
         self.__rules = self.__all["rules"]
         self.__schedules = self.__all["schedules"]
         self.__schedules_idx = HueBridge.__make_index(self.__schedules, "schedules", [], False)
+        self.__symbols = SymbolTable(self.__lookupReference)
         
         self.__extinput = self.findSensor('ExternalInput')
         if not self.__extinput:
-            print("Missing external input sensor, creating it")
+            log.info("Missing external input sensor, creating it")
             sensorData = {
                 "state": {
                     "status": 1
@@ -156,17 +358,18 @@ class HueBridge():
                 "uniqueid": "external_input",
                 "recycle": False
             }
-            tmp = requests.post(self.urlbase + "/sensors", json=sensorData)
-            if tmp.status_code != 200:
-                raise Exception("Cannot create external input sensor")
-            self.__extinput = json.loads(tmp.text)[0]["success"]["id"]
-            print("Created external input sensor", self.__extinput)
+            with self.instrumentation.inPhase("refresh"):
+                result = self.__call("POST", "sensors", sensorData, "Cannot create external input sensor")
+            self.__extinput = result[0]["success"]["id"]
+            log.info("Created external input sensor %s", self.__extinput, extra={"resource": "sensors", "id": self.__extinput})
         else:
-            print("Using external input sensor ", self.__extinput)
-        for i in self.__scenes_idx:
-            mapper = lambda x : (x if "group" in self.__scenes[self.__scenes_idx[i][x]] else x + "*") + " @ " + self.__scenes_idx[i][x]
-            print("Scenes for group", self.__groups[i]["name"] + " (" + i + "):", [mapper(x) for x in sorted(self.__scenes_idx[i].keys())])
-        print("Sensors:", sorted(self.__sensors_idx.keys()))
+            log.info("Using external input sensor %s", self.__extinput)
+        if log.isEnabledFor(logging.DEBUG):
+            # dump of all scenes and sensors is expensive on large bridges
+            for i in self.__scenes_idx:
+                mapper = lambda x : (x if "group" in self.__scenes[self.__scenes_idx[i][x]] else x + "*") + " @ " + self.__scenes_idx[i][x]
+                log.debug("Scenes for group %s (%s): %s", self.__groups[i]["name"], i, [mapper(x) for x in sorted(self.__scenes_idx[i].keys())])
+            log.debug("Sensors: %s", sorted(self.__sensors_idx.keys()))
 
         self.__prepare()
 
@@ -181,6 +384,14 @@ class HueBridge():
         self.__schedulesToDelete = []
         self.__schedulesToCreate = []
         self.__groupsToAdd = []
+        self.__groupsToCreate = {}
+        # period sensor names by tuple of time ranges, sensors to create by name with their windows
+        # (initial status is set by the time of the bridge on commit) and links to shared period
+        # sensors and schedules kept on the bridge
+        self.__periods = {}
+        self.__periodSeeds = {}
+        self.__periodLinks = []
+        self.__motionStats = {}
         # scene lists are collected per group ID, similar to scene index
         self.__scenesToDelete = {}
         self.__scenesToCreate = {}
@@ -218,7 +429,7 @@ class HueBridge():
         return idSet
     
     @staticmethod
-    def __make_index(array, tp, ignore = [], unique = True):
+    def __make_index(array, tp, ignore = (), unique = True):
         index = {}
         for i in array.keys():
             s = array[i]
@@ -228,69 +439,60 @@ class HueBridge():
                     if unique:
                         raise Exception("Duplicate " + tp + " name '" + n + "' in " + tp + ", indices " + index[n] + " and " + i)
                     else:
-                        print("WARNING: Duplicate " + tp + " name '" + n + "' in " + tp + ", indices " + index[n] + " and " + i)
+                        log.warning("Duplicate %s name '%s' in %s, indices %s and %s", tp, n, tp, index[n], i, extra={"resource": tp, "id": i})
                 else:
                     index[n] = i
         return index
     
     def __get(self, resource):
-        tmp = requests.get(self.urlbase + "/" + resource)
-        if tmp.status_code != 200:
-            raise Exception("Cannot read bridge data: status code " + str(tmp.status_code))
-        tmp.encoding = 'utf-8'
-        data = json.loads(tmp.text)
-        if type(data) is list and "error" in data[0].keys():
-            raise Exception("Cannot read bridge data: " + data[0]["error"]["description"])
-        return data
+        return self.__call("GET", resource, None, "Cannot read bridge data")
 
     def __deleteSensor(self, sensorID):
         name = self.__sensors[sensorID]["name"]
-        tmp = requests.delete(self.urlbase + "/sensors/" + sensorID)
-        if tmp.status_code != 200:
-            raise Exception("Cannot delete sensor " + sensorID + "/" + name + ": " + tmp.text)
-        del self.__sensors_idx[name]
-        del self.__sensors[sensorID]
-        print("Deleted sensor", sensorID, name)
+        self.__call("DELETE", "sensors/" + sensorID, None, "Cannot delete sensor " + sensorID + "/" + name)
+        with self.__indexLock:
+            del self.__sensors_idx[name]
+            del self.__sensors[sensorID]
+        log.info("Deleted sensor %s %s", sensorID, name, extra={"room": self.__room, "resource": "sensors", "id": sensorID})
         
     def __createSensor(self, sensorData):
         name = sensorData["name"]
         sensorData["name"] = name.strip()[0:32]
         sensorData["recycle"] = True
-        tmp = requests.post(self.urlbase + "/sensors", json=sensorData)
-        if tmp.status_code != 200:
-            print("Data:", sensorData)
-            raise Exception("Cannot create sensor " + name + ": " + tmp.text)
-        result = json.loads(tmp.text)[0];
-        if not "success" in result:
-            print("Data:", sensorData)
-            raise Exception("Cannot create sensor " + name + ": " + tmp.text)
+        result = self.__call("POST", "sensors", sensorData, "Cannot create sensor " + name)[0]
         sensorID = result["success"]["id"]
-        self.__sensors_idx[name] = sensorID
         sensorData["owner"] = self.apiKey
-        self.__sensors[sensorID] = sensorData
-        print("Created sensor", sensorID, name)
+        with self.__indexLock:
+            self.__sensors_idx[name] = sensorID
+            self.__symbols.define(Ref("sensor", name), sensorID)
+            self.__sensors[sensorID] = sensorData
+        log.info("Created sensor %s %s", sensorID, name, extra={"room": self.__room, "resource": "sensors", "id": sensorID})
         return sensorID
 
     def __setGroupSensor(self, groupID, sensors):
         sensorData = {"sensors": sensors}
-        tmp = requests.put(self.urlbase + "/groups/" + groupID, json=sensorData)
-        if tmp.status_code != 200:
-            print("Data:", sensorData)
-            raise Exception("Cannot assign sensors to group " + groupID + ": " + tmp.text)
-        result = json.loads(tmp.text)[0];
-        if not "success" in result:
-            print("Data:", sensorData)
-            raise Exception("Cannot assign sensors to group " + groupID + ": " + tmp.text)
-        self.__groups[groupID]["sensors"] = sensors
-        print("Set sensors", sensors, "for group", groupID)
+        self.__call("PUT", "groups/" + groupID, sensorData, "Cannot assign sensors to group " + groupID)
+        with self.__indexLock:
+            self.__groups[groupID]["sensors"] = sensors
+        log.info("Set sensors %s for group %s", sensors, groupID, extra={"room": self.__room, "resource": "groups", "id": groupID})
+
+    def __createGroup(self, groupData):
+        name = groupData["name"]
+        result = self.__call("POST", "groups", groupData, "Cannot create group " + name)[0]
+        groupID = result["success"]["id"]
+        with self.__indexLock:
+            self.__groups[groupID] = groupData
+            self.__groups_idx[name] = groupID
+            self.__symbols.define(Ref("group", name), groupID)
+        log.info("Created group %s %s", groupID, name, extra={"room": self.__room, "resource": "groups", "id": groupID})
+        return groupID
 
     def __deleteRule(self, ruleID):
         name = self.__rules[ruleID]["name"]
-        tmp = requests.delete(self.urlbase + "/rules/" + ruleID)
-        if tmp.status_code != 200:
-            raise Exception("Cannot delete rule " + ruleID + "/" + name + ": " + tmp.text)
-        del self.__rules[ruleID]
-        print("Deleted rule", ruleID, name)
+        self.__call("DELETE", "rules/" + ruleID, None, "Cannot delete rule " + ruleID + "/" + name)
+        with self.__indexLock:
+            del self.__rules[ruleID]
+        log.info("Deleted rule %s %s", ruleID, name, extra={"room": self.__room, "resource": "rules", "id": ruleID})
         
     def __createRule(self, ruleData):
         fullname = ruleData["name"].strip()
@@ -298,53 +500,41 @@ class HueBridge():
         while len(bytes(name, "utf-8")) > 28:
             name = name[:-1]
         if name != fullname:
-            print("Data:", ruleData)
-            print("WARNING: Shortening rule name '" + fullname + "' to '" + name + "'")
+            log.warning("Shortening rule name '%s' to '%s', data: %s", fullname, name, ruleData, extra={"room": self.__room, "resource": "rules"})
         ruleData["name"] = name
         ruleData["recycle"] = True
-        tmp = requests.post(self.urlbase + "/rules", json=ruleData)
-        if tmp.status_code != 200:
-            print("Data:", ruleData)
-            raise Exception("Cannot create rule " + name + ": " + tmp.text)
-        result = json.loads(tmp.text)[0];
-        if not "success" in result:
-            raise Exception("Cannot create rule " + name + ": " + tmp.text)
+        result = self.__call("POST", "rules", ruleData, "Cannot create rule " + name)[0]
         ruleID = result["success"]["id"]
         ruleData["owner"] = self.apiKey
-        self.__rules[ruleID] = ruleData
-        print("Created rule", ruleID, name)
+        with self.__indexLock:
+            self.__rules[ruleID] = ruleData
+        log.info("Created rule %s %s", ruleID, name, extra={"room": self.__room, "resource": "rules", "id": ruleID})
         return ruleID
 
     def __deleteSchedule(self, scheduleID):
         name = self.__schedules[scheduleID]["name"]
-        tmp = requests.delete(self.urlbase + "/schedules/" + scheduleID)
-        if tmp.status_code != 200:
-            raise Exception("Cannot delete schedule " + scheduleID + "/" + name + ": " + tmp.text)
-        del self.__schedules[scheduleID]
-        del self.__schedules_idx[name]
-        print("Deleted schedule", scheduleID, name)
+        self.__call("DELETE", "schedules/" + scheduleID, None, "Cannot delete schedule " + scheduleID + "/" + name)
+        with self.__indexLock:
+            del self.__schedules[scheduleID]
+            del self.__schedules_idx[name]
+        log.info("Deleted schedule %s %s", scheduleID, name, extra={"room": self.__room, "resource": "schedules", "id": scheduleID})
 
     def __createSchedule(self, scheduleData):
         fullname = scheduleData["name"].strip()
         name = fullname[0:32]
         if name != fullname:
-            print("Data:", scheduleData)
-            print("WARNING: Shortening schedule name '" + fullname + "' to '" + name + "'")
+            log.warning("Shortening schedule name '%s' to '%s', data: %s", fullname, name, scheduleData, extra={"room": self.__room, "resource": "schedules"})
         scheduleData["name"] = name
         if not "recycle" in scheduleData:
             scheduleData["recycle"] = True
-        tmp = requests.post(self.urlbase + "/schedules", json=scheduleData)
-        if tmp.status_code != 200:
-            print("Data:", scheduleData)
-            raise Exception("Cannot create schedule " + name + ": " + tmp.text)
-        result = json.loads(tmp.text)[0];
-        if not "success" in result:
-            raise Exception("Cannot create schedule " + name + ": " + tmp.text)
+        result = self.__call("POST", "schedules", scheduleData, "Cannot create schedule " + name)[0]
         scheduleID = result["success"]["id"]
         scheduleData["owner"] = self.apiKey
-        self.__schedules[scheduleID] = scheduleData
-        self.__schedules_idx[name] = scheduleID
-        print("Created schedule", scheduleID, name)
+        with self.__indexLock:
+            self.__schedules[scheduleID] = scheduleData
+            self.__schedules_idx[name] = scheduleID
+            self.__symbols.define(Ref("schedule", name), scheduleID)
+        log.info("Created schedule %s %s", scheduleID, name, extra={"room": self.__room, "resource": "schedules", "id": scheduleID})
         return scheduleID
 
     def __createScene(self, groupID, body, recycle = True):
@@ -356,83 +546,55 @@ class HueBridge():
             lightstates = None
         if "lightstates" in body:
             del body["lightstates"]
-        r = requests.post(self.urlbase + "/scenes", json=body)
-        if r.status_code != 200:
-            print("Data:", body)
-            raise Exception("Cannot create scene '" + sceneName + "', text=" + r.text)
-        r.encoding = 'utf-8'
-        res = json.loads(r.text)
-        if not "success" in res[0]:
-            print("Data:", body)
-            raise Exception("Cannot create scene '" + sceneName + "', error: " + r.text)
+        res = self.__call("POST", "scenes", body, "Cannot create scene '" + sceneName + "'")
         sceneID = res[0]["success"]["id"]
         body["owner"] = self.apiKey
-        self.__scenes[sceneID] = body
-        if not groupID in self.__scenes_idx:
-            self.__scenes_idx[groupID] = {}
-        self.__scenes_idx[groupID][sceneName] = sceneID
+        with self.__indexLock:
+            self.__scenes[sceneID] = body
+            self.__scenes_idx.setdefault(groupID, {})[sceneName] = sceneID
         if lightstates:
             for i in lightstates.keys():
                 state = lightstates[i]
-                r = requests.put(self.urlbase + "/scenes/" + sceneID + "/lights/" + str(i) + "/state", json=state)
-                if r.status_code != 200:
-                    print("Data:", body)
-                    raise Exception("Cannot set up light " + str(i) + " in scene '" + sceneName + "', text=" + r.text)
-                r.encoding = 'utf-8'
-                res = json.loads(r.text)
-                if not "success" in res[0]:
-                    print("Data:", body)
-                    raise Exception("Cannot set up light " + str(i) + " in scene '" + sceneName + "', error: " + r.text)
-
-        print("Created scene", sceneID, sceneName, "for group", groupID)
+                self.__call("PUT", "scenes/" + sceneID + "/lights/" + str(i) + "/state", state,
+                            "Cannot set up light " + str(i) + " in scene '" + sceneName + "'")
+
+        log.info("Created scene %s %s for group %s", sceneID, sceneName, groupID, extra={"room": self.__room, "resource": "scenes", "id": sceneID})
         return sceneID
 
     def __updateScene(self, sceneID, updates):
-        r = requests.put(self.urlbase + "/scenes/" + sceneID, json=updates)
         sceneName = self.__scenes[sceneID]["name"]
-        if r.status_code != 200:
-            print("Data:", updates)
-            raise Exception("Cannot update scene '" + sceneName + "', text=" + r.text)
-        r.encoding = 'utf-8'
-        res = json.loads(r.text)
-        if not "success" in res[0]:
-            print("Data:", updates)
-            raise Exception("Cannot update scene '" + sceneName + "', error: " + r.text)
-
-        print("Updated scene", sceneID, sceneName)
+        self.__call("PUT", "scenes/" + sceneID, updates, "Cannot update scene '" + sceneName + "'")
+
+        log.info("Updated scene %s %s", sceneID, sceneName, extra={"room": self.__room, "resource": "scenes", "id": sceneID})
         for k, v in updates.items():
             self.__scenes[sceneID][k] = v
 
     def __deleteScene(self, groupID, sceneID):
         name = None
-        for n in self.__scenes_idx[groupID].keys():
-            if self.__scenes_idx[groupID][n] == sceneID:
-                name = n
-                break
-        tmp = requests.delete(self.urlbase + "/scenes/" + sceneID)
-        if tmp.status_code != 200:
-            raise Exception("Cannot delete scene " + sceneID + "/" + name + ": " + tmp.text)
-        del self.__scenes_idx[groupID][name]
-        del self.__scenes[sceneID]
-        print("Deleted scene", sceneID, name)
+        with self.__indexLock:
+            for n, i in self.__scenes_idx[groupID].items():
+                if i == sceneID:
+                    name = n
+                    break
+        self.__call("DELETE", "scenes/" + sceneID, None, "Cannot delete scene " + sceneID + "/" + name)
+        with self.__indexLock:
+            del self.__scenes_idx[groupID][name]
+            del self.__scenes[sceneID]
+        log.info("Deleted scene %s %s", sceneID, name, extra={"room": self.__room, "resource": "scenes", "id": sceneID})
 
     def __deleteSceneNoGID(self, sceneID):
         name = self.__scenes[sceneID]["name"]
-        tmp = requests.delete(self.urlbase + "/scenes/" + sceneID)
-        if tmp.status_code != 200:
-            raise Exception("Cannot delete scene " + sceneID + "/" + name + ": " + tmp.text)
+        self.__call("DELETE", "scenes/" + sceneID, None, "Cannot delete scene " + sceneID + "/" + name)
         #del self.__scenes_idx[groupID][name] -- NOTE: does not delete scene index
         del self.__scenes[sceneID]
-        print("Deleted scene", sceneID, name)
+        log.info("Deleted scene %s %s", sceneID, name, extra={"room": self.__room, "resource": "scenes", "id": sceneID})
 
     def __deleteResourceLink(self, linkID):
         name = self.__resourcelinks[linkID]["name"]
-        tmp = requests.delete(self.urlbase + "/resourcelinks/" + linkID)
-        if tmp.status_code != 200:
-            raise Exception("Cannot delete resource link " + linkID + "/" + name + ": " + tmp.text)
+        self.__call("DELETE", "resourcelinks/" + linkID, None, "Cannot delete resource link " + linkID + "/" + name)
         del self.__resourcelinks_idx[name]
         del self.__resourcelinks[linkID]
-        print("Deleted resource link", linkID, name)
+        log.info("Deleted resource link %s %s", linkID, name, extra={"room": self.__room, "resource": "resourcelinks", "id": linkID})
 
     def __ruleForSensorReset(self, v):
         """ Create rule for reset of sensor after timeout """
@@ -446,32 +608,32 @@ class HueBridge():
                     raise Exception("Missing group parameter for @off timeout")
                 groupID = self.__groups_idx[v["group"]]
                 conditions = [
-                    {
-                        "address": "/groups/" + groupID + "/state/any_on",
-                        "operator": "eq",
-                        "value": "false"
-                    }
+                    Condition(
+                        address="/groups/" + groupID + "/state/any_on",
+                        operator="eq",
+                        value="false"
+                    )
                 ]
-            ruleData = {
-                "name": name + "/timeout",
-                "status": "enabled",
-                "conditions": [
-                    {
-                        "address": "/sensors/${sensor:" + name + "}/state/status",
-                        "operator": "ddx",
-                        "value": "PT" + timeout
-                    }
+            ruleData = Rule(
+                name=name + "/timeout",
+                status="enabled",
+                conditions=[
+                    Condition(
+                        address="/sensors/" + Ref("sensor", name) + "/state/status",
+                        operator="ddx",
+                        value="PT" + timeout
+                    )
                 ] + conditions,
-                "actions": [
-                    {
-                        "address": "/sensors/${sensor:" + name + "}/state",
-                        "method": "PUT",
-                        "body": {
+                actions=[
+                    Action(
+                        address="/sensors/" + Ref("sensor", name) + "/state",
+                        method="PUT",
+                        body={
                             "status": 0
                         }
-                    }
+                    )
                 ]
-            }
+            )
             self.__rulesToCreate.append(ruleData)
 
     def __rulesForContact(self, v):
@@ -482,66 +644,64 @@ class HueBridge():
         name = v["name"]
         rules = []
         for i in [["open", openID, 0], ["closed", closedID, 1]]:
-            ruleData = {
-                "name": name + '/' + i[0],
-                "status": "enabled",
-                "conditions": [
-                    {
-                        "address": "/sensors/${sensor:" + name + "}/state/status",
-                        "operator": "eq",
-                        "value": str(1 - i[2])
-                    },
-                    {
-                        "address": "/sensors/" + self.__extinput + "/state/status",
-                        "operator": "eq",
-                        "value": i[1]
-                    },
-                    {
-                        "address": "/sensors/" + self.__extinput + "/state/lastupdated",
-                        "operator": "dx",
-                    }
+            ruleData = Rule(
+                name=name + '/' + i[0],
+                status="enabled",
+                conditions=[
+                    Condition(
+                        address="/sensors/" + Ref("sensor", name) + "/state/status",
+                        operator="eq",
+                        value=str(1 - i[2])
+                    ),
+                    Condition(
+                        address="/sensors/" + self.__extinput + "/state/status",
+                        operator="eq",
+                        value=i[1]
+                    ),
+                    Condition(
+                        address="/sensors/" + self.__extinput + "/state/lastupdated",
+                        operator="dx",
+                    )
                 ],
-                "actions": [
-                    {
-                        "address": "/sensors/${sensor:" + name + "}/state",
-                        "method": "PUT",
-                        "body": {
+                actions=[
+                    Action(
+                        address="/sensors/" + Ref("sensor", name) + "/state",
+                        method="PUT",
+                        body={
                             "status": i[2]
                         }
-                    },
-                    {
-                        "address": "/sensors/" + self.__extinput + "/state",
-                        "method": "PUT",
-                        "body": {
+                    ),
+                    Action(
+                        address="/sensors/" + self.__extinput + "/state",
+                        method="PUT",
+                        body={
                             "status": 1
                         }
-                    }
+                    )
                 ]
-            }
+            )
             rules.append(ruleData)
         self.__rulesToCreate += rules
 
-    def __replaceVariable(self, match):
-        tp = match.group(1)
-        name = match.group(2)
+    def __lookupReference(self, ref):
+        """ Look up ID of the object referenced by ref in indices (used by symbol table) """
+        tp = ref.kind
         if tp == "sensor":
-            return self.__sensors_idx[name]
+            return self.__sensors_idx[ref.key]
         elif tp == "group":
-            return self.__groups_idx[name]
+            return self.__groups_idx[ref.key]
         elif tp == "scene":
-            smatch = SCENE_PATTERN.search(name)
-            group = smatch.group(1)
-            scene = smatch.group(2)
+            group, scene = ref.key
             gid = self.__groups_idx[group]
             return self.__scenes_idx[gid][scene]
         elif tp == "schedule":
-            return self.__schedules_idx[name]
+            return self.__schedules_idx[ref.key]
         else:
-            raise Exception("Unknown variable type '" + tp + "' in replacement for '" + name + "'")
+            raise Exception("Unknown reference type '" + tp + "' in reference " + repr(ref))
         
-    def __parseCommon(self, desc, template = {}):
+    def __parseCommon(self, desc, template = None):
         """ Parse common settings and return a state object """
-        state = dict(template)
+        state = dict(template) if template else {}
         if "state" in desc:
             state["state"] = desc["state"]
         if "stateUse" in desc:
@@ -556,20 +716,20 @@ class HueBridge():
         """ Create redirect rule """
         value = binding["value"]
         resetActions = [
-                {
-                    "address": "/sensors/" + self.__extinput + "/state",
-                    "method": "PUT",
-                    "body": {
+                Action(
+                    address="/sensors/" + self.__extinput + "/state",
+                    method="PUT",
+                    body={
                         "status": int(value)
                     }
-                }
+                )
             ]
-        self.__rulesToCreate.append({
-            "name": name + "/" + ref + "=" + value,
-            "status": "enabled",
-            "conditions": conditions,
-            "actions": actions + resetActions
-        })
+        self.__rulesToCreate.append(Rule(
+            name=name + "/" + ref + "=" + value,
+            status="enabled",
+            conditions=conditions,
+            actions=actions + resetActions
+        ))
         
     def __singleSceneRules(self, config, name, state, conditions, actions):
         """ Rules for a single item in scene/multi-scene config """
@@ -580,13 +740,13 @@ class HueBridge():
         sceneActions = []
         if scene == "off":
             sceneActions = [
-                {
-                    "address": "/groups/" + groupID + "/action",
-                    "method": "PUT",
-                    "body": {
+                Action(
+                    address="/groups/" + groupID + "/action",
+                    method="PUT",
+                    body={
                         "on": False
                     }
-                }
+                )
             ]
         elif scene == "dim":
             value = config["value"]
@@ -594,29 +754,29 @@ class HueBridge():
             if "tt" in config:
                 body["transitiontime"] = config["tt"]
             sceneActions = [
-                {
-                    "address": "/groups/" + groupID + "/action",
-                    "method": "PUT",
-                    "body": body
-                }
+                Action(
+                    address="/groups/" + groupID + "/action",
+                    method="PUT",
+                    body=body
+                )
             ]
         else:
             sceneID = self.__scenes_idx[groupID][scene]
             sceneActions = [
-                {
-                    "address": "/groups/" + groupID + "/action",
-                    "method": "PUT",
-                    "body": {
+                Action(
+                    address="/groups/" + groupID + "/action",
+                    method="PUT",
+                    body={
                         "scene": sceneID
                     }
-                }
+                )
             ]
-        self.__rulesToCreate.append({
-            "name": name,
-            "status": "enabled",
-            "conditions": conditions,
-            "actions": actions + sceneActions
-        })
+        self.__rulesToCreate.append(Rule(
+            name=name,
+            status="enabled",
+            conditions=conditions,
+            actions=actions + sceneActions
+        ))
         
     def __sceneRules(self, binding, name, ref, state, conditions, actions):
         """ Rules for switching to a scene """
@@ -641,6 +801,7 @@ class HueBridge():
 
         # by default, if the group is off, consider it being state reset
         useGroupOffForReset = True
+        firstRule = len(self.__rulesToCreate)
 
         resetstateactions = []
         group = state["group"]
@@ -648,11 +809,11 @@ class HueBridge():
 
         if "state" in state:
             resetstateactions = [
-                {
-                    "address": "/sensors/${sensor:" + state["state"] + "}/state",
-                    "method": "PUT",
-                    "body": { "status": 0 }
-                }
+                Action(
+                    address="/sensors/" + Ref("sensor", state["state"]) + "/state",
+                    method="PUT",
+                    body={ "status": 0 }
+                )
             ]
             if "reset" in binding:
                 resetType = binding["reset"]
@@ -665,21 +826,21 @@ class HueBridge():
                     useGroupOffForReset = False
                     # TODO once OR rules are possible, then use OR with state <= 0 to detect off state in action rules below
                     self.__rulesToCreate.append(
-                        {
-                            "name": name + "/" + ref + "/grpoff",
-                            "conditions": [
-                                {
-                                    "address": "/groups/" + groupID + "/state/any_on",
-                                    "operator": "eq",
-                                    "value": "false"
-                                },
-                                {
-                                    "address": "/groups/" + groupID + "/state/any_on",
-                                    "operator": "dx"
-                                }
+                        Rule(
+                            name=name + "/" + ref + "/grpoff",
+                            conditions=[
+                                Condition(
+                                    address="/groups/" + groupID + "/state/any_on",
+                                    operator="eq",
+                                    value="false"
+                                ),
+                                Condition(
+                                    address="/groups/" + groupID + "/state/any_on",
+                                    operator="dx"
+                                )
                             ],
-                            "actions": resetstateactions
-                        }
+                            actions=resetstateactions
+                        )
                     )
 
         toggleCond = []
@@ -690,30 +851,30 @@ class HueBridge():
             
             # toggle action - only use the rules if the light is off
             toggleCond = [
-                {
-                    "address": "/groups/" + groupID + "/state/any_on",
-                    "operator": "eq",
-                    "value": "false"
-                }
+                Condition(
+                    address="/groups/" + groupID + "/state/any_on",
+                    operator="eq",
+                    value="false"
+                )
             ]
             # rule to turn off the light, if any in group on
-            rule = {
-                "name": name + "/" + ref + "/off",
-                "conditions": conditions + [{
-                        "address": "/groups/" + groupID + "/state/any_on",
-                        "operator": "eq",
-                        "value": "true"
-                    }],
-                "actions": resetstateactions + [
-                    {
-                        "address": "/groups/" + groupID + "/action",
-                        "method": "PUT",
-                        "body": {
+            rule = Rule(
+                name=name + "/" + ref + "/off",
+                conditions=conditions + [Condition(
+                        address="/groups/" + groupID + "/state/any_on",
+                        operator="eq",
+                        value="true"
+                    )],
+                actions=resetstateactions + [
+                    Action(
+                        address="/groups/" + groupID + "/action",
+                        method="PUT",
+                        body={
                             "on": False
                         }
-                    }
+                    )
                 ]
-            }
+            )
             self.__rulesToCreate.append(rule)
 
         if "setstate" in binding:
@@ -725,15 +886,15 @@ class HueBridge():
             if secondaryState:
                 idx = -idx
             resetstateactions = [
-                {
-                    "address": "/sensors/${sensor:" + state["state"] + "}/state",
-                    "method": "PUT",
-                    "body": { "status": idx }
-                }
+                Action(
+                    address="/sensors/" + Ref("sensor", state["state"]) + "/state",
+                    method="PUT",
+                    body={ "status": idx }
+                )
             ]
 
         for config in configs:
-            print("Process",name,index,config)
+            log.debug("Process %s %s %s", name, index, config, extra={"room": self.__room})
             cname = name + "/" + ref;
             nextIndex = index + 1
             prevIndex = index
@@ -749,27 +910,27 @@ class HueBridge():
                 if prevIndex != 0:
                     # rule based on previous state (for multiple presses)
                     stateCond = [
-                        {
-                            "address": "/sensors/${sensor:" + state["state"] + "}/state/status",
-                            "operator": "eq",
-                            "value": str(-prevIndex if secondaryState else prevIndex)
-                        }
+                        Condition(
+                            address="/sensors/" + Ref("sensor", state["state"]) + "/state/status",
+                            operator="eq",
+                            value=str(-prevIndex if secondaryState else prevIndex)
+                        )
                     ]
                     if useGroupOffForReset:
-                        stateCond.append({
-                            "address": "/groups/" + groupID + "/state/any_on",
-                            "operator": "eq",
-                            "value": "true"
-                        })
+                        stateCond.append(Condition(
+                            address="/groups/" + groupID + "/state/any_on",
+                            operator="eq",
+                            value="true"
+                        ))
 
                     stateAction = [
-                        {
-                            "address": "/sensors/${sensor:" + state["state"] + "}/state",
-                            "method": "PUT",
-                            "body": {
+                        Action(
+                            address="/sensors/" + Ref("sensor", state["state"]) + "/state",
+                            method="PUT",
+                            body={
                                 "status": -nextIndex if secondaryState else nextIndex
                             }
-                        }
+                        )
                     ]
                     self.__singleSceneRules(config, cname, state, stateCond + conditions + toggleCond, stateAction + actions)
                 
@@ -780,37 +941,38 @@ class HueBridge():
                 for timerange in times:
                     # time indices are 1-based, therefore add 1
                     if times[timerange] == index + 1:
+                        periodCond = self.__periodCondition(times, timerange) if self.periodSensors else None
                         stateCond = [
-                            {
-                                "address": "/config/localtime",
-                                "operator": "in",
-                                "value": timerange
-                            }
+                            periodCond if periodCond else Condition(
+                                address="/config/localtime",
+                                operator="in",
+                                value=timerange
+                            )
                         ]
                         stateAction = resetstateactions
                         if multistate and "state" in state:
                             # only trigger if light not yet on
                             stateCond += [
-                                {
-                                    "address": "/groups/" + groupID + "/state/any_on",
-                                    "operator": "eq",
-                                    "value": "false"
-                                }
+                                Condition(
+                                    address="/groups/" + groupID + "/state/any_on",
+                                    operator="eq",
+                                    value="false"
+                                )
                             ] if useGroupOffForReset else [
-                                {
-                                    "address": "/sensors/${sensor:" + state["state"] + "}/state/status",
-                                    "operator": "gt" if secondaryState else "lt",
-                                    "value": str(-1 if secondaryState else 1)
-                                }
+                                Condition(
+                                    address="/sensors/" + Ref("sensor", state["state"]) + "/state/status",
+                                    operator="gt" if secondaryState else "lt",
+                                    value=str(-1 if secondaryState else 1)
+                                )
                             ]
                             stateAction = [
-                                {
-                                    "address": "/sensors/${sensor:" + state["state"] + "}/state",
-                                    "method": "PUT",
-                                    "body": {
+                                Action(
+                                    address="/sensors/" + Ref("sensor", state["state"]) + "/state",
+                                    method="PUT",
+                                    body={
                                         "status": -nextIndex if secondaryState else nextIndex
                                     }
-                                }
+                                )
                             ]
                         self.__singleSceneRules(config, cname + "/T" + str(tidx), state, conditions + stateCond + toggleCond, stateAction + actions)
                     tidx = tidx + 1
@@ -818,26 +980,26 @@ class HueBridge():
                 if multistate and "state" in state:
                     # single rule to turn scene #0 if not on
                     stateCond = [
-                        {
-                            "address": "/groups/" + groupID + "/state/any_on",
-                            "operator": "eq",
-                            "value": "false"
-                        }
+                        Condition(
+                            address="/groups/" + groupID + "/state/any_on",
+                            operator="eq",
+                            value="false"
+                        )
                     ] if useGroupOffForReset else [
-                        {
-                            "address": "/sensors/${sensor:" + state["state"] + "}/state/status",
-                            "operator": "gt" if secondaryState else "lt",
-                            "value": str(-1 if secondaryState else 1)
-                        }
+                        Condition(
+                            address="/sensors/" + Ref("sensor", state["state"]) + "/state/status",
+                            operator="gt" if secondaryState else "lt",
+                            value=str(-1 if secondaryState else 1)
+                        )
                     ]
                     stateAction = [
-                        {
-                            "address": "/sensors/${sensor:" + state["state"] + "}/state",
-                            "method": "PUT",
-                            "body": {
+                        Action(
+                            address="/sensors/" + Ref("sensor", state["state"]) + "/state",
+                            method="PUT",
+                            body={
                                 "status": -1 if secondaryState else 1
                             }
-                        }
+                        )
                     ]
                     self.__singleSceneRules(config, cname + "/in", state, conditions + stateCond + toggleCond, actions + stateAction)
                 else:
@@ -847,14 +1009,15 @@ class HueBridge():
                         # there is a global timeout in binding, so we need to set state to nonzero
                         if "state" in state:
                             stateactions = [
-                                {
-                                    "address": "/sensors/${sensor:" + state["state"] + "}/state",
-                                    "method": "PUT",
-                                    "body": { "status": -1 }
-                                }
+                                Action(
+                                    address="/sensors/" + Ref("sensor", state["state"]) + "/state",
+                                    method="PUT",
+                                    body={ "status": -1 }
+                                )
                             ]
                         else:
-                            print("WARNING: single-scene timeout on '" + name + "' will not be interrupted by changing light state by unrelated action, use state variable")
+                            log.warning("Single-scene timeout on '%s' will not be interrupted by changing light state by unrelated action, use state variable", name,
+                                        extra={"room": self.__room})
                             stateactions = []
                     self.__singleSceneRules(config, cname, state, conditions + toggleCond, stateactions + actions)
 
@@ -866,48 +1029,49 @@ class HueBridge():
                 groupID = self.__groups_idx[group]
                 if "state" in state and multistate:
                     stateCond = [
-                        {
-                            "address": "/sensors/${sensor:" + state["state"] + "}/state/status",
-                            "operator": "eq",
-                            "value": str(-nextIndex if secondaryState else nextIndex)
-                        },
-                        {
-                            "address": "/sensors/${sensor:" + state["state"] + "}/state/lastupdated",
-                            "operator": "ddx",
-                            "value": timeout
-                        }
+                        Condition(
+                            address="/sensors/" + Ref("sensor", state["state"]) + "/state/status",
+                            operator="eq",
+                            value=str(-nextIndex if secondaryState else nextIndex)
+                        ),
+                        Condition(
+                            address="/sensors/" + Ref("sensor", state["state"]) + "/state/lastupdated",
+                            operator="ddx",
+                            value=timeout
+                        )
                     ]
                 elif not multistate:
                     # single-state, simply turn off after a timeout
-                    print("WARNING: single-state timeout on '" + name + "' will not be interrupted by changing light state by pressing switch again")
+                    log.warning("Single-state timeout on '%s' will not be interrupted by changing light state by pressing switch again", name,
+                                extra={"room": self.__room})
                     stateCond = [
-                        {
-                            "address": "/groups/" + groupID + "/state/any_on",
-                            "operator": "ddx",
-                            "value": timeout
-                        }
+                        Condition(
+                            address="/groups/" + groupID + "/state/any_on",
+                            operator="ddx",
+                            value=timeout
+                        )
                     ]
                 else:
                     # multistate, based on time
                     raise Exception("Support for time-based multistate timeout w/o state variable not implemented, add state variable to '" + name + "'")
 
-                rule = {
-                    "name": cname + "/TO" + str(index),
-                    "conditions": stateCond + toggleCond + [{
-                            "address": "/groups/" + groupID + "/state/any_on",
-                            "operator": "eq",
-                            "value": "true"
-                        }],
-                    "actions": resetstateactions + [
-                        {
-                            "address": "/groups/" + groupID + "/action",
-                            "method": "PUT",
-                            "body": {
+                rule = Rule(
+                    name=cname + "/TO" + str(index),
+                    conditions=stateCond + toggleCond + [Condition(
+                            address="/groups/" + groupID + "/state/any_on",
+                            operator="eq",
+                            value="true"
+                        )],
+                    actions=resetstateactions + [
+                        Action(
+                            address="/groups/" + groupID + "/action",
+                            method="PUT",
+                            body={
                                 "on": False
                             }
-                        }
+                        )
                     ]
-                }
+                )
                 self.__rulesToCreate.append(rule)
 
             index = index + 1
@@ -915,120 +1079,245 @@ class HueBridge():
         if "timeout" in binding:
             # global timeout for this binding, requires state being nonzero
             timeout = "PT" + binding["timeout"]
-            cond = [{
-                "address": "/groups/" + groupID + "/state/any_on",
-                "operator": "eq",
-                "value": "true"
-            }]
+            cond = [Condition(
+                address="/groups/" + groupID + "/state/any_on",
+                operator="eq",
+                value="true"
+            )]
             act = resetstateactions + [
-                {
-                    "address": "/groups/" + groupID + "/action",
-                    "method": "PUT",
-                    "body": {
+                Action(
+                    address="/groups/" + groupID + "/action",
+                    method="PUT",
+                    body={
                         "on": False
                     }
-                }
+                )
             ]
             if "state" in state:
                 cond += [
-                    {
-                        "address": "/sensors/${sensor:" + state["state"] + "}/state/lastupdated",
-                        "operator": "ddx",
-                        "value": timeout
-                    }
+                    Condition(
+                        address="/sensors/" + Ref("sensor", state["state"]) + "/state/lastupdated",
+                        operator="ddx",
+                        value=timeout
+                    )
                 ]
                 # we use -1 for state of a single-scene
-                self.__rulesToCreate.append({
-                    "name": cname + "/TO",
-                    "conditions": cond + [{
-                        "address": "/sensors/${sensor:" + state["state"] + "}/state/status",
-                        "operator": "lt",
-                        "value": "0"
-                    }],
-                    "actions": act
-                })
+                self.__rulesToCreate.append(Rule(
+                    name=cname + "/TO",
+                    conditions=cond + [Condition(
+                        address="/sensors/" + Ref("sensor", state["state"]) + "/state/status",
+                        operator="lt",
+                        value="0"
+                    )],
+                    actions=act
+                ))
             else:
-                rule = {
-                    "name": cname + "/TO",
-                    "conditions": cond + [
-                        {
-                            "address": "/groups/" + groupID + "/state/any_on",
-                            "operator": "ddx",
-                            "value": timeout
-                        }
+                rule = Rule(
+                    name=cname + "/TO",
+                    conditions=cond + [
+                        Condition(
+                            address="/groups/" + groupID + "/state/any_on",
+                            operator="ddx",
+                            value=timeout
+                        )
                     ],
-                    "actions": act
-                }
+                    actions=act
+                )
                 self.__rulesToCreate.append(rule)
-            
-        
+
+        self.__collapseRules(firstRule)
+
+    @staticmethod
+    def __mergeValues(condition, values):
+        """
+        Return list of (values, conditions) pairs with conditions replacing condition for the values (or None)
+
+        Integer values of eq conditions are merged to contiguous gt/lt ranges, adjacent time ranges of
+        localtime conditions are joined (a whole day is represented by no condition).
+        """
+        values = set(values)
+        if condition.operator == "eq":
+            try:
+                numbers = sorted(set(int(v) for v in values))
+            except ValueError:
+                return None
+            runs = []
+            for n in numbers:
+                if runs and runs[-1][1] == n - 1:
+                    runs[-1][1] = n
+                else:
+                    runs.append([n, n])
+            return [(set(v for v in values if lo <= int(v) <= hi),
+                     [Condition(address=condition.address, operator="eq", value=str(lo))] if lo == hi else [
+                        Condition(address=condition.address, operator="gt", value=str(lo - 1)),
+                        Condition(address=condition.address, operator="lt", value=str(hi + 1))
+                    ]) for lo, hi in runs]
+        if condition.operator == "in" and condition.address == "/config/localtime":
+            ranges = []
+            for v in sorted(values):
+                m = re.match('^(T[0-9:]+)/(T[0-9:]+)$', v)
+                if not m:
+                    return None
+                ranges.append([m.group(1), m.group(2), set([v])])
+            merged = True
+            while merged:
+                merged = False
+                for a in ranges:
+                    for b in ranges:
+                        if a is not b and a[1] == b[0] and a[0] != a[1]:
+                            a[1] = b[1]
+                            a[2] |= b[2]
+                            ranges.remove(b)
+                            merged = True
+                            break
+                    if merged:
+                        break
+            return [(covered, [] if begin == end else [Condition(address=condition.address, operator="in", value=begin + "/" + end)])
+                    for begin, end, covered in ranges]
+        return None
+
+    def __collapseRules(self, start):
+        """
+        Merge equivalent rules created since index start
+
+        Rules with the same actions, which differ only in the value of a single condition on the state
+        sensor (or another integer status) or on the time of day, are replaced by rules with a range
+        condition (see __mergeValues). This collapses, e.g., timeout rules of all states of a multistate
+        scene with the same timeout into a single rule.
+        """
+        rules = self.__rulesToCreate[start:]
+        changed = True
+        while changed:
+            changed = False
+            candidates = {}
+            for rule in rules:
+                for pos, c in enumerate(rule.conditions):
+                    if c.operator in ("eq", "in"):
+                        key = (tuple(rule.actions), rule.status, pos, c.address, c.operator,
+                               tuple(rule.conditions[:pos]), tuple(rule.conditions[pos + 1:]))
+                        candidates.setdefault(key, []).append(rule)
+            for key, group in candidates.items():
+                pos = key[2]
+                merged = HueBridge.__mergeValues(group[0].conditions[pos], [r.conditions[pos].value for r in group]) if len(group) > 1 else None
+                if merged is None or len(merged) == len(group):
+                    continue
+                if any(len(group[0].conditions) - 1 + len(m[1]) > MAX_CONDITIONS for m in merged):
+                    continue
+                replacements = {}
+                for covered, mergedConditions in merged:
+                    # merged rule replaces the first of the rules it covers
+                    first = next(r for r in group if r.conditions[pos].value in covered)
+                    replacements[id(first)] = Rule(
+                        name=first.name,
+                        status=first.status,
+                        conditions=first.conditions[:pos] + mergedConditions + first.conditions[pos + 1:],
+                        actions=first.actions
+                    )
+                log.debug("Merged %d rules %s to %d", len(group), group[0].name, len(merged), extra={"room": self.__room})
+                dropped = set(id(r) for r in group)
+                rules = [replacements.get(id(r), r) for r in rules if id(r) in replacements or not id(r) in dropped]
+                changed = True
+                break
+        self.__rulesToCreate[start:] = rules
+
     def __lightRules(self, binding, name, ref, state, conditions, actions):
-        """ Rules for switching a single light """
+        """ Rules for switching a single light or several lights together (via a light group) """
         state = self.__parseCommon(binding, state)
-        lightID = self.findLight(binding["light"])
+        lightIDs = []
+        for light in binding["lights"] if "lights" in binding else [binding["light"]]:
+            lightID = self.findLight(light)
+            if not lightID in lightIDs:
+                lightIDs.append(lightID)
+        if len(lightIDs) == 1:
+            lightAddress = "/lights/" + lightIDs[0] + "/state"
+            onAddress = lightAddress + "/on"
+        else:
+            # single group command instead of one command per light
+            groupAddress = "/groups/" + self.__lightGroup(lightIDs)
+            lightAddress = groupAddress + "/action"
+            onAddress = groupAddress + "/state/any_on"
         action = binding["action"]
         if action == "on" or action == "off":
             lightActions = [
-                {
-                    "address": "/lights/" + lightID + "/state",
-                    "method": "PUT",
-                    "body": {
+                Action(
+                    address=lightAddress,
+                    method="PUT",
+                    body={
                         "on": True if action == "on" else False
                     }
-                }
+                )
             ]
 
-            rule = {
-                "name": name + "/" + ref + "/" + action,
-                "status": "enabled",
-                "conditions": conditions,
-                "actions": actions + lightActions
-            }
+            rule = Rule(
+                name=name + "/" + ref + "/" + action,
+                status="enabled",
+                conditions=conditions,
+                actions=actions + lightActions
+            )
             self.__rulesToCreate.append(rule)
         elif action == "toggle":
             lightActions = [
-                {
-                    "address": "/lights/" + lightID + "/state",
-                    "method": "PUT",
-                    "body": { "on": True }
-                }
+                Action(
+                    address=lightAddress,
+                    method="PUT",
+                    body={ "on": True }
+                )
             ]
-            rule = {
-                "name": name + "/" + ref + "/on",
-                "status": "enabled",
-                "conditions": conditions + [
-                    {
-                        "address": "/lights/" + lightID + "/state/on",
-                        "operator": "eq",
-                        "value": "false"
-                    }
+            rule = Rule(
+                name=name + "/" + ref + "/on",
+                status="enabled",
+                conditions=conditions + [
+                    Condition(
+                        address=onAddress,
+                        operator="eq",
+                        value="false"
+                    )
                 ],
-                "actions": actions + lightActions
-            }
+                actions=actions + lightActions
+            )
             self.__rulesToCreate.append(rule)
             lightActions = [
-                {
-                    "address": "/lights/" + lightID + "/state",
-                    "method": "PUT",
-                    "body": { "on": False }
-                }
+                Action(
+                    address=lightAddress,
+                    method="PUT",
+                    body={ "on": False }
+                )
             ]
-            rule = {
-                "name": name + "/" + ref + "/off",
-                "status": "enabled",
-                "conditions": conditions + [
-                    {
-                        "address": "/lights/" + lightID + "/state/on",
-                        "operator": "eq",
-                        "value": "true"
-                    }
+            rule = Rule(
+                name=name + "/" + ref + "/off",
+                status="enabled",
+                conditions=conditions + [
+                    Condition(
+                        address=onAddress,
+                        operator="eq",
+                        value="true"
+                    )
                 ],
-                "actions": actions + lightActions
-            }
+                actions=actions + lightActions
+            )
             self.__rulesToCreate.append(rule)
         else:
             raise Exception("Invalid action '" + action + "', expected on/off/toggle")
 
+    def __lightGroup(self, lightIDs):
+        """
+        Return reference to a group of exactly the given lights
+
+        Groups are named by the set of lights, so an existing group is reused by all bindings
+        switching the same lights. A missing group is created on commit as LightGroup.
+        """
+        lights = sorted(lightIDs, key=lambda l: (len(l), l))
+        groupName = "Group for lights {:08x}".format(zlib.crc32(",".join(lights).encode("utf-8")))
+        if groupName in self.__groups_idx:
+            existing = sorted(self.__groups[self.__groups_idx[groupName]]["lights"], key=lambda l: (len(l), l))
+            if existing != lights:
+                raise Exception("Group '" + groupName + "' exists with lights " + repr(existing) + " instead of " + repr(lights))
+            if not self.__groups_idx[groupName] in self.__groupsToAdd:
+                self.__groupsToAdd.append(self.__groups_idx[groupName])
+        elif not groupName in self.__groupsToCreate:
+            self.__groupsToCreate[groupName] = GroupSpec(groupName, lights)
+        return Ref("group", groupName)
+
     def __dimRules(self, binding, name, ref, state, conditions, actions):
         """ Rules for dimming or lightening a group """
         state = self.__parseCommon(binding, state)
@@ -1040,22 +1329,38 @@ class HueBridge():
         body = { "bri_inc" : value }
         if tt != 0:
             body["transitiontime"] = tt
-        rule = {
-            "name": name + "/" + ref,
-            "status": "enabled",
-            "conditions": conditions,
-            "actions": actions + [
-                {
-                    "address": "/groups/" + groupID + "/action",
-                    "method": "PUT",
-                    "body": body
-                }
+        rule = Rule(
+            name=name + "/" + ref,
+            status="enabled",
+            conditions=conditions,
+            actions=actions + [
+                Action(
+                    address="/groups/" + groupID + "/action",
+                    method="PUT",
+                    body=body
+                )
             ]
-        }
+        )
         self.__rulesToCreate.append(rule)
 
-    def __createRulesForAction(self, binding, name, ref, state, conditions = [], actions = [], resetstateactions = []):
+    def __createRulesForAction(self, binding, name, ref, state, conditions = None, actions = None, resetstateactions = None):
+        conditions = conditions if conditions is not None else []
+        actions = actions if actions is not None else []
+        resetstateactions = resetstateactions if resetstateactions is not None else []
         if type(binding) == list:
+            # lights turned on or off by the same binding are switched together (see __lightRules), toggle
+            # depends on the state of each light, so it is only combined if requested explicitly by "lights"
+            merged = []
+            combined = {}
+            for item in binding:
+                if type(item) == dict and item.get("type") == "light" and set(item.keys()) == set(["type", "light", "action"]) \
+                        and item["action"] in ["on", "off"]:
+                    if item["action"] in combined:
+                        combined[item["action"]]["lights"].append(item["light"])
+                        continue
+                    item = combined[item["action"]] = {"type": "light", "lights": [item["light"]], "action": item["action"]}
+                merged.append(item)
+            binding = merged
             # create rule for each action
             for item in binding:
                 self.__createRulesForAction(item, name, ref, state, conditions, actions, resetstateactions)
@@ -1069,11 +1374,11 @@ class HueBridge():
         tp = binding["type"]
         if "state" in state and len(resetstateactions) == 0:
             resetstateactions = [
-                {
-                    "address": "/sensors/${sensor:" + state["state"] + "}/state",
-                    "method": "PUT",
-                    "body": { "status": 0 }
-                }
+                Action(
+                    address="/sensors/" + Ref("sensor", state["state"]) + "/state",
+                    method="PUT",
+                    body={ "status": 0 }
+                )
             ]
         if tp == "redirect":
             # NOTE: explicitly ignore passed actions, since they reset external input to 1, when called for external
@@ -1110,44 +1415,44 @@ class HueBridge():
         for button in bindings.keys():
             binding = bindings[button]
             conditions = [
-                {
-                    "address": "/sensors/${sensor:" + switchName + "}/state/lastupdated",
-                    "operator": "dx"
-                }
+                Condition(
+                    address="/sensors/" + Ref("sensor", switchName) + "/state/lastupdated",
+                    operator="dx"
+                )
             ]
             if button == "brighter-any-release":
                 conditions += [
-                    {
-                        "address": "/sensors/${sensor:" + switchName + "}/state/buttonevent",
-                        "operator": "gt",
-                        "value": "2001"
-                    },
-                    {
-                        "address": "/sensors/${sensor:" + switchName + "}/state/buttonevent",
-                        "operator": "lt",
-                        "value": "2004"
-                    }
+                    Condition(
+                        address="/sensors/" + Ref("sensor", switchName) + "/state/buttonevent",
+                        operator="gt",
+                        value="2001"
+                    ),
+                    Condition(
+                        address="/sensors/" + Ref("sensor", switchName) + "/state/buttonevent",
+                        operator="lt",
+                        value="2004"
+                    )
                 ]
             elif button == "darker-any-release":
                 conditions += [
-                    {
-                        "address": "/sensors/${sensor:" + switchName + "}/state/buttonevent",
-                        "operator": "gt",
-                        "value": "3001"
-                    },
-                    {
-                        "address": "/sensors/${sensor:" + switchName + "}/state/buttonevent",
-                        "operator": "lt",
-                        "value": "3004"
-                    }
+                    Condition(
+                        address="/sensors/" + Ref("sensor", switchName) + "/state/buttonevent",
+                        operator="gt",
+                        value="3001"
+                    ),
+                    Condition(
+                        address="/sensors/" + Ref("sensor", switchName) + "/state/buttonevent",
+                        operator="lt",
+                        value="3004"
+                    )
                 ]
             else:
                 conditions.append(
-                    {
-                        "address": "/sensors/${sensor:" + switchName + "}/state/buttonevent",
-                        "operator": "eq",
-                        "value": HueBridge.__mapButton(button)
-                    }
+                    Condition(
+                        address="/sensors/" + Ref("sensor", switchName) + "/state/buttonevent",
+                        operator="eq",
+                        value=HueBridge.__mapButton(button)
+                    )
                 )
             self.__createRulesForAction(binding, switchName, button, state, conditions, [])
         
@@ -1158,26 +1463,26 @@ class HueBridge():
         name = desc["name"]
         self.__rulesToDelete += self.findRulesForExternalID(bindings.keys()) # get rid of old rules for bindings
         actions = [
-            {
-                "address": "/sensors/" + self.__extinput + "/state",
-                "method": "PUT",
-                "body": {
+            Action(
+                address="/sensors/" + self.__extinput + "/state",
+                method="PUT",
+                body={
                     "status": 1
                 }
-            }
+            )
         ]
         for extID in bindings.keys():
             binding = bindings[extID]
             conditions = [
-                {
-                    "address": "/sensors/" + self.__extinput + "/state/lastupdated",
-                    "operator": "dx"
-                },
-                {
-                    "address": "/sensors/" + self.__extinput + "/state/status",
-                    "operator": "eq",
-                    "value": extID
-                }
+                Condition(
+                    address="/sensors/" + self.__extinput + "/state/lastupdated",
+                    operator="dx"
+                ),
+                Condition(
+                    address="/sensors/" + self.__extinput + "/state/status",
+                    operator="eq",
+                    value=extID
+                )
             ]
             self.__createRulesForAction(binding, name, extID, state, conditions, actions)
             
@@ -1270,6 +1575,9 @@ class HueBridge():
             - "off" - turn off the lights (default: all lights in the group off)
             - "dim" - what to do on timeout (default: dim all lights in the group by 50%)
             - "recover" - what to do when motion detected in dimmed state (default: recover scene before dimming)
+
+        The rules are described by a transition table, which is minimized and compiled to conditions
+        by hue.motion.MotionCompiler (e.g., conditions implied by the state are dropped).
         """
 
         state = self.__parseCommon(desc)
@@ -1307,6 +1615,8 @@ class HueBridge():
             "type": "state",
             "name": stateSensorName
         })
+        # schedule resetting the state sensor (see rule(10)) is recreated below
+        self.__prepareDeleteSchedule(stateSensorName)
         
         # recovery scene handling
         sceneName = name + " recover"
@@ -1314,15 +1624,11 @@ class HueBridge():
         sceneID = None
         if not "recover" in bindings:
             # create new scene for the group to store light state to recover, but only if needed
-            body = {
-                "name": sceneName,
-                "lights": self.__groups[groupID]["lights"]
-                #"group": groupID
-            }
+            body = SceneSpec(sceneName, self.__groups[groupID]["lights"])
             if not groupID in self.__scenesToCreate:
                 self.__scenesToCreate[groupID] = []
             self.__scenesToCreate[groupID].append(body)
-            sceneID = "${scene:" + groupName + ":" + sceneName + "}"
+            sceneID = Ref("scene", groupName, sceneName)
 
         onactions = None
         offactions = None
@@ -1350,442 +1656,248 @@ class HueBridge():
             else:
                 raise Exception("Unsupported recover action redirect '" + recoveractions + "' for motion sensor")
 
-        contactName = None
-        contactOpenCond = []
-        contactClosedCond = []
+        # attributes used in the transition table (see hue.motion)
+        stateSensor = "/sensors/" + Ref("sensor", stateSensorName) + "/state"
+        addresses = {
+            "presence": presenceSensorAddress,
+            "dark": darkSensorAddress,
+            "any_on": "/groups/" + groupID + "/state/any_on",
+            "state": stateSensor + "/status",
+            "state.lastupdated": stateSensor + "/lastupdated"
+        }
+        resources = {
+            "state": stateSensor
+        }
         if "contact" in desc:
-            contactName = desc["contact"]
-            contactOpenCond = [
-                {
-                    "address": "/sensors/${sensor:" + contactName + "}/state/status",
-                    "operator": "eq",
-                    "value": "0"
-                }]
-            contactClosedCond = [
-                {
-                    "address": "/sensors/${sensor:" + contactName + "}/state/status",
-                    "operator": "eq",
-                    "value": "1"
-                }]
-
-
-        # handling for states <=0
-        
-        # rule(1): motion detected in dark and lights off: turn on lights and switch to state 1
-        conditions = [
-            {
-                "address": presenceSensorAddress,
-                "operator": "eq",
-                "value": "true"
-            },
-            {
-                "address": darkSensorAddress,
-                "operator": "eq",
-                "value": "true"
-            },
-            # NOTE: react only if not blocked by switch
-            {
-                "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                "operator": "gt",
-                "value": "-2"
-            },
-            {
-                "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                "operator": "lt",
-                "value": "1"
-            },
-            # NOTE: only turn on if it was off at least for a second. This prevents
-            # a situation where light on redirects to a rule is after light off rule,
-            # effectively making turning light off impossible.
-            {
-                "address": "/groups/${group:" + groupName + "}/state/any_on",
-                "operator": "stable",
-                "value": "PT00:00:01"
-            }
-        ]
-        actions = [
-            {
-                "address": "/sensors/${sensor:" + stateSensorName + "}/state",
-                "method": "PUT",
-                "body": {
-                    "status": 2
-                }
-            }
-        ]
+            contactSensor = "/sensors/" + Ref("sensor", desc["contact"]) + "/state"
+            addresses["contact"] = contactSensor + "/status"
+            addresses["contact.lastupdated"] = contactSensor + "/lastupdated"
+            resources["contact"] = contactSensor
+
+        # reset associated switch sensor state before turning lights on or off (typically turned on via redirect)
+        switchactions = []
         if "state" in state:
-            # reset associated switch sensor state before turning on lights (typically turned on via redirect)
-            actions.append(
-                {
-                    "address": "/sensors/${sensor:" + state["state"] + "}/state",
-                    "method": "PUT",
-                    "body": { "status": 0 }
-                }
-            )
-        # Previously, we created 3 rules with dx on relevant variables, but this is not really
-        # necessary, since the rule will be evaluated when any of the variables changes.
-        #for i in [
-        #    ["pres.on", {
-        #        "address": "/sensors/" + sensorID + "/state/presence",
-        #        "operator": "dx"
-        #    }],
-        #    ["dark.on", {
-        #        "address": "/sensors/" + lightSensorID + "/state/dark",
-        #        "operator": "dx"
-        #    }],
-        #    ["stat.on", {
-        #        "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-        #        "operator": "dx",
-        #    }]
-        #]:
-        #    cname = i[0]
-        #    condition = i[1]
-        #    if onactions:
-        #        self.__createRulesForAction(onactions, name, cname, state, conditions + [condition], actions)
-        #    else:
-        #        self.__rulesToCreate.append({
-        #            "name": name + "/" + cname,
-        #            "conditions": conditions + [condition],
-        #            "actions": actions
-        #        })
-        if onactions:
-            self.__createRulesForAction(onactions, name, "on", state, conditions, [], actions)
-        else:
-            self.__rulesToCreate.append({
-                "name": name + "/on",
-                "conditions": conditions,
-                "actions": actions
-            })
-
-        # handling for state 1
-        #
-        # Note: no check on actual light on, since sometimes the light state is not reliable.
-        # We simply assume state 1 has lights on.
-
-        # rule(4): motion detected and lights on switches to state 2
-        self.__rulesToCreate.append({
-            "name": name + "/motion",
-            "conditions": [
-                {
-                    "address": presenceSensorAddress,
-                    "operator": "eq",
-                    "value": "true"
-                },
-                {
-                    "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                    "operator": "eq",
-                    "value": "1"
-                }
-                # NOTE: no dx/ddx operator here, it has to switch if conditions are met
-                # (e.g., switch turned on or door goes to open)
-            ],
-            "actions": [
-                {
-                    "address": "/sensors/${sensor:" + stateSensorName + "}/state",
-                    "method": "PUT",
-                    "body": {
-                        "status": 2
-                    }
-                }
+            switchactions = [
+                Action(
+                    address="/sensors/" + Ref("sensor", state["state"]) + "/state",
+                    method="PUT",
+                    body={ "status": 0 }
+                )
             ]
-        })
 
-        # rule(5): timer starts after entering state 1, after a timeout:
-        #          if lights are on (assumed) and state is still 1 and door contact open
-        #          dim lights and enter state 3
-        conditions = [
-            {
-                "address": presenceSensorAddress,
-                "operator": "eq",
-                "value": "false"
-            },
-            # ddx on last update of state sensor instead of presence sensor to turn off
-            # also after switching light on w/o movement
-            {
-                "address": "/sensors/${sensor:" + stateSensorName + "}/state/lastupdated",
-                "operator": "ddx",
-                "value": "PT" + desc["timeout"]
-            },
-            {
-                "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                "operator": "eq",
-                "value": "1"
-            }
-        ] + contactOpenCond
-        actionstodim = [
-            {
-                "address": "/sensors/${sensor:" + stateSensorName + "}/state",
-                "method": "PUT",
-                "body": {
-                    "status": 3
-                }
-            }
-        ]
+        actionstodim = [("state", 3)]
         if not recoveractions:
             # we need to store light state, so we can recover it on recover action
-            actionstodim.append({
-                "address": "/scenes/" + sceneID,
-                "method": "PUT",
-                "body": {
+            actionstodim.append(Action(
+                address="/scenes/" + sceneID,
+                method="PUT",
+                body={
                     "storelightstate": True
                 }
-            })
+            ))
         if not dimactions:
-            actionstodim.append({
-                "address": "/groups/" + groupID + "/action",
-                "method": "PUT",
-                "body": {
+            actionstodim.append(Action(
+                address="/groups/" + groupID + "/action",
+                method="PUT",
+                body={
                     "bri_inc": -128 # dim to half
                 }
-            })
-        # TODO: needed?
-        #if "state" in state:
-        #    # reset associated switch sensor state before using the action (typically turned on via redirect)
-        #    actionstodim.append(
-        #        {
-        #            "address": "/sensors/${sensor:" + state["state"] + "}/state",
-        #            "method": "PUT",
-        #            "body": { "status": 0 }
-        #        }
-        #    )
-        if dimactions:
-            self.__createRulesForAction(dimactions, name, "dim", dimstatecopy, conditions, actionstodim)
-        else:
-            self.__rulesToCreate.append({
-                "name": name + "/dim",
-                "conditions": conditions,
-                "actions": actionstodim
-            })
-        if "contact" in desc and "closedtimeout" in desc:
-            # rule(5b): Requested timeout when the door is closed and light was turned on permanently.
-            # This is a safety net if door contact breaks.
-            conditions = [
-                {
-                    "address": presenceSensorAddress,
-                    "operator": "eq",
-                    "value": "false"
-                },
-                # ddx on last update of state sensor instead of presence sensor to turn off
-                # also after switching light on w/o movement
-                {
-                    "address": "/sensors/${sensor:" + stateSensorName + "}/state/lastupdated",
-                    "operator": "ddx",
-                    "value": "PT" + desc["closedtimeout"]
-                },
-                {
-                    "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                    "operator": "eq",
-                    "value": "1"
+            ))
+        dimbinding = (dimactions, dimstatecopy, False) if dimactions else None
+
+        offbinding = (offactions, state, False) if offactions else None
+        offdefault = [] if offactions else [
+            Action(
+                address="/groups/" + groupID + "/action",
+                method="PUT",
+                body={
+                    "on": False
                 }
-            ] + contactClosedCond
-            if dimactions:
-                self.__createRulesForAction(dimactions, name, "timeout", dimstatecopy, conditions, actionstodim)
-            else:
-                self.__rulesToCreate.append({
-                    "name": name + "/timeout",
-                    "conditions": conditions,
-                    "actions": actionstodim
-                })
+            )
+        ]
 
-        # handling for state 2: motion detected, lights are on
-        
-        # rule(6): no motion detected in state 2:
-        #            switch to state 1 (if lights still on, rule(4) switches back to state 2 upon motion)
-        self.__rulesToCreate.append({
-            "name": name + "/no.pres",
-            "conditions": [
-                {
-                    "address": presenceSensorAddress,
-                    "operator": "eq",
-                    "value": "false"
-                },
-                {
-                    "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                    "operator": "eq",
-                    "value": "2"
-                }
-            ],
-            "actions": [
-                {
-                    "address": "/sensors/${sensor:" + stateSensorName + "}/state",
-                    "method": "PUT",
-                    "body": {
-                        "status": 1
+        if recoveractions:
+            recoverbinding = (recoveractions, state, True)
+            recoveractions = [("state", 2)] + switchactions
+        else:
+            recoverbinding = None
+            recoveractions = [
+                Action(
+                    address="/groups/" + groupID + "/action",
+                    method="PUT",
+                    body={
+                        "scene": sceneID
                     }
-                }
+                ),
+                ("state", 2)
             ]
-        })
-                
-        # handling for state 3: light is dimmed
-        
-        # rule(7): timer starts after entering state 3, after a timeout:
-        #            if state is still 3, turn lights off and enter state -1 (off by sensor)
+
         dimtime = "PT00:00:20"
         if "dimtime" in desc:
             dimtime = "PT" + desc["dimtime"]
-        conditions = [
-            {
-                "address": "/sensors/${sensor:" + stateSensorName + "}/state/lastupdated",
-                "operator": "ddx",
-                "value": dimtime
-            },
-            {
-                "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                "operator": "eq",
-                "value": "3"
-            }
-        ]
-        actions = [
-            {
-                "address": "/sensors/${sensor:" + stateSensorName + "}/state",
-                "method": "PUT",
-                "body": {
-                    "status": -1
-                }
-            }
-        ]
-        if "state" in state:
-            # reset associated switch sensor state before turning off lights
-            actions.append(
-                {
-                    "address": "/sensors/${sensor:" + state["state"] + "}/state",
-                    "method": "PUT",
-                    "body": { "status": 0 }
-                }
-            )
-        if offactions:
-            # explicit off action specified
-            self.__createRulesForAction(offactions, name, "off", state, conditions, actions)
-        else:
-            # no off action, add default one (group off)
-            self.__rulesToCreate.append({
-                "name": name + "/off",
-                "conditions": conditions,
-                "actions" : actions + [
-                    {
-                        "address": "/groups/" + groupID + "/action",
-                        "method": "PUT",
-                        "body": {
-                            "on": False
+        offtimeout = "PT00:00:30"
+        if "offtimeout" in desc:
+            offtimeout = "PT" + desc["offtimeout"]
+        closedtimeout = None
+        if "closedtimeout" in desc:
+            closedtimeout = "PT" + desc["closedtimeout"]
+        closedchecktime = "PT00:00:16"
+        if "closedchecktime" in desc:
+            closedchecktime = "PT" + desc["closedchecktime"]
+
+        table = [
+            # handling for states <=0
+
+            # rule(1): motion detected in dark and lights off (not blocked by switch): turn on lights and switch to state 2
+            # NOTE: only turn on if it was off at least for a second. This prevents a situation where light on
+            # redirects to a rule is after light off rule, effectively making turning light off impossible.
+            Transition("on", [-1, 0], [
+                    ("presence", "eq", "true"),
+                    ("dark", "eq", "true"),
+                    SOURCE,
+                    ("any_on", "stable", "PT00:00:01")
+                ], [("state", 2)] + switchactions,
+                (onactions, state, True) if onactions else None),
+
+            # handling for state 1
+            #
+            # Note: no check on actual light on, since sometimes the light state is not reliable.
+            # We simply assume state 1 has lights on.
+
+            # rule(4): motion detected and lights on switches to state 2
+            # NOTE: no dx/ddx operator here, it has to switch if conditions are met
+            # (e.g., switch turned on or door goes to open)
+            Transition("motion", [1], [("presence", "eq", "true")], [("state", 2)]),
+
+            # rule(5): timer starts after entering state 1 (ddx on last update of state sensor instead of presence
+            #          sensor to turn off also after switching light on w/o movement), after a timeout:
+            #          if lights are on (assumed) and state is still 1 and door contact open, dim lights and enter state 3
+            Transition("dim", [1], [
+                    ("presence", "eq", "false"),
+                    ("state.lastupdated", "ddx", "PT" + desc["timeout"]),
+                    SOURCE
+                ] + ([("contact", "eq", "0")] if "contact" in desc else []),
+                actionstodim, dimbinding),
+
+            # rule(5b): requested timeout when the door is closed and light was turned on permanently.
+            #           This is a safety net if door contact breaks.
+            Transition("timeout", [1], [
+                    ("presence", "eq", "false"),
+                    ("state.lastupdated", "ddx", closedtimeout),
+                    SOURCE,
+                    ("contact", "eq", "1")
+                ], actionstodim, dimbinding),
+
+            # handling for state 2: motion detected, lights are on
+
+            # rule(6): no motion detected in state 2:
+            #            switch to state 1 (if lights still on, rule(4) switches back to state 2 upon motion)
+            Transition("no.pres", [2], [("presence", "eq", "false")], [("state", 1)]),
+
+            # handling for state 3: light is dimmed
+
+            # rule(7): timer starts after entering state 3, after a timeout:
+            #            if state is still 3, turn lights off and enter state -1 (off by sensor)
+            Transition("off", [3], [("state.lastupdated", "ddx", dimtime)],
+                [("state", -1)] + switchactions + offdefault, offbinding),
+
+            # rule(8): if motion is detected in state 3: recover light state and change state to 2
+            Transition("recover", [3], [
+                    ("presence", "eq", "true"),
+                    ("presence", "dx")
+                ], recoveractions, recoverbinding),
+
+            # Handling of turning on/off via switch or app:
+
+            # rule(9): after manually switched on, change state to 2 (which will transition to 1 upon no motion)
+            Transition("sw.on", [-2, -1, 0, 1], [
+                    SOURCE,
+                    ("any_on", "eq", "true"),
+                    ("any_on", "dx")
+                ] + ([("contact", "eq", "0")] if "contact" in desc else []),
+                [("state", 2)]),
+
+            # rule(10): after manually switched off, change state to -2 after delay of 1s
+            Transition("sw.off", [0, 1, 2, 3], [
+                    SOURCE,
+                    ("any_on", "eq", "false"),
+                    ("any_on", "dx")
+                ], [
+                    Action(
+                        address="/schedules/" + Ref("schedule", stateSensorName),
+                        method="PUT",
+                        body={
+                            "status": "enabled"    # start 1s timer
                         }
-                    },
-                ]
-            })
+                    )
+                ]),
 
-        #  rule(8): if motion is detected in state 3: recover light state and change state to 2
-        conditions = [
-            {
-                "address": presenceSensorAddress,
-                "operator": "eq",
-                "value": "true"
-            },
-            {
-                "address": presenceSensorAddress,
-                "operator": "dx"
-            },
-            {
-                "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                "operator": "eq",
-                "value": "3"
-            }
-        ]
-        actions = [
-            {
-                "address": "/sensors/${sensor:" + stateSensorName + "}/state",
-                "method": "PUT",
-                "body": {
-                    "status": 2
-                }
-            }
+            # Handling for state -2 for timeouts on switch on/off
+            # rule(11): after off timeout, change state -2->-1
+            Transition("blocked", [-2], [
+                    SOURCE,
+                    ("state.lastupdated", "ddx", offtimeout)
+                ], [("state", -1)]),
+
+            # Additional handling for door contact:
+            #
+            # When the door is closed and motion has been detected after the door is closed,
+            # then don't react until door is open again (this is handled in dim rule above).
+            #
+            # If no motion has been detected after door is closed, then turn off light.
+            #
+            # The sensor sends a no-presence signal after 10 seconds of no-presence detection.
+            # So check after 11 seconds after closing doors whether there is presence or not.
+
+            # rule(12): when door contact goes to closed, check after a 16s timeout:
+            #    if no motion is detected and state is still >0 dim lights and enter state 3
+            Transition("dim.closed", [1, 2, 3], [
+                    ("presence", "eq", "false"),
+                    SOURCE,
+                    ("contact", "eq", "1"),
+                    ("contact.lastupdated", "ddx", closedchecktime)
+                ], actionstodim, dimbinding),
+
+            # rule(14): after manually switched on when door closed, set door closed again to force reevaluation via rule(12)
+            Transition("sw.on.closed", STATES, [
+                    ("any_on", "eq", "true"),
+                    ("any_on", "dx"),
+                    ("contact", "eq", "1")
+                ], [("state", 2), ("contact", 1)]),
+
+            # rule(13a): when door contact goes to open, switch to state 2, independent of motion (rule(6) will switch to state 1)
+            Transition("open", [1, 2], [
+                    ("contact", "eq", "0"),
+                    ("contact", "dx")
+                ], [("state", 2)]),
+
+            # rule(13b): when door contact goes to open, switch to state 2 and recover light, independent of motion
+            Transition("open.recover", [3], [
+                    ("contact", "eq", "0"),
+                    ("contact", "dx")
+                ], recoveractions, recoverbinding)
         ]
-        if recoveractions:
-            if "state" in state:
-                # reset associated switch sensor state before turning on lights (typically turned on via redirect)
-                actions.append(
-                    {
-                        "address": "/sensors/${sensor:" + state["state"] + "}/state",
-                        "method": "PUT",
-                        "body": { "status": 0 }
-                    }
-                )
-            self.__createRulesForAction(recoveractions, name, "recover", state, conditions, [], actions)
-        else:
-            self.__rulesToCreate.append({
-                "name": name + "/recover",
-                "conditions": conditions,
-                "actions": [{
-                    "address": "/groups/" + groupID + "/action",
-                    "method": "PUT",
-                    "body": {
-                        "scene": sceneID
-                    }
-                }] + actions
-            })
 
-        # Handling of turning on/off via switch or app:
+        # the state sensor is set to -2 by a schedule, which is started by rule(10)
+        compiler = MotionCompiler(addresses, resources, external=[-2])
+        for t in compiler.compile(table):
+            if t.binding is None:
+                self.__rulesToCreate.append(Rule(
+                    name=name + "/" + t.name,
+                    conditions=t.guard,
+                    actions=t.actions
+                ))
+            else:
+                binding, bindingstate, reset = t.binding
+                if reset:
+                    self.__createRulesForAction(binding, name, t.name, bindingstate, t.guard, [], t.actions)
+                else:
+                    self.__createRulesForAction(binding, name, t.name, bindingstate, t.guard, t.actions)
+        self.__motionStats[name] = compiler.stats
+        log.info("Motion sensor %s: %d rules with %d conditions minimized to %d rules with %d conditions", name,
+            compiler.stats["rules"], compiler.stats["conditions"], compiler.stats["minimizedRules"],
+            compiler.stats["minimizedConditions"], extra={"room": self.__room})
 
-        # rule(9): after manually switched on, change state to 2 (which will transition to 1 upon no motion)
-        self.__rulesToCreate.append(
-            {
-                "name": name + "/sw.on",
-                "actions" : [
-                    {
-                        "address": "/sensors/${sensor:" + stateSensorName + "}/state",
-                        "method": "PUT",
-                        "body": {
-                            "status": 2
-                        }
-                    }
-                ],
-                "conditions" : [
-                    {
-                        "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                        "operator": "lt",
-                        "value": "2"
-                    },
-                    {
-                        "address": "/groups/" + groupID + "/state/any_on",
-                        "operator": "eq",
-                        "value": "true"
-                    },
-                    {
-                        "address": "/groups/" + groupID + "/state/any_on",
-                        "operator": "dx"
-                    }
-                ] + contactOpenCond
-            }
-        )
-        
-        # rule(10): after manually switched off, change state to -2 after delay of 1s
-        self.__rulesToCreate.append(
-            {
-                "name": name + "/sw.off",
-                "actions" : [
-                    {
-                        "address": "/schedules/${schedule:" + stateSensorName + "}",
-                        "method": "PUT",
-                        "body": {
-                            "status": "enabled"    # start 1s timer
-                        }
-                    }
-                ],
-                "conditions" : [
-                    {
-                        "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                        "operator": "gt",
-                        "value": "-1"
-                    },
-                    {
-                        "address": "/groups/" + groupID + "/state/any_on",
-                        "operator": "eq",
-                        "value": "false"
-                    },
-                    {
-                        "address": "/groups/" + groupID + "/state/any_on",
-                        "operator": "dx"
-                    }
-                ] 
-            }
-        )
         self.__schedulesToCreate.append(
             {
                 "name": stateSensorName,
@@ -1794,7 +1906,7 @@ class HueBridge():
                 "autodelete": False,
                 "localtime": "PT00:00:01",
                 "command": {
-                    "address": "/api/" + self.apiKey + "/sensors/${sensor:" + stateSensorName + "}/state",
+                    "address": "/api/" + self.apiKey + "/sensors/" + Ref("sensor", stateSensorName) + "/state",
                     "method": "PUT",
                     "body": {
                         "status": -2    # this disables the sensor for some time
@@ -1802,216 +1914,114 @@ class HueBridge():
                 }
             }
         )
-        
-        # Handling for state -2 for timeouts on switch on/off
-        # rule(11): after off timeout, change state -2->-1
-        offtimeout = "PT00:00:30"
-        if "offtimeout" in desc:
-            offtimeout = "PT" + desc["offtimeout"]
-        self.__rulesToCreate.append(
-            {
-                "name": name + "/blocked",
-                "actions" : [
-                    {
-                        "address": "/sensors/${sensor:" + stateSensorName + "}/state",
-                        "method": "PUT",
-                        "body": {
-                            "status": -1
-                        }
-                    }
-                ],
-                "conditions" : [
-                    {
-                        "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                        "operator": "eq",
-                        "value": "-2"
-                    },
-                    {
-                        "address": "/sensors/${sensor:" + stateSensorName + "}/state/lastupdated",
-                        "operator": "ddx",
-                        "value": offtimeout
-                    }
-                ]
-            }
-        )
-        
-
-        # additional handling for door contact
-        
-        if "contact" in desc:
-            # Add rules to handle door contact.
-            #
-            # When the door is closed and motion has been detected after the door is closed,
-            # then don't react until door is open again (this is handled in off rule 4 above).
-            #
-            # If no motion has been detected after door is closed, then turn off light.
-            #
-            # The sensor sends a no-presence signal after 10 seconds of no-presence detection.
-            # So check after 11 seconds after closing doors whether there is presence or not.
-
-            contactName = desc["contact"]
 
-            # when door contact goes to closed:
-
-            # rule(12): check after a 16s timeout:
-            #    if no motion is detected and state is still 3 turn lights off and keep state 3
-            closedchecktime = "PT00:00:16"
-            if "closedchecktime" in desc:
-                closedchecktime = "PT" + desc["closedchecktime"]
-            actions = []
-            conditions = [
-                {
-                    "address": presenceSensorAddress,
-                    "operator": "eq",
-                    "value": "false"
-                },
-                {
-                    "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                    "operator": "gt",
-                    "value": "0"
-                },
-                {
-                    "address": "/sensors/${sensor:" + contactName + "}/state/status",
-                    "operator": "eq",
-                    "value": "1"
-                },
-                {
-                    "address": "/sensors/${sensor:" + contactName + "}/state/lastupdated",
-                    "operator": "ddx",
-                    "value": closedchecktime
-                }
-            ]
-            if dimactions:
-                self.__createRulesForAction(dimactions, name, "dim.closed", dimstatecopy, conditions, actionstodim)
+    def __updateReferences(self, objects):
+        """ Return bridge JSON data of generated objects with references replaced by IDs of referenced objects """
+        result = []
+        for o in objects:
+            if type(o) is dict:
+                resolveAll(o, self.__symbols)
+                result.append(o)
             else:
-                self.__rulesToCreate.append({
-                    "name": name + "/dim.closed",
-                    "conditions": conditions,
-                    "actions": actionstodim
-                })
+                result.append(o.toJson(self.__symbols))
+        return result
 
-            # rule(14): after manually switched on when door closed, set door closed again to force reevaluation via rule(12)
-            conditions = [
-                {
-                    "address": "/groups/" + groupID + "/state/any_on",
-                    "operator": "eq",
-                    "value": "true"
-                },
-                {
-                    "address": "/groups/" + groupID + "/state/any_on",
-                    "operator": "dx"
-                }
-            ] + contactClosedCond
-            self.__rulesToCreate.append({
-                "name": name + "/sw.on.closed",
-                "conditions": conditions,
-                "actions" : actions + [
-                    {
-                        "address": "/sensors/${sensor:" + stateSensorName + "}/state",
-                        "method": "PUT",
-                        "body": {
-                            "status": 2
-                        }
-                    },
-                    {
-                        "address": "/sensors/${sensor:" + contactName + "}/state",
-                        "method": "PUT",
-                        "body": {
-                            "status": 1,
-                        }
+    def __periodCondition(self, times, timerange):
+        """
+        Return condition testing that the current time is in timerange of times using a period sensor (or None).
+
+        One CLIP sensor is created per times mapping and shared by all rooms using the same mapping
+        (kept until no resource link of a room refers to it). Its status is the value of the current
+        time range in times (the 1-based index of the scene, 0 outside of all ranges), which is set
+        by weekly schedules at the start of each time range and at the end of a time range not
+        followed by another one. Time ranges selecting the same scene thus share one status value
+        and their rules are merged by __collapseRules. Time ranges with weekdays or overlapping time ranges can't be
+        represented by a single status, so None is returned for them.
+        """
+        ranges = sorted(times.keys())
+        bounds = []
+        for r in ranges:
+            m = re.match('^T([0-9][0-9]):([0-9][0-9]):([0-9][0-9])/T([0-9][0-9]):([0-9][0-9]):([0-9][0-9])$', r)
+            if not m:
+                return None
+            bounds.append((int(m.group(1)) * 3600 + int(m.group(2)) * 60 + int(m.group(3)),
+                           int(m.group(4)) * 3600 + int(m.group(5)) * 60 + int(m.group(6))))
+        intervals = lambda begin, end: [(begin, end)] if begin < end else [(begin, 86400), (0, end)]
+        for i in range(len(bounds)):
+            for j in range(i + 1, len(bounds)):
+                if any(x[0] < y[1] and y[0] < x[1] for x in intervals(*bounds[i]) for y in intervals(*bounds[j])):
+                    return None
+
+        key = tuple((r, times[r]) for r in ranges)
+        sensorName = self.__periods.get(key)
+        if not sensorName:
+            sensorName = "Period {:08x}".format(zlib.crc32("|".join(r + "=" + str(times[r]) for r in ranges).encode("utf-8")))
+            self.__periods[key] = sensorName
+
+            changes = {}
+            for r, (begin, end) in zip(ranges, bounds):
+                changes[begin] = times[r]
+            for begin, end in bounds:
+                changes.setdefault(end, 0)
+            schedules = []
+            for n, seconds in enumerate(sorted(changes.keys())):
+                schedules.append({
+                    "name": sensorName + "/" + str(n),
+                    "description": "Set " + sensorName + " to " + str(changes[seconds]),
+                    "command": {
+                        "address": "/api/" + self.apiKey + "/sensors/" + Ref("sensor", sensorName) + "/state",
+                        "body": { "status": changes[seconds] },
+                        "method": "PUT"
                     },
-                ]
-            })
+                    "localtime": "W127/T{:02d}:{:02d}:{:02d}".format(seconds // 3600, seconds // 60 % 60, seconds % 60),
+                    "status": "enabled",
+                    "autodelete": False
+                })
 
-            # rule(13): when door contact goes to open
-            actions = [
-                {
-                    "address": "/sensors/${sensor:" + stateSensorName + "}/state",
-                    "method": "PUT",
-                    "body": {
-                        "status": 2
-                    }
-                }
-            ]
-            conditions = [
-                {
-                    "address": "/sensors/${sensor:" + contactName + "}/state/status",
-                    "operator": "eq",
-                    "value": "0"
-                },
-                {
-                    "address": "/sensors/${sensor:" + contactName + "}/state/status",
-                    "operator": "dx"
-                }
-            ]
-            self.__rulesToCreate += [
-                # rule(13a): switch to state 2, independent of motion (rule(6) will switch to state 1)
-                {
-                    "name": name + "/open",
-                    "actions" : actions,
-                    "conditions" : conditions + [
-                        {
-                            "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                            "operator": "gt",
-                            "value": "0"
-                        },
-                        {
-                            "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                            "operator": "lt",
-                            "value": "3"
-                        }
-                    ]
-                }
-            ]
-            # rule(13b): switch to state 2 and recover light, independent of motion (rule(6) will switch to state 1)
-            conditions = conditions + [
-                {
-                    "address": "/sensors/${sensor:" + stateSensorName + "}/state/status",
-                    "operator": "eq",
-                    "value": "3"
-                }
-            ]
-            if recoveractions:
-                if "state" in state:
-                    # reset associated switch sensor state before turning on lights (typically turned on via redirect)
-                    actions.append(
-                        {
-                            "address": "/sensors/${sensor:" + state["state"] + "}/state",
-                            "method": "PUT",
-                            "body": { "status": 0 }
-                        }
-                    )
-                self.__createRulesForAction(recoveractions, name, "open.recover", state, conditions, [], actions)
+            s = self.findSensor(sensorName)
+            if s:
+                # the sensor is named by the time ranges only, so rooms with the same time ranges share
+                # it and its schedules (keep them, even if linked by the previous configuration)
+                self.__sensorsToDelete = [i for i in self.__sensorsToDelete if i != s]
+                self.__periodLinks.append("/sensors/" + s)
+                for schedule in schedules:
+                    scheduleID = self.__schedules_idx.get(schedule["name"])
+                    if scheduleID:
+                        self.__schedulesToDelete = [i for i in self.__schedulesToDelete if i != scheduleID]
+                        self.__periodLinks.append("/schedules/" + scheduleID)
+                    else:
+                        self.__schedulesToCreate.append(schedule)
             else:
-                self.__rulesToCreate.append({
-                    "name": name + "/open.recover",
-                    "conditions": conditions,
-                    "actions": [{
-                        "address": "/groups/" + groupID + "/action",
-                        "method": "PUT",
-                        "body": {
-                            "scene": sceneID
-                        }
-                    }] + actions
-                })
+                for scheduleName in self.__schedules_idx.keys():
+                    if scheduleName.startswith(sensorName + "/"):
+                        self.__prepareDeleteSchedule(scheduleName)
+                windows = [(intervals(begin, end), times[r]) for r, (begin, end) in zip(ranges, bounds)]
+                # status by the time of the last refresh for offline analysis (see planned()), set by
+                # the current time of the bridge on commit
+                sensor = SensorSpec(sensorName, state={"status": self.__periodStatus(self.__all.get("config"), windows)})
+                self.__sensorsToCreate.append(sensor)
+                self.__periodSeeds[sensorName] = (sensor, windows)
+                self.__schedulesToCreate += schedules
+
+        return Condition(
+            address="/sensors/" + Ref("sensor", sensorName) + "/state/status",
+            operator="eq",
+            value=str(times[timerange])
+        )
 
-    def __updateReferences(self, obj):
-        if type(obj) is list:
-            for i in obj:
-                # call for each list element
-                self.__updateReferences(i)
-        elif type(obj) is dict:
-            for i in obj.keys():
-                value = obj[i]
-                if type(value) is str:
-                    # tokenize on ${name:value}
-                    replacement = VAR_PATTERN.sub(lambda match: self.__replaceVariable(match), value)
-                    if replacement != value:
-                        #print "Replaced:", value, "=>", replacement 
-                        obj[i] = replacement
-                else:
-                    # call recursively for sub-dicts
-                    self.__updateReferences(value)
+    def __periodStatus(self, config, windows):
+        """ Return status of a period sensor with windows (list of (intervals, status)) at localtime of bridge config """
+        # the time of the bridge is used, since the host may be in another time zone
+        try:
+            now = datetime.datetime.strptime(config["localtime"], "%Y-%m-%dT%H:%M:%S")
+        except (KeyError, TypeError, ValueError):
+            now = datetime.datetime.now()
+        seconds = now.hour * 3600 + now.minute * 60 + now.second
+        status = 0
+        for intervals, value in windows:
+            if any(begin <= seconds < end for begin, end in intervals):
+                status = value
+        return status
 
     def __prepareSensor(self, v, wakeup = False):
         name = v["name"]
@@ -2021,28 +2031,10 @@ class HueBridge():
                 raise Exception("Sensor '" + name + "' is not a generic status sensor")
             self.__sensorsToDelete.append(s)
             self.__rulesToDelete += self.findRulesForSensorID(s)
-        sensorData = {
-            "state": {
-                "status": 0
-            },
-            "config": {
-                "on": True,
-                "reachable": True
-            },
-            "name": name,
-            "type": "CLIPGenericStatus",
-            "modelid": "GenericCLIP",
-            "manufacturername": "Philips",
-            "swversion": "1.0",
-            "uniqueid": name
-        }
         if wakeup:
-            sensorData["type"] = "CLIPGenericFlag"
-            sensorData["modelid"] = "WAKEUP"
-            sensorData["swversion"] = "A_1801260942"
-            sensorData["uniqueid"] = "L_04_" + name
-            del sensorData["state"]["status"]
-            sensorData["state"]["flag"] = False
+            sensorData = SensorSpec(name, "CLIPGenericFlag", "WAKEUP", "A_1801260942", "L_04_" + name, {"flag": False})
+        else:
+            sensorData = SensorSpec(name)
         self.__sensorsToCreate.append(sensorData)
         self.__ruleForSensorReset(v)
         if v["type"] == "contact":
@@ -2089,7 +2081,7 @@ class HueBridge():
 
         # names
         sensorname = "Wake up " + name
-        sensoraddr = "/sensors/${sensor:" + sensorname + "}"
+        sensoraddr = "/sensors/" + Ref("sensor", sensorname)
         startscenename = "Wake Up init"    # Initial scene to play for the first minute (minimum brightness)
         endscenename = "Wake Up end"       # End scene to slowly transition to (maximum brightness)
         schedule1name = "Wake up " + name
@@ -2110,25 +2102,15 @@ class HueBridge():
         self.__prepareDeleteSchedule(schedule1name)
         self.__prepareDeleteSchedule(schedule2name)
 
-        startscene = {
-            "name": startscenename,
-            "lights": lights,
-            #"locked": True,
-            "lightstates": {}
-        }
-        endscene = {
-            "name": endscenename,
-            "lights": lights,
-            #"locked": True,
-            "lightstates": {}
-        }
+        startscene = SceneSpec(startscenename, lights, {})
+        endscene = SceneSpec(endscenename, lights, {})
         for light in lights:
-            startscene["lightstates"][light] = {
+            startscene.lightstates[light] = {
                 "on": True,
                 "bri": 1,
                 "ct": 447
             }
-            endscene["lightstates"][light] = {
+            endscene.lightstates[light] = {
                 "on": True,
                 "bri": 254,
                 "ct": 447,
@@ -2139,7 +2121,7 @@ class HueBridge():
             "name": schedule1name,
             "description": uniqueid + "_start wake up",
             "command": {
-                "address": "/api/" + self.apiKey + "/sensors/${sensor:" + sensorname + "}/state",
+                "address": "/api/" + self.apiKey + "/sensors/" + Ref("sensor", sensorname) + "/state",
                 "body": { "flag": True },
                 "method": "PUT"
             },
@@ -2153,7 +2135,7 @@ class HueBridge():
             "command": {
                 "address": "/api/" + self.apiKey + "/groups/0/action",
                 "body": {
-                    "scene": "${scene:" + group + ":" + endscenename + "}"
+                    "scene": Ref("scene", group, endscenename)
                 },
                 "method": "PUT"
             },
@@ -2162,61 +2144,61 @@ class HueBridge():
             "autodelete": False
         }
 
-        startrule = {
-            "name": startrulename,
-            "status": "enabled",
-            "conditions": [
-                {
-                    "address": "/sensors/${sensor:" + sensorname + "}/state/flag",
-                    "operator": "eq",
-                    "value": "true"
-                }
+        startrule = Rule(
+            name=startrulename,
+            status="enabled",
+            conditions=[
+                Condition(
+                    address="/sensors/" + Ref("sensor", sensorname) + "/state/flag",
+                    operator="eq",
+                    value="true"
+                )
             ],
-            "actions": [
-                {
-                    "address": "/schedules/${schedule:" + schedule2name + "}",
-                    "method": "PUT",
-                    "body": { "status": "enabled" }
-                },
-                {
-                    "address": "/groups/${group:" + group + "}/action",
-                    "method": "PUT",
-                    "body": { "scene": "${scene:" + group + ":" + startscenename +  "}" }
-                }
+            actions=[
+                Action(
+                    address="/schedules/" + Ref("schedule", schedule2name),
+                    method="PUT",
+                    body={ "status": "enabled" }
+                ),
+                Action(
+                    address="/groups/" + Ref("group", group) + "/action",
+                    method="PUT",
+                    body={ "scene": Ref("scene", group, startscenename) }
+                )
             ]
-        }
+        )
 
-        endrule = {
-            "name": endrulename,
-            "conditions": [
-                {
-                    "address": sensoraddr + "/state/flag",
-                    "operator": "eq",
-                    "value": "true"
-                },
-                {
-                    "address": sensoraddr + "/state/flag",
-                    "operator": "ddx",
-                    "value": offtimedelay
-                }
+        endrule = Rule(
+            name=endrulename,
+            conditions=[
+                Condition(
+                    address=sensoraddr + "/state/flag",
+                    operator="eq",
+                    value="true"
+                ),
+                Condition(
+                    address=sensoraddr + "/state/flag",
+                    operator="ddx",
+                    value=offtimedelay
+                )
             ],
-            "actions": [
-                {
-                    "address": "/groups/${group:" + group + "}/action",
-                    "method": "PUT",
-                    "body": {
+            actions=[
+                Action(
+                    address="/groups/" + Ref("group", group) + "/action",
+                    method="PUT",
+                    body={
                         "on": False
                     }
-                },
-                {
-                    "address": sensoraddr + "/state",
-                    "method": "PUT",
-                    "body": {
+                ),
+                Action(
+                    address=sensoraddr + "/state",
+                    method="PUT",
+                    body={
                         "flag": False
                     }
-                }
+                )
             ]
-        }
+        )
 
         if not groupid in self.__scenesToCreate:
             self.__scenesToCreate[groupid] = []
@@ -2228,9 +2210,9 @@ class HueBridge():
     def __rulesForBoot(self):
         """ Create boot rule to turn off all lights after reboot """
         # TODO this doesn't yet work correctly
-        self.__rulesToCreate.append({
-            "name": "Boot",
-            "conditions": [
+        self.__rulesToCreate.append(Rule(
+            name="Boot",
+            conditions=[
                 # When the bridge reboots, it doesn't know about light states. Ultimately, it will
                 # learn some lights are on, so the any_on on group 0 will be set. We'll react on it.
                 #{
@@ -2244,132 +2226,257 @@ class HueBridge():
                 #},
                 # When the bridge starts, all sensors (including external input) are initialized to 0.
                 # So check for it here.
-                {
-                    "address": "/sensors/" + self.__extinput + "/state/status",
-                    "operator": "eq",
-                    "value": "0"
-                }
+                Condition(
+                    address="/sensors/" + self.__extinput + "/state/status",
+                    operator="eq",
+                    value="0"
+                )
             ],
-            "actions": [
+            actions=[
                 # Turn off the light, if any light is on.
-                {
-                    "address": "/groups/0/action",
-                    "method": "PUT",
-                    "body": { "on": False }
-                },
+                Action(
+                    address="/groups/0/action",
+                    method="PUT",
+                    body={ "on": False }
+                ),
                 # Set status to 1, so we won't react next time.
-                {
-                    "address": "/sensors/" + self.__extinput + "/state",
-                    "method": "PUT",
-                    "body": { "status": 1 }
-                }
+                Action(
+                    address="/sensors/" + self.__extinput + "/state",
+                    method="PUT",
+                    body={ "status": 1 }
+                )
             ]
-        })
+        ))
 
-    def configure(self, config, name):
-        """ Configure the bridge. See README.md for config structure """
+    def configure(self, config, name, deadline = None):
+        """
+        Configure the bridge. See README.md for config structure
 
-        # find resourcelink, if any
+        Deadline is an optional time budget for the commit in seconds (or a Deadline object).
+        """
+        self.plan(config, name)
+        try:
+            self.commit(name, deadline)
+        except DeadlineExceeded:
+            # already reported by commit
+            raise
+        except:
+            log.error("Error while processing configuration %s", name, extra={"room": name})
+            raise
+
+    def plan(self, config, name):
+        """
+        Prepare changes for the configuration without sending anything to the bridge.
+
+        The changes are sent to the bridge by commit().
+        """
+
+        self.__room = name
+
+        # find resourcelink, if any, and get rid of rules created with it (some rules, such as resetting
+        # a state sensor when the group goes off, have no condition on a sensor of the room)
         if name in self.__resourcelinks_idx:
             self.__linkToDelete = self.__resourcelinks_idx[name]
+            for link in self.__resourcelinks[self.__linkToDelete].get("links", []):
+                tp, objectID = link.split("/")[1:3]
+                if tp == "rules" and objectID in self.__rules:
+                    self.__rulesToDelete.append(objectID)
+                # period sensors are named by their time ranges, so they are not replaced by name
+                # when the time ranges change, but they may be shared with other rooms (see __periodCondition)
+                elif tp == "sensors" and self.__sensors.get(objectID, {}).get("name", "").startswith("Period "):
+                    if not self.__linkedElsewhere(link):
+                        self.__sensorsToDelete.append(objectID)
+                        self.__rulesToDelete += self.findRulesForSensorID(objectID)
+                elif tp == "schedules" and self.__schedules.get(objectID, {}).get("name", "").startswith("Period "):
+                    if not self.__linkedElsewhere(link):
+                        self.__schedulesToDelete.append(objectID)
 
         currentconfig = None
         try:
             # first collect rules and sensors to delete
-            for v in config:
+            for index, v in enumerate(config):
                 currentconfig = v
                 tp = v["type"]
-                if tp == "switch":
-                    self.__rulesForSwitch(v)
-                elif tp == "external":
-                    self.__rulesForExternal(v)
-                elif tp == "state"  or tp == "contact":
-                    self.__prepareSensor(v)
-                elif tp == "motion":
-                    self.__rulesForMotion(v)
-                elif tp == "wakeup":
-                    self.__rulesForWakeup(v)
-                elif tp == "boot":
-                    self.__rulesForBoot()
-                else:
-                    raise Exception("Unknown configuration type '" + tp + "'")
-            self.commit(name)
+                with self.__profile("plan-{:02d}-{}".format(index, tp)):
+                    if tp == "switch":
+                        self.__rulesForSwitch(v)
+                    elif tp == "external":
+                        self.__rulesForExternal(v)
+                    elif tp == "state"  or tp == "contact":
+                        self.__prepareSensor(v)
+                    elif tp == "motion":
+                        self.__rulesForMotion(v)
+                    elif tp == "wakeup":
+                        self.__rulesForWakeup(v)
+                    elif tp == "boot":
+                        self.__rulesForBoot()
+                    else:
+                        raise Exception("Unknown configuration type '" + tp + "'")
         except:
-            print("ERROR while processing configuration " + name)
-            pprint.pprint(currentconfig)
+            log.error("Error while processing configuration %s: %s", name, pprint.pformat(currentconfig), extra={"room": name})
+            self.__prepare()
             raise
 
-    def commit(self, name):
-        """ Commit changes prepared by configure """
-        # delete out-of-date rules, schedules, sensors, scenes and links
-        deleteRuleIDs = list(set(self.__rulesToDelete))
-        print("Rules to delete:", deleteRuleIDs)
-        for i in deleteRuleIDs:
-            self.__deleteRule(i)
-        
-        deleteScheduleIDs = list(set(self.__schedulesToDelete))
-        print("Schedules to delete:", deleteScheduleIDs)
-        for i in deleteScheduleIDs:
-            self.__deleteSchedule(i)
-        
-        deleteSensorIDs = list(set(self.__sensorsToDelete))
-        print("Sensors to delete:", deleteSensorIDs)
-        for i in deleteSensorIDs:
-            self.__deleteSensor(i)
+    def __linkedElsewhere(self, link):
+        """ Return True, if link (e.g., /sensors/12) is in a resource link other than the one of the current room """
+        return any(link in l.get("links", []) for linkID, l in self.__resourcelinks.items() if linkID != self.__linkToDelete)
+
+    def planned(self):
+        """
+        Return changes prepared by plan() for offline analysis (e.g., by hue.simulator).
+
+        Returns dictionary with:
+           - rules, sensors, groups, schedules - objects to create (IR objects, schedules as dictionaries)
+           - scenes - dictionary of group ID to list of scenes to create
+           - groupSensors - dictionary of group ID to list of sensor IDs to assign to the group
+           - deleteRules, deleteSensors, deleteSchedules - IDs of objects to delete
+           - deleteScenes - dictionary of group ID to list of scene IDs to delete
+           - externalInput - ID of the external input sensor
+           - data - bridge data as read by refresh()
+           - lookup - function returning ID of an existing object referenced by a Ref (raises KeyError if not found)
+           - motionStats - dictionary of motion sensor name to counts of rules and conditions before and
+             after minimization of its state machine (see hue.motion)
+        """
+        return {
+            "rules": list(self.__rulesToCreate),
+            "sensors": list(self.__sensorsToCreate),
+            "groups": list(self.__groupsToCreate.values()),
+            "schedules": list(self.__schedulesToCreate),
+            "scenes": dict((gid, list(s)) for gid, s in self.__scenesToCreate.items()),
+            "groupSensors": dict(self.__sensorsForGroups),
+            "deleteRules": list(set(self.__rulesToDelete)),
+            "deleteSensors": list(set(self.__sensorsToDelete)),
+            "deleteSchedules": list(set(self.__schedulesToDelete)),
+            "deleteScenes": dict((gid, list(s)) for gid, s in self.__scenesToDelete.items()),
+            "externalInput": self.__extinput,
+            "data": self.__all,
+            "lookup": self.__lookupReference,
+            "motionStats": dict(self.__motionStats)
+        }
+
+    def discard(self):
+        """ Drop changes prepared by plan() without sending them to the bridge """
+        self.__prepare()
 
-        # delete scenes
-        for gid in self.__scenesToDelete.keys():
-            for i in self.__scenesToDelete[gid]:
-                sceneID = self.__deleteScene(gid, i)
+    def commit(self, name, deadline = None):
+        """
+        Commit changes prepared by configure
 
-        if self.__linkToDelete:
-            print("Resource link to delete:", self.__linkToDelete)
-            self.__deleteResourceLink(self.__linkToDelete)
+        Deadline is an optional time budget in seconds (or a Deadline object). It is propagated
+        to all requests as shrinking timeout. When it runs out, no new operations are started,
+        completed operations are reported and DeadlineExceeded is raised.
+        """
+        self.__deadline = Deadline.of(deadline)
+        self.__completed = []
+        self.__room = name
+        try:
+            self.__commit(name)
+        except DeadlineExceeded as e:
+            log.error("Deadline exceeded while committing %s: %s, operations completed before deadline:%s", name, e,
+                      "".join("\n - " + op for op in self.__completed), extra={"room": name})
+            self.__prepare()
+            raise DeadlineExceeded(str(e), list(self.__completed))
+        finally:
+            self.__deadline = None
+
+    def __commit(self, name):
+
+        with self.instrumentation.inPhase("delete"):
+            # delete out-of-date rules, schedules, sensors, scenes and links
+            deleteRuleIDs = list(set(self.__rulesToDelete))
+            log.info("Rules to delete: %s", deleteRuleIDs, extra={"room": name})
+            with self.__profile("commit-delete-rules"):
+                self.__runPhase(deleteRuleIDs, self.__deleteRule)
+
+            deleteScheduleIDs = list(set(self.__schedulesToDelete))
+            log.info("Schedules to delete: %s", deleteScheduleIDs, extra={"room": name})
+            with self.__profile("commit-delete-schedules"):
+                self.__runPhase(deleteScheduleIDs, self.__deleteSchedule)
+
+            deleteSensorIDs = list(set(self.__sensorsToDelete))
+            log.info("Sensors to delete: %s", deleteSensorIDs, extra={"room": name})
+            with self.__profile("commit-delete-sensors"):
+                self.__runPhase(deleteSensorIDs, self.__deleteSensor)
+
+            # delete scenes
+            deleteScenes = []
+            for gid in self.__scenesToDelete.keys():
+                for i in self.__scenesToDelete[gid]:
+                    deleteScenes.append((gid, i))
+            with self.__profile("commit-delete-scenes"):
+                self.__runPhase(deleteScenes, lambda s: self.__deleteScene(s[0], s[1]))
+
+            if self.__linkToDelete:
+                log.info("Resource link to delete: %s", self.__linkToDelete, extra={"room": name})
+                with self.__profile("commit-delete-link"):
+                    self.__deleteResourceLink(self.__linkToDelete)
 
         # collects all resources created here to present them as one resource link
         links = []
         currentData = None
 
+        # objects were deleted, forget their IDs
+        self.__symbols.clear()
+
         try:
-            # create any sensors needed to represent switch states
-            #print("Sensors to create:")
-            #pprint.pprint(self.__sensorsToCreate)
-            for i in self.__sensorsToCreate:
-                currentData = i
-                sensorID = self.__createSensor(i)
-                links.append("/sensors/" + sensorID)
-
-            # set group's sensors
-            for gid, sensors in self.__sensorsForGroups.items():
-                self.__setGroupSensor(gid, sensors)
-                
-            # create scenes
-            for gid in self.__scenesToCreate.keys():
-                #print("Scenes to create for group " + gid + ":")
-                #pprint.pprint(self.__scenesToCreate[gid])
-                for i in self.__scenesToCreate[gid]:
-                    currentData = i
-                    sceneID = self.__createScene(gid, i)
-                    links.append("/scenes/" + sceneID)
-
-            #print("Schedules to create:")
-            self.__updateReferences(self.__schedulesToCreate)
-            #pprint.pprint(self.__schedulesToCreate)
-            for i in self.__schedulesToCreate:
-                currentData = i
-                scheduleID = self.__createSchedule(i)
-                links.append("/schedules/" + scheduleID)
-
-            #print("Rules to create:")
-            self.__updateReferences(self.__rulesToCreate)
-            #pprint.pprint(self.__rulesToCreate)
-            for i in self.__rulesToCreate:
-                currentData = i
-                ruleID = self.__createRule(i)
-                links.append("/rules/" + ruleID)
+            with self.instrumentation.inPhase("create"):
+                if self.__periodSeeds:
+                    # the time of the last refresh may be outdated
+                    config = self.__get("config")
+                    for sensor, windows in self.__periodSeeds.values():
+                        sensor.state["status"] = self.__periodStatus(config, windows)
+
+                # create any sensors needed to represent switch states
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Sensors to create: %s", pprint.pformat(self.__sensorsToCreate), extra={"room": name})
+                with self.__profile("commit-create-sensors"):
+                    sensors = [sensor.toJson() for sensor in self.__sensorsToCreate]
+                    for sensorID in self.__runPhase(sensors, self.__createSensor):
+                        links.append("/sensors/" + sensorID)
+
+                # set group's sensors
+                with self.__profile("commit-group-sensors"):
+                    self.__runPhase(list(self.__sensorsForGroups.items()), lambda g: self.__setGroupSensor(g[0], g[1]))
+
+                # create light groups switched by bindings
+                with self.__profile("commit-create-groups"):
+                    groups = [group.toJson() for group in self.__groupsToCreate.values()]
+                    for groupID in self.__runPhase(groups, self.__createGroup):
+                        links.append("/groups/" + groupID)
+
+                # create scenes
+                createScenes = []
+                for gid in self.__scenesToCreate.keys():
+                    if log.isEnabledFor(logging.DEBUG):
+                        log.debug("Scenes to create for group %s: %s", gid, pprint.pformat(self.__scenesToCreate[gid]), extra={"room": name})
+                    for i in self.__scenesToCreate[gid]:
+                        createScenes.append((gid, i.toJson()))
+                with self.__profile("commit-create-scenes"):
+                    for sceneID in self.__runPhase(createScenes, lambda s: self.__createScene(s[0], s[1])):
+                        links.append("/scenes/" + sceneID)
+
+                with self.__profile("commit-references-schedules"):
+                    schedules = self.__updateReferences(self.__schedulesToCreate)
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Schedules to create: %s", pprint.pformat(self.__schedulesToCreate), extra={"room": name})
+                with self.__profile("commit-create-schedules"):
+                    for scheduleID in self.__runPhase(schedules, self.__createSchedule):
+                        links.append("/schedules/" + scheduleID)
+
+                with self.__profile("commit-references-rules"):
+                    rules = self.__updateReferences(self.__rulesToCreate)
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug("Rules to create: %s", pprint.pformat(self.__rulesToCreate), extra={"room": name})
+                # the bridge evaluates rules triggered by the same change in the order of their IDs
+                # (e.g., a rule resetting a state sensor before a rule testing it), so rules are
+                # created one after another in the order they were generated
+                with self.__profile("commit-create-rules"):
+                    for ruleID in self.__runPhase(rules, self.__createRule, True):
+                        links.append("/rules/" + ruleID)
 
             for i in self.__groupsToAdd:
                 links.append("/groups/" + i)
+            links += self.__periodLinks
 
             # create resource with links to all new rules and sensors
             resourceData = {
@@ -2381,19 +2488,26 @@ class HueBridge():
                 "links": links
             }
             currentData = resourceData
-            tmp = requests.post(self.urlbase + "/resourcelinks", json=resourceData)
-            if tmp.status_code != 200:
-                raise Exception("Cannot create resource link " + name + ": " + tmp.text)
-            result = json.loads(tmp.text)[0];
-            if not "success" in result:
-                raise Exception("Cannot create resource link " + name + ": " + tmp.text)
-            print("Created resource link " + name + " with ID " + result["success"]["id"])
+            with self.instrumentation.inPhase("link"), self.__profile("commit-link"):
+                result = self.__call("POST", "resourcelinks", resourceData, "Cannot create resource link " + name)[0]
+            linkID = result["success"]["id"]
+            # keep the index up to date, so the link is replaced when the room is configured again
+            resourceData["owner"] = self.apiKey
+            self.__resourcelinks[linkID] = resourceData
+            self.__resourcelinks_idx[name] = linkID
+            log.info("Created resource link %s with ID %s", name, linkID,
+                     extra={"room": name, "resource": "resourcelinks", "id": linkID})
+            stats = self.__limiter.stats()
+            log.info("Concurrency: current limit %s, peak limit %s, %d requests, %d errors, avg latency %.3fs",
+                     stats["limit"], stats["peakLimit"], stats["requests"], stats["errors"], stats["avgLatency"], extra={"room": name})
+            self.instrumentation.report(name)
 
             # at the end, make sure the variables are cleaned, since we committed all changes
             self.__prepare()
+        except DeadlineExceeded:
+            raise
         except:
-            print("ERROR creating object")
-            pprint.pprint(currentData)
+            log.error("Error creating object%s", ": " + pprint.pformat(currentData) if currentData else "", extra={"room": name})
             self.__prepare()
             raise
 
@@ -0,0 +1,152 @@
+'''
+Per-request instrumentation of HueBridge.
+
+Every request attempt sent to the bridge is reported as a record (dictionary) with keys
+method, resource (resource type, e.g., "rules"), path, phase, status (None if no response
+was received), error (True if the bridge reported an error or there was no response),
+latency (seconds), bytesSent and bytesReceived.
+
+Records are aggregated per phase of the deployment (refresh, delete, create, link) and
+resource type and passed to any hooks attached by the caller, e.g.:
+
+    h = HueBridge(bridge, apiKey)
+    h.instrumentation.addHook(lambda r: print(r["method"], r["path"], r["latency"]))
+
+With format "json" or "prometheus", a summary of the phases is printed at the end of each
+commit.
+'''
+import contextlib
+import json
+import sys
+import threading
+
+FORMATS = ["json", "prometheus"]
+
+class Instrumentation():
+    """
+    Collector of request records.
+
+    Phase is the current phase of the deployment, requests outside of any phase are
+    attributed to phase "other". Summary covers requests since the last emitted report.
+    Since the phase is shared by all threads, use one instance per HueBridge.
+    """
+
+    def __init__(self, format = None, out = sys.stdout, prefix = "hue_bridge"):
+        if format and not format in FORMATS:
+            raise Exception("Unknown instrumentation format '" + format + "', expected one of " + ", ".join(FORMATS))
+        self.format = format
+        self.out = out
+        self.prefix = prefix
+        self.phase = "other"
+        self.__hooks = []
+        self.__lock = threading.Lock()
+        self.__counters = {}
+
+    def addHook(self, hook):
+        """ Attach hook called with each request record """
+        self.__hooks.append(hook)
+
+    def removeHook(self, hook):
+        self.__hooks.remove(hook)
+
+    @contextlib.contextmanager
+    def inPhase(self, phase):
+        """ Attribute requests sent within the block to the phase """
+        previous = self.phase
+        self.phase = phase
+        try:
+            yield
+        finally:
+            self.phase = previous
+
+    def record(self, method, path, status, latency, bytesSent, bytesReceived, error = False):
+        """ Record a single request attempt """
+        r = {
+            "method": method,
+            "resource": path.split("/")[0] if path else "",
+            "path": path or "",
+            "phase": self.phase,
+            "status": status,
+            "error": error,
+            "latency": latency,
+            "bytesSent": bytesSent,
+            "bytesReceived": bytesReceived
+        }
+        key = (r["phase"], r["resource"], method, status, error)
+        with self.__lock:
+            c = self.__counters.get(key)
+            if not c:
+                c = self.__counters[key] = {"requests": 0, "errors": 0, "latency": 0.0, "maxLatency": 0.0, "bytesSent": 0, "bytesReceived": 0}
+            c["requests"] += 1
+            c["errors"] += 1 if error else 0
+            c["latency"] += latency
+            c["maxLatency"] = max(c["maxLatency"], latency)
+            c["bytesSent"] += bytesSent
+            c["bytesReceived"] += bytesReceived
+        for hook in self.__hooks:
+            hook(r)
+
+    def summary(self):
+        """ Return per-phase summary with breakdown by resource type """
+        with self.__lock:
+            counters = dict((k, dict(v)) for k, v in self.__counters.items())
+        phases = {}
+        for (phase, resource, method, status, error), c in sorted(counters.items(), key=lambda i: str(i[0])):
+            p = phases.setdefault(phase, Instrumentation.__empty())
+            p.setdefault("resources", {})
+            r = p["resources"].setdefault(resource, Instrumentation.__empty())
+            for s in [p, r]:
+                s["requests"] += c["requests"]
+                s["errors"] += c["errors"]
+                s["latency"] += c["latency"]
+                s["maxLatency"] = max(s["maxLatency"], c["maxLatency"])
+                s["bytesSent"] += c["bytesSent"]
+                s["bytesReceived"] += c["bytesReceived"]
+        return phases
+
+    @staticmethod
+    def __empty():
+        return {"requests": 0, "errors": 0, "latency": 0.0, "maxLatency": 0.0, "bytesSent": 0, "bytesReceived": 0}
+
+    def toJson(self, name = None):
+        return json.dumps({"room": name, "phases": self.summary()}, indent=1)
+
+    def toPrometheus(self, name = None):
+        """ Return counters in Prometheus text exposition format """
+        with self.__lock:
+            counters = sorted(self.__counters.items(), key=lambda i: str(i[0]))
+        metrics = [
+            ("requests_total", "counter", "Requests sent to the bridge", "requests"),
+            ("request_errors_total", "counter", "Requests failed with an error", "errors"),
+            ("request_seconds_sum", "counter", "Total latency of requests in seconds", "latency"),
+            ("request_seconds_max", "gauge", "Maximum latency of a request in seconds", "maxLatency"),
+            ("request_bytes_sent_total", "counter", "Bytes sent to the bridge", "bytesSent"),
+            ("request_bytes_received_total", "counter", "Bytes received from the bridge", "bytesReceived")
+        ]
+        lines = []
+        for metric, tp, help, field in metrics:
+            fullName = self.prefix + "_" + metric
+            lines.append("# HELP " + fullName + " " + help)
+            lines.append("# TYPE " + fullName + " " + tp)
+            for (phase, resource, method, status, error), c in counters:
+                labels = [("room", name), ("phase", phase), ("resource", resource), ("method", method), ("status", status),
+                          ("error", "true" if error else "false")]
+                text = ",".join(k + '="' + Instrumentation.__escape(v) + '"' for k, v in labels if v is not None)
+                lines.append(fullName + "{" + text + "} " + repr(c[field]))
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def __escape(value):
+        return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def report(self, name = None):
+        """ Emit the summary in the configured format (if any) and start a new summary """
+        if self.format == "json":
+            self.out.write(self.toJson(name) + "\n")
+        elif self.format == "prometheus":
+            self.out.write(self.toPrometheus(name))
+        self.reset()
+
+    def reset(self):
+        with self.__lock:
+            self.__counters = {}
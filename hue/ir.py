@@ -0,0 +1,199 @@
+'''
+Intermediate representation of objects generated by HueBridge.
+
+Generators produce Rule (with Condition and Action), SensorSpec, GroupSpec and SceneSpec objects,
+which are serialized to bridge JSON only at commit time. Addresses may contain references
+(see hue.references), which are resolved during serialization. Constant address strings
+are interned, since the same addresses are used by many rules.
+
+Conditions and actions are hash-consed: constructing a condition or action equal to an
+existing one returns the existing (immutable) object, so identical conditions and actions
+of all rules (also across rooms and bridges) share one object and compare by identity.
+'''
+import sys
+
+from .references import Ref, Template
+
+def _resolve(value, symbols):
+    """ Resolve value, which may be a reference, a template or (nested) JSON data """
+    tp = type(value)
+    if tp is Template or tp is Ref:
+        return value.resolve(symbols)
+    if tp is dict:
+        return {k: _resolve(v, symbols) for k, v in value.items()}
+    if tp is list:
+        return [_resolve(v, symbols) for v in value]
+    return value
+
+def _freeze(value):
+    """ Return hashable key for JSON-like value """
+    tp = type(value)
+    if tp is dict:
+        return (dict,) + tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if tp is list:
+        return (list,) + tuple(_freeze(v) for v in value)
+    if tp is bool:
+        # distinguish from 0 and 1
+        return (bool, value)
+    return value
+
+# tables of canonical conditions and actions by key (dict.setdefault keeps them canonical
+# also when generators run in several threads)
+_conditions = {}
+_actions = {}
+
+def internStats():
+    """ Return number of canonical conditions and actions """
+    return {"conditions": len(_conditions), "actions": len(_actions)}
+
+def clearInterned():
+    """ Drop the tables of canonical objects (objects in use stay valid, but are no longer shared with new ones) """
+    _conditions.clear()
+    _actions.clear()
+
+class _Immutable():
+    """ Base of hash-consed objects (equality and hash are by identity) """
+    __slots__ = ()
+
+    def __setattr__(self, name, value):
+        raise AttributeError(type(self).__name__ + " is immutable")
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+class Condition(_Immutable):
+    """ Rule condition (value is None for operators without value, such as dx) """
+    __slots__ = ("address", "operator", "value")
+
+    def __new__(cls, address, operator, value = None):
+        key = (address, operator, value if type(value) is str else _freeze(value))
+        c = _conditions.get(key)
+        if c is None:
+            c = object.__new__(cls)
+            object.__setattr__(c, "address", sys.intern(address) if type(address) is str else address)
+            object.__setattr__(c, "operator", operator)
+            object.__setattr__(c, "value", value)
+            c = _conditions.setdefault(key, c)
+        return c
+
+    def __reduce__(self):
+        return (Condition, (self.address, self.operator, self.value))
+
+    def toJson(self, symbols = None):
+        result = {"address": _resolve(self.address, symbols), "operator": self.operator}
+        if self.value is not None:
+            result["value"] = self.value
+        return result
+
+    def __repr__(self):
+        return "Condition(" + repr(self.address) + " " + self.operator + ("" if self.value is None else " " + str(self.value)) + ")"
+
+class Action(_Immutable):
+    """ Rule action (body must not be modified after construction) """
+    __slots__ = ("address", "method", "body")
+
+    def __new__(cls, address, method, body):
+        key = (address, method, _freeze(body))
+        a = _actions.get(key)
+        if a is None:
+            a = object.__new__(cls)
+            object.__setattr__(a, "address", sys.intern(address) if type(address) is str else address)
+            object.__setattr__(a, "method", method)
+            object.__setattr__(a, "body", body)
+            a = _actions.setdefault(key, a)
+        return a
+
+    def __reduce__(self):
+        return (Action, (self.address, self.method, self.body))
+
+    def toJson(self, symbols = None):
+        return {"address": _resolve(self.address, symbols), "method": self.method, "body": _resolve(self.body, symbols)}
+
+    def __repr__(self):
+        return "Action(" + self.method + " " + repr(self.address) + " " + repr(self.body) + ")"
+
+class Rule():
+    """ Rule with list of conditions and list of actions (status is omitted in JSON if None) """
+    __slots__ = ("name", "conditions", "actions", "status")
+
+    def __init__(self, name, conditions, actions, status = None):
+        self.name = name
+        self.conditions = conditions
+        self.actions = actions
+        self.status = status
+
+    def toJson(self, symbols = None):
+        result = {"name": self.name}
+        if self.status is not None:
+            result["status"] = self.status
+        result["conditions"] = [c.toJson(symbols) for c in self.conditions]
+        result["actions"] = [a.toJson(symbols) for a in self.actions]
+        return result
+
+    def __repr__(self):
+        return "Rule(" + repr(self.name) + ", " + repr(self.conditions) + ", " + repr(self.actions) + ")"
+
+class SensorSpec():
+    """ CLIP sensor to create """
+    __slots__ = ("name", "type", "modelid", "swversion", "uniqueid", "state")
+
+    def __init__(self, name, type = "CLIPGenericStatus", modelid = "GenericCLIP", swversion = "1.0", uniqueid = None, state = None):
+        self.name = name
+        self.type = type
+        self.modelid = modelid
+        self.swversion = swversion
+        self.uniqueid = uniqueid if uniqueid is not None else name
+        self.state = state if state is not None else {"status": 0}
+
+    def toJson(self, symbols = None):
+        return {
+            "state": dict(self.state),
+            "config": {
+                "on": True,
+                "reachable": True
+            },
+            "name": self.name,
+            "type": self.type,
+            "modelid": self.modelid,
+            "manufacturername": "Philips",
+            "swversion": self.swversion,
+            "uniqueid": self.uniqueid
+        }
+
+    def __repr__(self):
+        return "SensorSpec(" + repr(self.name) + ", " + self.type + ")"
+
+class GroupSpec():
+    """ Group of lights to create (LightGroup, not shown as a room in apps) """
+    __slots__ = ("name", "lights")
+
+    def __init__(self, name, lights):
+        self.name = name
+        self.lights = lights
+
+    def toJson(self, symbols = None):
+        return {"name": self.name, "lights": self.lights, "type": "LightGroup"}
+
+    def __repr__(self):
+        return "GroupSpec(" + repr(self.name) + ", " + repr(self.lights) + ")"
+
+class SceneSpec():
+    """ Scene to create for lights (light states are set after creating the scene) """
+    __slots__ = ("name", "lights", "lightstates")
+
+    def __init__(self, name, lights, lightstates = None):
+        self.name = name
+        self.lights = lights
+        self.lightstates = lightstates
+
+    def toJson(self, symbols = None):
+        result = {"name": self.name, "lights": self.lights}
+        if self.lightstates is not None:
+            result["lightstates"] = self.lightstates
+        return result
+
+    def __repr__(self):
+        return "SceneSpec(" + repr(self.name) + ", " + repr(self.lights) + ")"
@@ -0,0 +1,168 @@
+'''
+In-memory model of the subset of Hue bridge API v1 used by HueBridge.
+
+The model allocates IDs like the bridge, reports errors in the bridge format and enforces
+resource table limits, so it can be used to run configurations without a bridge.
+'''
+import copy
+import threading
+
+# default sizes of resource tables (roughly matching a Hue bridge v2)
+DEFAULT_LIMITS = {
+    "lights": 63,
+    "groups": 64,
+    "sensors": 250,
+    "rules": 250,
+    "scenes": 200,
+    "schedules": 100,
+    "resourcelinks": 64
+}
+
+# error type reported when a resource table is full
+TABLE_FULL_ERRORS = {
+    "groups": (301, "group could not be created, group table full"),
+    "sensors": (502, "sensor list is full"),
+    "rules": (601, "rule engine full"),
+    "scenes": (402, "scene could not be created, scene buffer full"),
+    "schedules": (701, "schedule list is full"),
+    "resourcelinks": (11, "resource link table full"),
+    "lights": (11, "light table full")
+}
+
+RESOURCES = ["lights", "groups", "sensors", "rules", "scenes", "schedules", "resourcelinks"]
+
+class MemoryBridge():
+    """
+    In-memory bridge.
+
+    Data is a dictionary in the format returned by GET /api/<key> (missing resource types
+    are added empty). Handle() processes a single request and returns tuple of
+    HTTP status and JSON-compatible response data.
+    """
+
+    def __init__(self, data = None, apiKey = "memory", limits = None, maxConditions = 8, maxActions = 8):
+        self.data = copy.deepcopy(data) if data else {}
+        for tp in RESOURCES:
+            if not tp in self.data:
+                self.data[tp] = {}
+        if not "config" in self.data:
+            self.data["config"] = {"name": "Memory bridge", "localtime": "2018-11-20T00:00:00"}
+        self.apiKey = apiKey
+        self.limits = dict(DEFAULT_LIMITS)
+        if limits:
+            self.limits.update(limits)
+        self.maxConditions = maxConditions
+        self.maxActions = maxActions
+        self.__nextID = {}
+        for tp in RESOURCES:
+            numeric = [int(i) for i in self.data[tp].keys() if i.isdigit()]
+            self.__nextID[tp] = max(numeric) + 1 if numeric else 1
+        self.__lock = threading.Lock()
+
+    @staticmethod
+    def error(errorType, address, description):
+        return [{"error": {"type": errorType, "address": address, "description": description}}]
+
+    def __allocateID(self, tp):
+        n = self.__nextID[tp]
+        self.__nextID[tp] = n + 1
+        if tp == "scenes":
+            # scenes have alphanumeric IDs
+            return "mem{:012x}".format(n)
+        return str(n)
+
+    def handle(self, method, path, body):
+        """ Handle request for path relative to /api/<key> and return (status, data) """
+        parts = [p for p in path.split("/") if p] if path else []
+        with self.__lock:
+            if method == "GET":
+                return self.__get(parts)
+            if not parts or not parts[0] in self.data:
+                return 404, MemoryBridge.error(4, "/" + "/".join(parts), "method, " + method + ", not available for resource, /" + "/".join(parts))
+            if method == "POST" and len(parts) == 1:
+                return self.__post(parts[0], body)
+            if method == "PUT" and len(parts) >= 2:
+                return self.__put(parts, body)
+            if method == "DELETE" and len(parts) == 2:
+                return self.__delete(parts[0], parts[1])
+            return 200, MemoryBridge.error(4, "/" + "/".join(parts), "method, " + method + ", not available for resource, /" + "/".join(parts))
+
+    def __get(self, parts):
+        obj = self.data
+        for p in parts:
+            if type(obj) is not dict or not p in obj:
+                address = "/" + "/".join(parts)
+                return 200, MemoryBridge.error(3, address, "resource, " + address + ", not available")
+            obj = obj[p]
+        return 200, copy.deepcopy(obj)
+
+    def __post(self, tp, body):
+        address = "/" + tp
+        if type(body) is not dict:
+            return 200, MemoryBridge.error(2, address, "body contains invalid json")
+        if not "name" in body and tp != "scenes":
+            return 200, MemoryBridge.error(5, address, "invalid/missing parameters in body")
+        if len(self.data[tp]) >= self.limits[tp]:
+            errorType, description = TABLE_FULL_ERRORS[tp]
+            return 200, MemoryBridge.error(errorType, address, description)
+        if tp == "rules":
+            if len(body.get("conditions", [])) > self.maxConditions:
+                return 200, MemoryBridge.error(11, address + "/conditions", "too many items in list")
+            if len(body.get("actions", [])) > self.maxActions:
+                return 200, MemoryBridge.error(11, address + "/actions", "too many items in list")
+        obj = copy.deepcopy(body)
+        if tp in ["rules", "sensors", "scenes", "schedules", "resourcelinks"]:
+            obj["owner"] = self.apiKey
+        if not "recycle" in obj:
+            obj["recycle"] = False
+        if tp == "rules":
+            obj.setdefault("status", "enabled")
+            obj["timestriggered"] = 0
+            obj["lasttriggered"] = "none"
+        elif tp == "scenes":
+            obj.setdefault("lights", [])
+            obj.setdefault("locked", False)
+            obj.setdefault("appdata", {})
+            if "group" in obj:
+                obj["lights"] = list(self.data["groups"].get(obj["group"], {}).get("lights", []))
+            if "lightstates" in obj:
+                del obj["lightstates"]
+        elif tp == "groups":
+            obj.setdefault("type", "LightGroup")
+            obj.setdefault("lights", [])
+            obj.setdefault("sensors", [])
+            obj.setdefault("state", {"all_on": False, "any_on": False})
+            obj.setdefault("action", {"on": False})
+        newID = self.__allocateID(tp)
+        self.data[tp][newID] = obj
+        return 200, [{"success": {"id": newID}}]
+
+    def __put(self, parts, body):
+        tp, rid = parts[0], parts[1]
+        address = "/" + "/".join(parts)
+        if not rid in self.data[tp]:
+            return 200, MemoryBridge.error(3, address, "resource, " + address + ", not available")
+        if type(body) is not dict:
+            return 200, MemoryBridge.error(2, address, "body contains invalid json")
+        obj = self.data[tp][rid]
+        sub = parts[2:]
+        if tp == "scenes" and len(sub) == 3 and sub[0] == "lights" and sub[2] == "state":
+            target = obj.setdefault("lightstates", {}).setdefault(sub[1], {})
+        elif sub in [["state"], ["action"], ["config"]]:
+            target = obj.setdefault(sub[0], {})
+        elif not sub:
+            target = obj
+        else:
+            return 200, MemoryBridge.error(3, address, "resource, " + address + ", not available")
+        result = []
+        for k, v in body.items():
+            target[k] = copy.deepcopy(v)
+            result.append({"success": {address + "/" + k: v}})
+        return 200, result
+
+    def __delete(self, tp, rid):
+        address = "/" + tp + "/" + rid
+        if not rid in self.data[tp]:
+            return 200, MemoryBridge.error(3, address, "resource, " + address + ", not available")
+        del self.data[tp][rid]
+        return 200, [{"success": address + " deleted"}]
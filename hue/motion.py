@@ -0,0 +1,311 @@
+'''
+Declarative state machine of motion sensor rooms.
+
+The behavior of a motion sensor room is described by a table of transitions between values of
+its state sensor (see HueBridge.__rulesForMotion for the meaning of the states). A transition
+has a set of source states, a guard (conditions on named attributes, such as presence, dark,
+any_on or contact) and actions (writes to named sensors and plain rule actions). MotionCompiler
+turns the table into rule conditions and actions and minimizes it on the way:
+   - transitions using attributes, which do not exist for the given options (e.g., contact
+     without door contact) or options which are not set (value None) are dropped
+   - transitions from states, which cannot be reached from the initial and externally written
+     states, are dropped
+   - a level-triggered transition leaving a state when a boolean attribute has a value (e.g.,
+     state 1 -> 2 on presence) implies the other value while in that state, so eq conditions
+     on it are dropped from timer-triggered (ddx) transitions from that state
+   - dx on an attribute is dropped, if the attribute never has the checked value when entering
+     the source states (then eq alone triggers the rule at the same moments)
+   - transitions with the same actions and the same guard except for complementary values of one
+     attribute or adjacent source states are merged, transitions with the same guard and source
+     states are merged by concatenating their actions
+
+Example:
+    compiler = MotionCompiler({"presence": ..., "state": ...}, {"state": ...})
+    transitions = compiler.compile(motionTable)
+    print(compiler.stats)
+'''
+import logging
+
+from .ir import Condition, Action
+
+log = logging.getLogger(__name__)
+
+# values of the state sensor
+STATES = range(-2, 4)
+
+# values of attributes used in guards (for eq conditions on other attributes nothing is assumed)
+DOMAINS = {
+    "presence": ("true", "false"),
+    "dark": ("true", "false"),
+    "any_on": ("true", "false"),
+    "contact": ("0", "1")
+}
+
+# position of conditions on source states in a guard (appended if not present)
+SOURCE = ("state", "in")
+
+# maximum number of actions of a bridge rule
+MAX_ACTIONS = 8
+
+class Transition():
+    """
+    Transition of the state machine
+
+    Guard is a list of (attribute, operator[, value]) tuples, actions is a list of (sensor, status)
+    writes and Action objects, binding is an optional tuple (binding, state, reset) passed to
+    HueBridge.__createRulesForAction (reset: actions are passed as resetstateactions).
+    """
+    __slots__ = ("name", "source", "guard", "actions", "binding")
+
+    def __init__(self, name, source, guard, actions, binding = None):
+        self.name = name
+        self.source = frozenset(source)
+        self.guard = list(guard)
+        self.actions = list(actions)
+        self.binding = binding
+
+    def target(self):
+        """ Return state written by the transition or None """
+        for a in self.actions:
+            if type(a) is tuple and a[0] == "state":
+                return a[1]
+        return None
+
+    def __repr__(self):
+        return "Transition(" + repr(self.name) + ", " + repr(sorted(self.source)) + ", " + repr(self.guard) + ", " + repr(self.actions) + ")"
+
+def _sourceConditions(source):
+    """ Return list of (operator, value) on the state for contiguous set of source states """
+    if source == frozenset(STATES):
+        return []
+    lo = min(source)
+    hi = max(source)
+    if len(source) != hi - lo + 1:
+        raise Exception("Source states " + repr(sorted(source)) + " are not contiguous")
+    if lo == hi:
+        return [("eq", str(lo))]
+    result = []
+    if lo > STATES[0]:
+        result.append(("gt", str(lo - 1)))
+    if hi < STATES[-1]:
+        result.append(("lt", str(hi + 1)))
+    return result
+
+def _contiguous(source):
+    return len(source) > 0 and len(source) == max(source) - min(source) + 1
+
+def _conditionCount(t):
+    return sum(1 for g in t.guard if g != SOURCE) + len(_sourceConditions(t.source))
+
+class MotionCompiler():
+    """
+    Compiler of transition tables into rule conditions and actions
+
+    Addresses maps attribute names used in guards to condition addresses (lastupdated of a sensor
+    is named "<sensor>.lastupdated"), resources maps sensor names used in writes to the address of
+    their state. Initial and external are states entered without a transition (at start and by
+    schedules or other rules).
+    """
+
+    def __init__(self, addresses, resources, initial = (0,), external = ()):
+        self.addresses = addresses
+        self.resources = resources
+        self.initial = frozenset(initial)
+        self.external = frozenset(external)
+        self.stats = None
+
+    def compile(self, table):
+        """
+        Minimize the transition table and return list of transitions with guard compiled to a
+        list of Condition and actions to a list of Action objects
+
+        Counts of transitions (rules before expansion of bindings) and conditions before and after
+        minimization are stored in stats.
+        """
+        table = list(table)
+        before = (len(table), sum(_conditionCount(t) for t in table))
+        table = [t for t in table if self.__available(t)]
+        table = self.__reachable(table)
+        invariants = self.__invariants(table)
+        table = [self.__dropImplied(t, invariants) for t in table]
+        table = [self.__dropEdges(t, table, invariants) for t in table]
+        table = self.__merge(table)
+        after = (len(table), sum(_conditionCount(t) for t in table))
+        self.stats = {
+            "rules": before[0],
+            "conditions": before[1],
+            "minimizedRules": after[0],
+            "minimizedConditions": after[1]
+        }
+        return [Transition(t.name, t.source, self.__conditions(t), self.__actions(t), t.binding) for t in table]
+
+    def __available(self, t):
+        """ Check that the transition only uses existing attributes and set options """
+        for g in t.guard:
+            if g == SOURCE:
+                continue
+            if not g[0] in self.addresses or (len(g) > 2 and g[2] is None):
+                return False
+        for a in t.actions:
+            if type(a) is tuple and not a[0] in self.resources:
+                return False
+        return True
+
+    def __reachable(self, table):
+        """ Drop transitions from unreachable states and restrict source states to reachable ones """
+        reached = set(self.initial | self.external)
+        changed = True
+        while changed:
+            changed = False
+            for t in table:
+                target = t.target()
+                if target is not None and not target in reached and t.source & reached:
+                    reached.add(target)
+                    changed = True
+        result = []
+        for t in table:
+            source = t.source & reached
+            if not source:
+                log.debug("Dropping unreachable transition %s", t.name)
+                continue
+            if source != t.source and _contiguous(source):
+                t = Transition(t.name, source, t.guard, t.actions, t.binding)
+            result.append(t)
+        return result
+
+    @staticmethod
+    def __levelTriggered(t):
+        return all(g == SOURCE or g[1] in ("eq", "gt", "lt") for g in t.guard)
+
+    @staticmethod
+    def __timerTriggered(t):
+        return any(g != SOURCE and g[1] == "ddx" for g in t.guard)
+
+    def __invariants(self, table):
+        """ Return dictionary of state to dictionary of attribute values holding while in the state """
+        invariants = {}
+        conflicts = set()
+        for t in table:
+            guard = [g for g in t.guard if g != SOURCE]
+            target = t.target()
+            if not MotionCompiler.__levelTriggered(t) or len(guard) != 1 or target is None or target in t.source:
+                continue
+            attribute, operator, value = guard[0]
+            domain = DOMAINS.get(attribute)
+            if operator != "eq" or domain is None or len(domain) != 2 or not value in domain:
+                continue
+            other = domain[1] if value == domain[0] else domain[0]
+            for s in t.source:
+                known = invariants.setdefault(s, {})
+                if known.get(attribute, other) != other:
+                    conflicts.add((s, attribute))
+                known[attribute] = other
+        for s, attribute in conflicts:
+            del invariants[s][attribute]
+        return invariants
+
+    @staticmethod
+    def __holds(invariants, source, attribute, value):
+        return all(invariants.get(s, {}).get(attribute) == value for s in source)
+
+    def __dropImplied(self, t, invariants):
+        """ Drop eq conditions of timer-triggered transitions implied by invariants of source states """
+        if not MotionCompiler.__timerTriggered(t):
+            return t
+        guard = [g for g in t.guard if g == SOURCE or g[1] != "eq" or not MotionCompiler.__holds(invariants, t.source, g[0], g[2])]
+        if len(guard) == len(t.guard):
+            return t
+        return Transition(t.name, t.source, guard, t.actions, t.binding)
+
+    def __entersWithout(self, t, attribute, value, invariants):
+        """ Check that attribute doesn't have value after transition t """
+        for a in t.actions:
+            if type(a) is tuple and a[0] == attribute:
+                return a[1] != value
+        for g in t.guard:
+            if g != SOURCE and g[0] == attribute and g[1] == "eq":
+                return g[2] != value
+        domain = DOMAINS.get(attribute, ())
+        return MotionCompiler.__timerTriggered(t) and any(MotionCompiler.__holds(invariants, t.source, attribute, v) for v in domain if v != value)
+
+    def __dropEdges(self, t, table, invariants):
+        """ Drop dx conditions on attributes, which never have the checked value when entering source states """
+        edges = [g for g in t.guard if g != SOURCE and g[1] == "dx"]
+        if len(edges) != 1 or t.source & (self.initial | self.external):
+            return t
+        attribute = edges[0][0]
+        values = [g[2] for g in t.guard if g != SOURCE and g[0] == attribute and g[1] == "eq"]
+        others = [g for g in t.guard if g != SOURCE and g[0] != attribute]
+        if len(values) != 1 or others:
+            return t
+        for r in table:
+            if r.target() in t.source and not self.__entersWithout(r, attribute, values[0], invariants):
+                return t
+        return Transition(t.name, t.source, [g for g in t.guard if g != edges[0]], t.actions, t.binding)
+
+    @staticmethod
+    def __mergeable(a, b):
+        """ Return merged transition or None """
+        if a.binding != b.binding:
+            return None
+        if a.guard == b.guard and a.source == b.source:
+            if a.actions == b.actions:
+                return a
+            if a.binding is None and len(a.actions) + len(b.actions) <= MAX_ACTIONS:
+                return Transition(a.name, a.source, a.guard, a.actions + b.actions)
+            return None
+        if a.actions != b.actions:
+            return None
+        if a.guard == b.guard:
+            source = a.source | b.source
+            if _contiguous(source):
+                return Transition(a.name, source, a.guard, a.actions, a.binding)
+            return None
+        if a.source != b.source or len(a.guard) != len(b.guard):
+            return None
+        diff = [(x, y) for x, y in zip(a.guard, b.guard) if x != y]
+        if len(diff) != 1:
+            return None
+        x, y = diff[0]
+        if SOURCE in (x, y) or x[0] != y[0] or x[1] != "eq" or y[1] != "eq":
+            return None
+        if set(DOMAINS.get(x[0], ())) != set([x[2], y[2]]):
+            return None
+        return Transition(a.name, a.source, [g for g in a.guard if g != x], a.actions, a.binding)
+
+    def __merge(self, table):
+        """ Merge transitions until no more transitions can be merged """
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(table)):
+                for j in range(i + 1, len(table)):
+                    t = MotionCompiler.__mergeable(table[i], table[j])
+                    if t is not None:
+                        log.debug("Merging transitions %s and %s", table[i].name, table[j].name)
+                        table = table[:i] + [t] + table[i + 1:j] + table[j + 1:]
+                        merged = True
+                        break
+                if merged:
+                    break
+        return table
+
+    def __conditions(self, t):
+        result = []
+        guard = t.guard if SOURCE in t.guard else t.guard + [SOURCE]
+        for g in guard:
+            if g == SOURCE:
+                for operator, value in _sourceConditions(t.source):
+                    result.append(Condition(address=self.addresses["state"], operator=operator, value=value))
+            else:
+                result.append(Condition(address=self.addresses[g[0]], operator=g[1], value=g[2] if len(g) > 2 else None))
+        return result
+
+    def __actions(self, t):
+        result = []
+        for a in t.actions:
+            if type(a) is tuple:
+                result.append(Action(address=self.resources[a[0]], method="PUT", body={"status": a[1]}))
+            else:
+                result.append(a)
+        return result
@@ -0,0 +1,167 @@
+'''
+Concurrent configuration of several independent bridges.
+
+Each bridge is processed in its own worker thread with its own HueBridge instance,
+so the total runtime is bounded by the slowest bridge instead of the sum of all bridges.
+'''
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+from .deadline import Deadline, DeadlineExceeded
+from .hue_bridge import HueBridge
+from .storms import checkLimits
+
+class BridgeJob():
+    """
+    Description of the work to do on a single bridge.
+
+    Rooms is a list of (config, name) tuples passed to HueBridge.configure() in order.
+    """
+
+    def __init__(self, name, bridge, apiKey, rooms):
+        self.name = name
+        self.bridge = bridge
+        self.apiKey = apiKey
+        self.rooms = rooms
+
+class CircuitBreaker():
+    """
+    Simple per-bridge circuit breaker.
+
+    After maxFailures consecutive failures the circuit opens and no further work
+    should be sent to the bridge.
+    """
+
+    def __init__(self, maxFailures):
+        self.maxFailures = maxFailures
+        self.failures = 0
+
+    def success(self):
+        self.failures = 0
+
+    def failure(self):
+        self.failures += 1
+
+    def isOpen(self):
+        return self.failures >= self.maxFailures
+
+def runBridgeJob(job, breaker = None, timeout = None, progress = None, limits = None):
+    """
+    Configure all rooms of a single bridge and return result dictionary with timing.
+
+    Without a breaker, the first failing room aborts the job. With a breaker, failing rooms
+    are recorded and processing continues until the breaker opens. If timeout (in seconds)
+    is set, it is the deadline for reading the bridge and committing all rooms, which is
+    propagated to all requests (including the initial refresh); after it expires no further
+    operations are started. Progress, if set, is called with job and a result line for each room.
+
+    If limits is set (dictionary of keyword arguments of hue.storms.checkLimits(), e.g.,
+    {"maxFirings": 50}), the rules of all rooms are checked for rule storms before anything
+    is committed and the job fails if a limit is exceeded.
+    """
+    result = {
+        "name": job.name,
+        "bridge": job.bridge,
+        "status": "ok",
+        "error": None,
+        "refreshTime": None,
+        "rooms": [],
+        "stats": None
+    }
+    report = progress if progress else lambda job, line: None
+    start = time.time()
+    deadline = Deadline.of(timeout)
+    h = None
+    room = None
+    try:
+        # the initial refresh is bounded by the deadline, too
+        h = HueBridge(job.bridge, job.apiKey, deadline=deadline)
+        result["refreshTime"] = time.time() - start
+        report(job, "refresh ok {:.2f}s".format(result["refreshTime"]))
+        if limits is not None:
+            storms = checkLimits(h, job.rooms, **limits)
+            report(job, "storm check ok, worst case {} rule firings".format(storms["worst"]["firings"] if storms["worst"] else 0))
+        for config, room in job.rooms:
+            if breaker and breaker.isOpen():
+                result["status"] = "error"
+                result["error"] = "circuit open after {} failures".format(breaker.failures)
+                result["rooms"].append({"name": room, "status": "skipped", "time": 0})
+                report(job, room + " skipped (circuit open)")
+                continue
+            if deadline and deadline.expired():
+                result["status"] = "timeout"
+                result["error"] = "timeout after {:.2f}s".format(time.time() - start)
+                result["rooms"].append({"name": room, "status": "skipped", "time": 0})
+                report(job, room + " skipped (timeout)")
+                continue
+            roomStart = time.time()
+            try:
+                h.configure(config, room, deadline)
+            except DeadlineExceeded as e:
+                result["status"] = "timeout"
+                result["error"] = "room " + room + ": " + str(e)
+                result["rooms"].append({"name": room, "status": "timeout", "time": time.time() - roomStart,
+                                        "completed": e.completed})
+                report(job, room + " timed out after {} operations".format(len(e.completed)))
+                continue
+            except Exception as e:
+                if not breaker:
+                    raise
+                breaker.failure()
+                result["status"] = "error"
+                result["error"] = "room " + room + ": " + str(e)
+                result["rooms"].append({"name": room, "status": "error", "time": time.time() - roomStart, "error": str(e)})
+                report(job, room + " failed: " + str(e))
+                continue
+            if breaker:
+                breaker.success()
+            result["rooms"].append({"name": room, "status": "ok", "time": time.time() - roomStart})
+            report(job, room + " ok {:.2f}s".format(time.time() - roomStart))
+        room = None
+    except DeadlineExceeded as e:
+        result["status"] = "timeout"
+        result["error"] = ("room " + room + ": " if room else "") + str(e)
+        report(job, "timed out: " + result["error"])
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = ("room " + room + ": " if room else "") + str(e)
+        result["traceback"] = traceback.format_exc()
+        report(job, "failed: " + result["error"])
+    if h:
+        result["stats"] = h.requestStats()
+    result["time"] = time.time() - start
+    return result
+
+def runBridgeJobs(jobs, maxWorkers = None, timeout = None):
+    """
+    Run jobs for several bridges concurrently and return a report.
+
+    The report contains per-bridge results in order of jobs, total wall time and list of failed bridges.
+    Timeout is an optional per-bridge deadline in seconds.
+    """
+    start = time.time()
+    results = []
+    if jobs:
+        with ThreadPoolExecutor(max_workers=maxWorkers or len(jobs)) as pool:
+            results = list(pool.map(lambda job: runBridgeJob(job, timeout=timeout), jobs))
+    return {
+        "bridges": results,
+        "time": time.time() - start,
+        "failed": [r["name"] for r in results if r["status"] != "ok"]
+    }
+
+def printReport(report):
+    """ Print report returned by runBridgeJobs() """
+    print("Bridge report:")
+    for r in report["bridges"]:
+        print(" - {} ({}): {} in {:.2f}s".format(r["name"], r["bridge"], r["status"], r["time"]))
+        if r["refreshTime"] is not None:
+            print("     refresh: {:.2f}s".format(r["refreshTime"]))
+        for room in r["rooms"]:
+            print("     {}: {} {:.2f}s".format(room["name"], room["status"], room["time"]))
+        if r["error"]:
+            print("     ERROR: " + r["error"])
+            if "traceback" in r:
+                print(r["traceback"])
+    print("Total time: {:.2f}s, failed bridges: {}".format(report["time"], len(report["failed"])))
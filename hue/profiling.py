@@ -0,0 +1,112 @@
+'''
+Opt-in profiling of the phases of HueBridge.plan() and commit().
+
+HueBridge wraps each configuration item of plan (e.g., "plan-03-motion") and each phase
+of commit (e.g., "commit-create-rules", "commit-references-rules", "commit-link") in
+Profiler.profile(). The profiler writes one file per room and phase into its directory:
+   - mode "cprofile" - <room>-<phase>.prof with cProfile statistics (view with pstats
+     or snakeviz); only the calling thread is profiled, so requests sent in parallel
+     by commit phases are not included
+   - mode "sampling" - <room>-<phase>.folded with sampled stacks of all threads in
+     folded format (input for flamegraph.pl or speedscope); time spent waiting for the
+     bridge shows up as stacks ending in the transport
+
+Example:
+    h = HueBridge(bridge, apiKey, profiler=Profiler("profiles", "sampling"))
+'''
+import cProfile
+import contextlib
+import os
+import re
+import sys
+import threading
+import time
+
+MODES = ["cprofile", "sampling"]
+
+class Profiler():
+    """
+    Profiler writing per-room, per-phase profile files.
+
+    Phases is an optional list of phase name prefixes to profile (default all phases),
+    interval is the sampling interval in seconds for mode "sampling".
+    """
+
+    def __init__(self, directory = ".", mode = "cprofile", phases = None, interval = 0.002):
+        if not mode in MODES:
+            raise Exception("Unknown profiler mode '" + mode + "', expected one of " + ", ".join(MODES))
+        self.directory = directory
+        self.mode = mode
+        self.phases = phases
+        self.interval = interval
+        self.files = []
+        os.makedirs(directory, exist_ok=True)
+
+    def enabled(self, phase):
+        return not self.phases or any(phase.startswith(p) for p in self.phases)
+
+    def path(self, room, phase):
+        """ Return path of the profile file for a room and phase """
+        name = re.sub("[^A-Za-z0-9_.-]+", "_", (room or "bridge") + "-" + phase)
+        return os.path.join(self.directory, name + (".prof" if self.mode == "cprofile" else ".folded"))
+
+    @contextlib.contextmanager
+    def profile(self, room, phase):
+        """ Profile the block as phase of room """
+        if not self.enabled(phase):
+            yield
+            return
+        path = self.path(room, phase)
+        if self.mode == "cprofile":
+            p = cProfile.Profile()
+            p.enable()
+            try:
+                yield
+            finally:
+                p.disable()
+                p.dump_stats(path)
+        else:
+            sampler = _Sampler(self.interval)
+            sampler.start()
+            try:
+                yield
+            finally:
+                sampler.stop()
+                sampler.write(path)
+        self.files.append(path)
+
+class _Sampler():
+    """ Background thread sampling stacks of all other threads """
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = {}
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, daemon=True)
+
+    def start(self):
+        self.__thread.start()
+
+    def stop(self):
+        self.__stop.set()
+        self.__thread.join()
+
+    def __run(self):
+        own = threading.get_ident()
+        while not self.__stop.is_set():
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame:
+                    code = frame.f_code
+                    stack.append(os.path.basename(code.co_filename) + ":" + code.co_name)
+                    frame = frame.f_back
+                key = ";".join(reversed(stack))
+                self.stacks[key] = self.stacks.get(key, 0) + 1
+            time.sleep(self.interval)
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in sorted(self.stacks.items()):
+                f.write(stack + " " + str(count) + "\n")
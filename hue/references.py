@@ -0,0 +1,119 @@
+'''
+Typed references to bridge objects, which are created or looked up only at commit time.
+
+Generators put Ref objects into rule and schedule data instead of IDs. Concatenation with
+strings builds a Template (e.g., "/sensors/" + Ref("sensor", name) + "/state"), so addresses
+are written as before, but references are parsed once at creation. At commit, all templates
+are resolved in a single pass using a SymbolTable.
+'''
+
+class Ref():
+    """
+    Reference to a bridge object by kind (sensor, group, scene, schedule) and key.
+
+    Scenes are referenced by group name and scene name, all other kinds by name.
+    """
+    __slots__ = ("kind", "key")
+
+    def __init__(self, kind, *key):
+        self.kind = kind
+        self.key = key[0] if len(key) == 1 else key
+
+    def __eq__(self, other):
+        return type(other) is Ref and self.kind == other.kind and self.key == other.key
+
+    def __hash__(self):
+        return hash((self.kind, self.key))
+
+    def __repr__(self):
+        return "${" + self.kind + ":" + (":".join(self.key) if type(self.key) is tuple else self.key) + "}"
+
+    def __add__(self, other):
+        return Template((self,)) + other
+
+    def __radd__(self, other):
+        return Template((other, self))
+
+    def __deepcopy__(self, memo):
+        # immutable
+        return self
+
+    def resolve(self, symbols):
+        return symbols.resolve(self)
+
+class Template():
+    """ String consisting of constant parts and references """
+    __slots__ = ("parts",)
+
+    def __init__(self, parts):
+        self.parts = parts
+
+    def __add__(self, other):
+        if type(other) is Template:
+            return Template(self.parts + other.parts)
+        if type(other) is str and self.parts and type(self.parts[-1]) is str:
+            # merge constant parts
+            return Template(self.parts[:-1] + (self.parts[-1] + other,))
+        return Template(self.parts + (other,))
+
+    def __radd__(self, other):
+        if type(other) is str and self.parts and type(self.parts[0]) is str:
+            return Template((other + self.parts[0],) + self.parts[1:])
+        return Template((other,) + self.parts)
+
+    def __eq__(self, other):
+        return type(other) is Template and self.parts == other.parts
+
+    def __hash__(self):
+        return hash(self.parts)
+
+    def __repr__(self):
+        return "".join(p if type(p) is str else repr(p) for p in self.parts)
+
+    def __deepcopy__(self, memo):
+        # immutable
+        return self
+
+    def resolve(self, symbols):
+        return "".join(p if type(p) is str else symbols.resolve(p) for p in self.parts)
+
+class SymbolTable():
+    """
+    Memoized mapping of references to IDs.
+
+    IDs of objects created during commit are defined explicitly, other references are
+    looked up once via resolver (function taking Ref and returning ID) and cached.
+    """
+
+    def __init__(self, resolver):
+        self.__resolver = resolver
+        self.__ids = {}
+
+    def define(self, ref, objectID):
+        self.__ids[ref] = objectID
+
+    def clear(self):
+        self.__ids = {}
+
+    def resolve(self, ref):
+        objectID = self.__ids.get(ref)
+        if objectID is None:
+            objectID = self.__ids[ref] = self.__resolver(ref)
+        return objectID
+
+def resolveAll(obj, symbols):
+    """ Replace all references and templates in nested lists and dictionaries by resolved strings """
+    if type(obj) is list:
+        for i, value in enumerate(obj):
+            tp = type(value)
+            if tp is Template or tp is Ref:
+                obj[i] = value.resolve(symbols)
+            elif tp is dict or tp is list:
+                resolveAll(value, symbols)
+    elif type(obj) is dict:
+        for k, value in obj.items():
+            tp = type(value)
+            if tp is Template or tp is Ref:
+                obj[k] = value.resolve(symbols)
+            elif tp is dict or tp is list:
+                resolveAll(value, symbols)
@@ -0,0 +1,105 @@
+'''
+Classification of bridge responses and retry with exponential backoff.
+'''
+import json
+import logging
+import random
+import time
+
+log = logging.getLogger(__name__)
+
+# Error types reported by the bridge in JSON responses, which are transient and worth
+# retrying (901 = internal error). All other error types, such as full resource tables
+# (301 group table full, 502 sensor list full, 601 rule engine full, 701 schedule list full)
+# or invalid parameters, will fail the same way on retry.
+RETRYABLE_ERRORS = set([901])
+
+# Error type of requests for a resource, which does not exist (e.g., already deleted)
+RESOURCE_NOT_AVAILABLE = 3
+
+class BridgeError(Exception):
+    """
+    Error communicating with the bridge.
+
+    Retryable errors are transient (transport errors, HTTP 5xx, bridge internal errors),
+    other errors are fatal. Error types reported by the bridge are stored in errorTypes.
+    """
+
+    def __init__(self, message, retryable = False, status = None, errorTypes = None):
+        Exception.__init__(self, message)
+        self.retryable = retryable
+        self.status = status
+        self.errorTypes = errorTypes if errorTypes is not None else []
+
+def classifyResponse(what, status, text):
+    """
+    Classify the response from the bridge.
+
+    Return parsed JSON data, if the response is successful, otherwise raise BridgeError
+    with message prefixed by what. Any error in a list of results fails the response,
+    it is retryable only if all errors are retryable.
+    """
+    if status >= 500 or status == 429:
+        raise BridgeError(what + ": HTTP status " + str(status) + ": " + text, True, status)
+    if status != 200:
+        raise BridgeError(what + ": HTTP status " + str(status) + ": " + text, False, status)
+    try:
+        data = json.loads(text)
+    except ValueError:
+        raise BridgeError(what + ": invalid response: " + text, True, status)
+    if type(data) is list:
+        errorTypes = [i["error"]["type"] for i in data if type(i) is dict and "error" in i]
+        if errorTypes:
+            retryable = all(t in RETRYABLE_ERRORS for t in errorTypes)
+            raise BridgeError(what + ": " + text, retryable, status, errorTypes)
+    return data
+
+class RetryPolicy():
+    """
+    Retry policy for requests to the bridge.
+
+    A failed request is retried up to attempts times in total, with delay growing exponentially
+    from baseDelay up to maxDelay (with full jitter). Each request including its retries must
+    finish within callDeadline seconds, each single attempt within timeout seconds.
+    """
+
+    def __init__(self, attempts = 4, baseDelay = 0.25, maxDelay = 4.0, timeout = 10.0, callDeadline = 30.0):
+        self.attempts = attempts
+        self.baseDelay = baseDelay
+        self.maxDelay = maxDelay
+        self.timeout = timeout
+        self.callDeadline = callDeadline
+
+    def delay(self, attempt):
+        """ Return jittered delay before retry number attempt (1-based) """
+        return random.uniform(0, min(self.maxDelay, self.baseDelay * (2 ** (attempt - 1))))
+
+    def call(self, send, onRetry = None, until = None):
+        """
+        Call send(timeout) with retries and return its result.
+
+        Send is expected to raise BridgeError on failure. Retryable errors are retried as long as
+        attempts and the call deadline allow it. OnRetry, if set, is called with the error and
+        time spent in the failed attempt before each retry. Until, if set, is an absolute time
+        (as returned by time.time()) further limiting the call deadline.
+        """
+        deadline = time.time() + self.callDeadline
+        if until is not None:
+            deadline = min(deadline, until)
+        attempt = 1
+        while True:
+            remaining = deadline - time.time()
+            start = time.time()
+            try:
+                return send(min(self.timeout, max(remaining, 0.001)))
+            except BridgeError as e:
+                if not e.retryable or attempt >= self.attempts:
+                    raise
+                delay = self.delay(attempt)
+                if time.time() + delay >= deadline:
+                    raise BridgeError(str(e) + " (call deadline exceeded)", False, e.status, e.errorTypes)
+                if onRetry:
+                    onRetry(e, time.time() - start)
+                log.warning("%s, retrying in %.2fs (attempt %d)", e, delay, attempt, extra={"attempt": attempt, "delay": delay})
+                time.sleep(delay)
+                attempt += 1
@@ -0,0 +1,661 @@
+'''
+Offline emulator of the rule engine of the Hue bridge.
+
+The simulator holds the state of sensors, lights, groups, scenes, schedules and rules of a
+bridge (in the format returned by GET /api/<key>), applies changes prepared by
+HueBridge.plan() like commit() would and replays a timestamped event script through the
+rules, so the behavior of generated rules can be checked before anything is sent to a bridge.
+
+Supported are:
+   - conditions eq, gt, lt, dx, ddx, stable, not stable and in/not in on /config/localtime
+   - sensor state (CLIP sensors, switches, presence and light level sensors, also aggregated
+     as /groups/<id>/presence and /groups/<id>/lightlevel for sensors assigned to a group)
+   - light state, group actions (on, bri, bri_inc, scene), group any_on and all_on
+   - scene recall and storelightstate
+   - schedules with relative (PT..., R/PT...), weekly (Wbbb/T...) and absolute times
+
+Rule engine semantics (approximation of the bridge):
+   - a rule is evaluated when an attribute used in its conditions changes; ddx and stable
+     conditions also evaluate the rule when their timer expires (the timer restarts with
+     each change of the attribute)
+   - dx is true for attributes changed by the event being processed; lastupdated of a sensor
+     changes with each update, other attributes only if their value changes
+   - ddx is true only when the rule is evaluated by its own timer, stable is true if the
+     attribute did not change for the given time
+   - time of day does not trigger rules, conditions on /config/localtime are only checked
+   - all rules triggered by an event are evaluated first, then actions of matching rules are
+     applied in rule order, each action being a new event
+   - transitions are applied immediately (transitiontime is ignored)
+
+Example:
+    h = HueBridge(bridge, apiKey)
+    sim = Simulator.fromBridge(h, [(CONFIG_WC, "Bathroom")])
+    sim.run([(0, "motion", "WC sensor", True), (30, "motion", "WC sensor", False)], until=3600)
+    print(sim.groupState("WC"), sim.firings)
+'''
+import collections
+import copy
+import datetime
+import heapq
+import logging
+import re
+
+from .hue_bridge import BUTTON_MAP
+from .references import Ref, SymbolTable, resolveAll
+
+log = logging.getLogger(__name__)
+
+# events which can be used in a script
+EVENTS = ["press", "motion", "dark", "external", "sensor", "light", "group", "put"]
+
+OPERATORS = ["eq", "gt", "lt", "dx", "ddx", "stable", "not stable", "in", "not in"]
+
+MATCH_DURATION = re.compile('^(R([0-9]*)/)?PT([0-9]+):([0-9][0-9]):([0-9][0-9])(A[0-9:]+)?$')
+MATCH_WEEKLY = re.compile('^W([0-9]+)/T([0-9][0-9]):([0-9][0-9]):([0-9][0-9])(A[0-9:]+)?$')
+MATCH_RANGE = re.compile('^(W([0-9]+)/)?T([0-9][0-9]):([0-9][0-9]):([0-9][0-9])/T([0-9][0-9]):([0-9][0-9]):([0-9][0-9])$')
+
+# tolerance for comparison of simulated times
+EPSILON = 1e-6
+
+def parseDuration(value):
+    """ Return number of seconds of duration in form PTHH:MM:SS """
+    m = MATCH_DURATION.match(value)
+    if not m:
+        raise Exception("Invalid duration '" + value + "', expected PTHH:MM:SS")
+    return int(m.group(3)) * 3600 + int(m.group(4)) * 60 + int(m.group(5))
+
+def parseValue(value):
+    """ Convert condition value to the type of the attribute (bool, int or string) """
+    if value == "true":
+        return True
+    if value == "false":
+        return False
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+def compileCondition(condition):
+    """
+    Return tuple (address, operator, value) for condition in bridge format with value converted
+    to seconds (ddx, stable), tuple (weekdays, begin, end) in seconds of day (in) or attribute type
+    """
+    address = condition["address"]
+    op = condition["operator"]
+    if not op in OPERATORS:
+        raise Exception("Unsupported operator '" + op + "'")
+    if op in ["ddx", "stable", "not stable"]:
+        value = parseDuration(condition["value"])
+    elif op in ["in", "not in"]:
+        m = MATCH_RANGE.match(condition["value"])
+        if not m:
+            raise Exception("Unsupported time range '" + condition["value"] + "'")
+        value = (int(m.group(2)) if m.group(2) else 127,
+                 int(m.group(3)) * 3600 + int(m.group(4)) * 60 + int(m.group(5)),
+                 int(m.group(6)) * 3600 + int(m.group(7)) * 60 + int(m.group(8)))
+    else:
+        value = parseValue(condition.get("value"))
+    return address, op, value
+
+class Simulator():
+    """
+    Deterministic in-process emulator of the rule engine.
+
+    Data is bridge data as returned by GET /api/<key> (it is copied). Time is simulated in
+    seconds since start (datetime of time 0, used for time of day and weekdays). Each rule
+    firing is counted in firings (by rule name) and, if record is set, appended to trace as
+    tuple (time, rule ID, rule name). More than maxCascade rule firings caused by a single
+    event are considered a rule storm and raise an exception.
+    """
+
+    def __init__(self, data, start = None, record = True, maxCascade = 1000):
+        self.data = copy.deepcopy(data)
+        for tp in ["lights", "groups", "sensors", "rules", "scenes", "schedules"]:
+            if not tp in self.data:
+                self.data[tp] = {}
+        self.start = start if start else datetime.datetime(2018, 11, 19)
+        self.now = 0.0
+        self.record = record
+        self.maxCascade = maxCascade
+        self.trace = []
+        self.rooms = {}
+        self.firings = {}
+        self.stats = {"events": 0, "firings": 0, "actions": 0, "lightCommands": 0, "groupCommands": 0, "unsupported": 0}
+        self.__values = {}
+        self.__versions = {}
+        self.__changedAt = {}
+        self.__timers = []
+        self.__seq = 0
+        self.__scheduleRuns = {}
+        self.__repeats = {}
+        self.__lookupFn = None
+        self.__symbols = SymbolTable(self.__lookup)
+        self.__nextID = {}
+        for tp in self.data.keys():
+            if type(self.data[tp]) is dict:
+                numeric = [int(i) for i in self.data[tp].keys() if i.isdigit()]
+                self.__nextID[tp] = max(numeric) + 1 if numeric else 1
+        for lightID, light in self.data["lights"].items():
+            state = light.get("state", {})
+            self.__values["/lights/" + lightID + "/state/on"] = state.get("on", False)
+            self.__values["/lights/" + lightID + "/state/bri"] = state.get("bri", 254)
+        for sensorID, sensor in self.data["sensors"].items():
+            self.__initSensor(sensorID, sensor)
+        self.__reindex()
+        for scheduleID, schedule in self.data["schedules"].items():
+            if schedule.get("status") == "enabled":
+                self.__armSchedule(scheduleID)
+
+    @staticmethod
+    def fromBridge(bridge, configs, **kwargs):
+        """
+        Return simulator for bridge data of HueBridge bridge with configurations applied.
+
+        Configs is a list of tuples (config, name), which are planned on the bridge (and discarded
+        afterwards, so nothing is sent to the bridge). Other arguments are passed to the constructor.
+        """
+        sim = Simulator(bridge.planned()["data"], **kwargs)
+        for config, name in configs:
+            bridge.plan(config, name)
+            try:
+                sim.load(bridge.planned(), name)
+            finally:
+                bridge.discard()
+        return sim
+
+    def __lookup(self, ref):
+        if not self.__lookupFn:
+            raise Exception("Cannot resolve reference " + repr(ref) + " without a plan")
+        return self.__lookupFn(ref)
+
+    def __allocateID(self, tp):
+        n = self.__nextID.get(tp, 1)
+        self.__nextID[tp] = n + 1
+        if tp == "scenes":
+            return "sim{:012x}".format(n)
+        return str(n)
+
+    def __initSensor(self, sensorID, sensor):
+        prefix = "/sensors/" + sensorID + "/state/"
+        for k, v in sensor.get("state", {}).items():
+            if k != "lastupdated":
+                self.__values[prefix + k] = v
+
+    def load(self, plan, name = None):
+        """
+        Apply changes prepared by HueBridge.plan() (as returned by HueBridge.planned()) like commit()
+
+        IDs of rules and sensors created for configuration name are stored in rooms[name].
+        """
+        self.__lookupFn = plan["lookup"]
+        data = self.data
+        created = self.rooms[name] = {"rules": [], "sensors": []}
+        for ruleID in plan["deleteRules"]:
+            data["rules"].pop(ruleID, None)
+        for scheduleID in plan["deleteSchedules"]:
+            data["schedules"].pop(scheduleID, None)
+            self.__scheduleRuns[scheduleID] = self.__scheduleRuns.get(scheduleID, 0) + 1
+        for sensorID in plan["deleteSensors"]:
+            data["sensors"].pop(sensorID, None)
+            prefix = "/sensors/" + sensorID + "/"
+            for address in [a for a in self.__values.keys() if a.startswith(prefix)]:
+                del self.__values[address]
+            # like the bridge, disable remaining rules using the deleted sensor
+            for rule in data["rules"].values():
+                if any(c["address"].startswith(prefix) for c in rule["conditions"]) or any(a["address"].startswith(prefix) for a in rule["actions"]):
+                    rule["status"] = "resourcedeleted"
+        for sceneIDs in plan["deleteScenes"].values():
+            for sceneID in sceneIDs:
+                data["scenes"].pop(sceneID, None)
+
+        extinput = plan["externalInput"]
+        if not extinput in data["sensors"]:
+            data["sensors"][extinput] = {"name": "ExternalInput", "type": "CLIPGenericStatus", "state": {"status": 1}}
+            self.__initSensor(extinput, data["sensors"][extinput])
+            if extinput.isdigit():
+                self.__nextID["sensors"] = max(self.__nextID.get("sensors", 1), int(extinput) + 1)
+
+        for spec in plan["sensors"]:
+            sensorID = self.__allocateID("sensors")
+            data["sensors"][sensorID] = spec.toJson()
+            created["sensors"].append(sensorID)
+            self.__initSensor(sensorID, data["sensors"][sensorID])
+            self.__symbols.define(Ref("sensor", spec.name), sensorID)
+        for spec in plan.get("groups", []):
+            groupID = self.__allocateID("groups")
+            data["groups"][groupID] = spec.toJson()
+            self.__symbols.define(Ref("group", spec.name), groupID)
+        for groupID, sensors in plan["groupSensors"].items():
+            data["groups"][groupID]["sensors"] = sensors
+        for groupID, specs in plan["scenes"].items():
+            groupName = data["groups"][groupID]["name"] if groupID != "0" else "All Lights"
+            for spec in specs:
+                sceneID = self.__allocateID("scenes")
+                scene = copy.deepcopy(spec.toJson())
+                scene["group"] = groupID
+                data["scenes"][sceneID] = scene
+                self.__symbols.define(Ref("scene", groupName, spec.name), sceneID)
+        for schedule in plan["schedules"]:
+            schedule = copy.deepcopy(schedule)
+            resolveAll(schedule, self.__symbols)
+            scheduleID = self.__allocateID("schedules")
+            data["schedules"][scheduleID] = schedule
+            self.__symbols.define(Ref("schedule", schedule["name"]), scheduleID)
+            if schedule.get("status") == "enabled":
+                self.__armSchedule(scheduleID)
+        for rule in plan["rules"]:
+            if type(rule) is dict:
+                rule = copy.deepcopy(rule)
+                resolveAll(rule, self.__symbols)
+            else:
+                rule = rule.toJson(self.__symbols)
+            ruleID = self.__allocateID("rules")
+            data["rules"][ruleID] = rule
+            created["rules"].append(ruleID)
+        self.__reindex()
+
+    def __reindex(self):
+        """ Compile rules and build indices after a change of bridge data """
+        data = self.data
+        self.__names = {}
+        for tp in ["lights", "groups", "sensors"]:
+            self.__names[tp] = dict((v["name"], k) for k, v in data[tp].items() if "name" in v)
+        self.__names["groups"]["All Lights"] = "0"
+
+        # groups of lights and sensors
+        self.__groupLights = {"0": list(data["lights"].keys())}
+        self.__groupSensors = {}
+        for groupID, group in data["groups"].items():
+            self.__groupLights[groupID] = group.get("lights", [])
+            sensors = [s for s in group.get("sensors", []) if s in data["sensors"]]
+            if sensors:
+                self.__groupSensors[groupID] = sensors
+        self.__lightGroups = {}
+        for groupID, lights in self.__groupLights.items():
+            for lightID in lights:
+                self.__lightGroups.setdefault(lightID, []).append(groupID)
+        self.__sensorGroups = {}
+        for groupID, sensors in self.__groupSensors.items():
+            for sensorID in sensors:
+                self.__sensorGroups.setdefault(sensorID, []).append(groupID)
+        for groupID in self.__groupLights.keys():
+            self.__updateGroup(groupID, None)
+
+        # compile enabled rules in the order of their IDs
+        ids = sorted(data["rules"].keys(), key=lambda i: (len(i), i))
+        self.__rules = []
+        self.__positions = {}
+        self.__byAddress = {}
+        self.__timed = {}
+        for ruleID in ids:
+            rule = data["rules"][ruleID]
+            if rule.get("status", "enabled") != "enabled":
+                continue
+            pos = len(self.__rules)
+            conditions = []
+            for c in rule["conditions"]:
+                try:
+                    address, op, value = compileCondition(c)
+                except Exception as e:
+                    raise Exception(str(e) + " in rule " + ruleID + " '" + rule["name"] + "'")
+                if op in ["ddx", "stable", "not stable"]:
+                    self.__timed.setdefault(address, []).append((ruleID, value))
+                conditions.append((address, op, value))
+                if address != "/config/localtime":
+                    positions = self.__byAddress.setdefault(address, [])
+                    if not positions or positions[-1] != pos:
+                        positions.append(pos)
+            actions = [(a["address"], a["method"], a.get("body", {})) for a in rule["actions"]]
+            self.__rules.append((ruleID, rule["name"], conditions, actions))
+            self.__positions[ruleID] = pos
+
+    def __push(self, time, kind, a, b = None, c = None):
+        self.__seq += 1
+        heapq.heappush(self.__timers, (time, self.__seq, kind, a, b, c))
+
+    def __changed(self, address, changed):
+        """ Register change of attribute at current time """
+        version = self.__versions.get(address, 0) + 1
+        self.__versions[address] = version
+        self.__changedAt[address] = self.now
+        changed.append(address)
+        timed = self.__timed.get(address)
+        if timed:
+            for ruleID, delay in timed:
+                self.__push(self.now + delay, "rule", ruleID, address, version)
+
+    def __set(self, address, value, changed):
+        if self.__values.get(address, None) != value or not address in self.__values:
+            self.__values[address] = value
+            if changed is not None:
+                self.__changed(address, changed)
+
+    def __updateGroup(self, groupID, changed):
+        """ Update aggregated state of group (lights on, presence and darkness of assigned sensors) """
+        on = [self.__values.get("/lights/" + l + "/state/on", False) for l in self.__groupLights[groupID]]
+        self.__set("/groups/" + groupID + "/state/any_on", any(on), changed)
+        self.__set("/groups/" + groupID + "/state/all_on", bool(on) and all(on), changed)
+        sensors = self.__groupSensors.get(groupID)
+        if sensors:
+            presence = [self.__values["/sensors/" + s + "/state/presence"] for s in sensors if "/sensors/" + s + "/state/presence" in self.__values]
+            if presence:
+                self.__set("/groups/" + groupID + "/presence/state/presence", any(presence), changed)
+            dark = [self.__values["/sensors/" + s + "/state/dark"] for s in sensors if "/sensors/" + s + "/state/dark" in self.__values]
+            if dark:
+                # dark only if all light level sensors of the group report dark
+                self.__set("/groups/" + groupID + "/lightlevel/state/dark", all(dark), changed)
+
+    def __updateSensor(self, sensorID, body, changed):
+        prefix = "/sensors/" + sensorID + "/state/"
+        for k, v in body.items():
+            self.__set(prefix + k, v, changed)
+        self.__values[prefix + "lastupdated"] = self.now
+        self.__changed(prefix + "lastupdated", changed)
+        for groupID in self.__sensorGroups.get(sensorID, []):
+            self.__updateGroup(groupID, changed)
+
+    def __updateLights(self, lights, body, changed):
+        groups = set()
+        for lightID in lights:
+            prefix = "/lights/" + lightID + "/state/"
+            for k, v in body.items():
+                if k != "transitiontime" and k != "bri_inc":
+                    self.__set(prefix + k, v, changed)
+            if "bri_inc" in body and self.__values.get(prefix + "on"):
+                bri = self.__values.get(prefix + "bri", 254) + body["bri_inc"]
+                self.__set(prefix + "bri", min(254, max(1, bri)), changed)
+            groups.update(self.__lightGroups.get(lightID, []))
+        for groupID in sorted(groups):
+            self.__updateGroup(groupID, changed)
+
+    def __recallScene(self, sceneID, changed):
+        scene = self.data["scenes"].get(sceneID)
+        if not scene:
+            log.warning("Recall of unknown scene %s at %.1fs", sceneID, self.now)
+            self.stats["unsupported"] += 1
+            return
+        lightstates = scene.get("lightstates") or {}
+        for lightID in scene.get("lights", []):
+            # without stored light state, just turn on the light
+            self.__updateLights([lightID], lightstates.get(lightID, {"on": True}), changed)
+
+    def __apply(self, address, method, body):
+        """ Apply request to the state and return list of changed attributes """
+        changed = []
+        parts = address.split("/")
+        tp = parts[1] if len(parts) > 2 else None
+        if method != "PUT":
+            tp = None
+        if tp == "sensors" and len(parts) == 4 and parts[3] == "state" and parts[2] in self.data["sensors"]:
+            self.__updateSensor(parts[2], body, changed)
+        elif tp == "lights" and len(parts) == 4 and parts[3] == "state":
+            self.__updateLights([parts[2]], body, changed)
+        elif tp == "groups" and len(parts) == 4 and parts[3] == "action" and parts[2] in self.__groupLights:
+            if "scene" in body:
+                self.__recallScene(body["scene"], changed)
+            else:
+                self.__updateLights(self.__groupLights[parts[2]], body, changed)
+        elif tp == "scenes" and len(parts) == 3 and body.get("storelightstate"):
+            scene = self.data["scenes"].get(parts[2])
+            if scene:
+                scene["lightstates"] = dict((l, {"on": self.__values.get("/lights/" + l + "/state/on", False),
+                                                 "bri": self.__values.get("/lights/" + l + "/state/bri", 254)}) for l in scene.get("lights", []))
+        elif tp == "schedules" and len(parts) == 3 and parts[2] in self.data["schedules"]:
+            schedule = self.data["schedules"][parts[2]]
+            schedule.update(body)
+            if "status" in body or "localtime" in body:
+                if schedule.get("status") == "enabled":
+                    self.__armSchedule(parts[2])
+                else:
+                    self.__scheduleRuns[parts[2]] = self.__scheduleRuns.get(parts[2], 0) + 1
+        else:
+            log.warning("Unsupported request %s %s at %.1fs", method, address, self.now)
+            self.stats["unsupported"] += 1
+        return changed
+
+    def __inTime(self, value):
+        weekdays, begin, end = value
+        t = self.start + datetime.timedelta(seconds=self.now)
+        seconds = t.hour * 3600 + t.minute * 60 + t.second
+        day = t.weekday()
+        if begin <= end:
+            inside = seconds >= begin and seconds < end
+        else:
+            inside = seconds >= begin or seconds < end
+            if seconds < end:
+                # range started on the previous day
+                day = (day + 6) % 7
+        # bit 6 is Monday, bit 0 is Sunday
+        return inside and (weekdays & (1 << (6 - day))) != 0
+
+    def __matches(self, conditions, changed, ddx):
+        values = self.__values
+        for address, op, value in conditions:
+            if op == "eq":
+                ok = values.get(address) == value
+            elif op == "gt":
+                v = values.get(address)
+                ok = v is not None and v > value
+            elif op == "lt":
+                v = values.get(address)
+                ok = v is not None and v < value
+            elif op == "dx":
+                ok = address in changed
+            elif op == "ddx":
+                ok = address == ddx
+            elif op == "stable":
+                ok = self.now - self.__changedAt.get(address, float("-inf")) >= value - EPSILON
+            elif op == "not stable":
+                ok = self.now - self.__changedAt.get(address, float("-inf")) < value - EPSILON
+            elif op == "in":
+                ok = self.__inTime(value)
+            else:
+                ok = not self.__inTime(value)
+            if not ok:
+                return False
+        return True
+
+    def __dispatch(self, changed, timer = None):
+        """ Evaluate rules triggered by changed attributes (or by timer (position, address)) and all rules triggered by their actions """
+        queue = collections.deque([(changed, timer)])
+        fired = 0
+        while queue:
+            changed, timer = queue.popleft()
+            if timer:
+                candidates = [timer[0]]
+                ddx = timer[1]
+            else:
+                positions = set()
+                for address in changed:
+                    p = self.__byAddress.get(address)
+                    if p:
+                        positions.update(p)
+                candidates = sorted(positions)
+                ddx = None
+            matched = [pos for pos in candidates if self.__matches(self.__rules[pos][2], changed, ddx)]
+            for pos in matched:
+                ruleID, name, conditions, actions = self.__rules[pos]
+                fired += 1
+                if fired > self.maxCascade:
+                    raise Exception("Rule storm: more than " + str(self.maxCascade) + " rule firings caused by a single event at " +
+                                    str(self.now) + "s, last rule " + ruleID + " '" + name + "'")
+                self.stats["firings"] += 1
+                self.firings[name] = self.firings.get(name, 0) + 1
+                if self.record:
+                    self.trace.append((self.now, ruleID, name))
+                for address, method, body in actions:
+                    self.__count(address)
+                    queue.append((self.__apply(address, method, body), None))
+
+    def __count(self, address):
+        self.stats["actions"] += 1
+        if address.startswith("/lights/"):
+            self.stats["lightCommands"] += 1
+        elif address.startswith("/groups/"):
+            self.stats["groupCommands"] += 1
+
+    def __nextScheduleTime(self, localtime):
+        """ Return simulated time of next run of schedule with localtime (or None if none) """
+        m = MATCH_DURATION.match(localtime)
+        if m:
+            return self.now + parseDuration(localtime[localtime.index("PT"):].split("A")[0])
+        m = MATCH_WEEKLY.match(localtime)
+        if m:
+            weekdays = int(m.group(1))
+            seconds = int(m.group(2)) * 3600 + int(m.group(3)) * 60 + int(m.group(4))
+            t = self.start + datetime.timedelta(seconds=self.now)
+            midnight = self.now - (t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1e6)
+            for d in range(8):
+                when = midnight + d * 86400 + seconds
+                if when > self.now + EPSILON and weekdays & (1 << (6 - (t.weekday() + d) % 7)):
+                    return when
+            return None
+        try:
+            when = (datetime.datetime.strptime(localtime, "%Y-%m-%dT%H:%M:%S") - self.start).total_seconds()
+            return when if when >= self.now else None
+        except ValueError:
+            log.warning("Unsupported schedule time '%s'", localtime)
+            self.stats["unsupported"] += 1
+            return None
+
+    def __armSchedule(self, scheduleID):
+        run = self.__scheduleRuns.get(scheduleID, 0) + 1
+        self.__scheduleRuns[scheduleID] = run
+        localtime = self.data["schedules"][scheduleID].get("localtime", "")
+        m = MATCH_DURATION.match(localtime)
+        if m and m.group(1) and m.group(2):
+            self.__repeats[scheduleID] = int(m.group(2))
+        when = self.__nextScheduleTime(localtime)
+        if when is not None:
+            self.__push(when, "schedule", scheduleID, run)
+
+    def __runSchedule(self, scheduleID):
+        schedule = self.data["schedules"][scheduleID]
+        command = schedule["command"]
+        # strip /api/<key>
+        address = "/" + command["address"].split("/", 3)[3]
+        self.__count(address)
+        self.__dispatch(self.__apply(address, command["method"], command.get("body", {})))
+        localtime = schedule.get("localtime", "")
+        m = MATCH_DURATION.match(localtime)
+        if (m and m.group(1)) or MATCH_WEEKLY.match(localtime):
+            repeats = self.__repeats.get(scheduleID)
+            if repeats is None or repeats > 1:
+                if repeats:
+                    self.__repeats[scheduleID] = repeats - 1
+                when = self.__nextScheduleTime(localtime)
+                if when is not None:
+                    self.__push(when, "schedule", scheduleID, self.__scheduleRuns[scheduleID])
+                return
+        schedule["status"] = "disabled"
+        if schedule.get("autodelete", True):
+            del self.data["schedules"][scheduleID]
+
+    def advance(self, until):
+        """ Advance simulated time to until (seconds since start), firing expired timers and schedules """
+        while self.__timers and self.__timers[0][0] <= until:
+            time, seq, kind, a, b, c = heapq.heappop(self.__timers)
+            self.now = max(self.now, time)
+            if kind == "rule":
+                pos = self.__positions.get(a)
+                if pos is not None and self.__versions.get(b) == c:
+                    self.__dispatch([], (pos, b))
+            elif a in self.data["schedules"] and self.__scheduleRuns.get(a) == b:
+                self.__runSchedule(a)
+        self.now = max(self.now, until)
+
+    def run(self, script, until = None):
+        """
+        Replay event script and advance time to until (if set).
+
+        Script is an iterable of tuples (time, event, arguments...) sorted by time in seconds
+        since start, where event is a name of one of the event methods (see EVENTS), e.g.,
+        (60, "press", "Kitchen switch", "on").
+        """
+        for item in script:
+            time, event = item[0], item[1]
+            if not event in EVENTS:
+                raise Exception("Unknown event '" + str(event) + "', expected one of " + ", ".join(EVENTS))
+            if time < self.now:
+                raise Exception("Event " + repr(item) + " is out of order, current time is " + str(self.now))
+            self.advance(time)
+            getattr(self, event)(*item[2:])
+        if until is not None:
+            self.advance(until)
+
+    def find(self, tp, name):
+        """ Return ID of light, group or sensor (tp lights, groups, sensors) by name """
+        objectID = self.__names[tp].get(name)
+        if objectID is None:
+            raise Exception("Object '" + name + "' not found in " + tp)
+        return objectID
+
+    def put(self, address, body):
+        """ Send PUT request to address (as the app or a sensor would do) and process triggered rules """
+        self.stats["events"] += 1
+        self.__dispatch(self.__apply(address, "PUT", body))
+
+    def press(self, name, button):
+        """ Press button (name from BUTTON_MAP or button event code) on switch """
+        self.put("/sensors/" + self.find("sensors", name) + "/state", {"buttonevent": int(BUTTON_MAP.get(button, button))})
+
+    def motion(self, name, presence = True):
+        """ Report presence from motion sensor """
+        self.put("/sensors/" + self.find("sensors", name) + "/state", {"presence": presence})
+
+    def lightLevelSensor(self, name):
+        """ Return ID of light level sensor belonging to motion sensor name """
+        sensorID = self.find("sensors", name)
+        address = self.data["sensors"][sensorID].get("uniqueid", "")[0:24]
+        for key, s in self.data["sensors"].items():
+            if s.get("type") == "ZLLLightLevel" and s.get("uniqueid", "")[0:24] == address:
+                return key
+        raise Exception("Light level sensor for '" + name + "' not found")
+
+    def dark(self, name, dark = True):
+        """ Report darkness from light level sensor belonging to motion sensor name """
+        self.put("/sensors/" + self.lightLevelSensor(name) + "/state", {"dark": dark, "daylight": not dark})
+
+    def external(self, value):
+        """ Set external input to value """
+        self.put("/sensors/" + self.find("sensors", "ExternalInput") + "/state", {"status": int(value)})
+
+    def sensor(self, name, state):
+        """ Update state of sensor """
+        self.put("/sensors/" + self.find("sensors", name) + "/state", state)
+
+    def light(self, name, state):
+        """ Set state of light (as the app would do) """
+        self.put("/lights/" + self.find("lights", name) + "/state", state)
+
+    def group(self, name, action):
+        """ Send action to group (as the app would do) """
+        self.put("/groups/" + self.find("groups", name) + "/action", action)
+
+    def value(self, address):
+        """ Return current value of attribute (e.g., /sensors/5/state/status) """
+        return self.__values.get(address)
+
+    def values(self):
+        """ Return dictionary of all attributes and their current values """
+        return dict(self.__values)
+
+    def groupLights(self):
+        """ Return dictionary of group ID to list of light IDs (including group 0 with all lights) """
+        return dict((g, list(l)) for g, l in self.__groupLights.items())
+
+    def groupSensors(self):
+        """ Return dictionary of group ID to list of sensor IDs assigned to the group """
+        return dict((g, list(s)) for g, s in self.__groupSensors.items())
+
+    def lightState(self, name):
+        lightID = self.find("lights", name)
+        return {"on": self.__values.get("/lights/" + lightID + "/state/on"), "bri": self.__values.get("/lights/" + lightID + "/state/bri")}
+
+    def groupState(self, name):
+        groupID = self.find("groups", name)
+        return {"any_on": self.__values.get("/groups/" + groupID + "/state/any_on"), "all_on": self.__values.get("/groups/" + groupID + "/state/all_on")}
+
+    def sensorState(self, name):
+        prefix = "/sensors/" + self.find("sensors", name) + "/state/"
+        return dict((a[len(prefix):], v) for a, v in self.__values.items() if a.startswith(prefix))
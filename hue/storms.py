@@ -0,0 +1,733 @@
+'''
+Static detection of rule storms and feedback loops.
+
+Rules are connected in a trigger graph: an edge leads from rule A to rule B if an action of A
+changes attributes, which can make B fire (B has a condition on a changed attribute, all its
+eq/gt/lt conditions on changed attributes accept the written value and all its dx conditions
+are changed by the same action). Edges to rules firing by their ddx or stable timers and edges
+through schedules enabled by an action are delayed, all others are immediate. Attributes not
+written by any rule (e.g., presence of a motion sensor) do not change during an immediate
+cascade, so there is no immediate edge between rules with contradicting conditions on them.
+
+Cycles of immediate edges are rule storms (rules re-triggering each other without end), cycles
+with a delayed edge are feedback loops (rules re-triggering each other by timers). For each
+input event (an external change of an attribute used in a condition, e.g., a button press,
+motion or a change of ExternalInput) the worst-case number of rule firings and light commands
+of the immediate cascade is computed as upper bound over all paths through the graph. Values
+written by scenes, bri_inc and group aggregates are unknown, so these are assumed to match any
+condition.
+
+Example:
+    h = HueBridge(bridge, apiKey)
+    report = analyze(h, [(CONFIG_WC, "Bathroom"), (CONFIG_KITCHEN, "Kitchen")])
+    print(report["storms"], report["worst"])
+'''
+import logging
+import sys
+
+from .simulator import Simulator, compileCondition
+
+log = logging.getLogger(__name__)
+
+# costs of a cascade: rule firings, rule evaluations (rules with a condition on a changed attribute),
+# actions, light commands (to lights and groups), group broadcasts (group actions without scene),
+# scene recalls, unicast light commands and light updates (commands weighted by the number of lights
+# of the group or scene)
+COSTS = ["firings", "evaluations", "actions", "commands", "groupCommands", "sceneRecalls", "lightCommands", "lightUpdates"]
+
+# default limits of group broadcasts and scene recalls and of light updates of a single binding
+MAX_BROADCASTS = 2
+MAX_LIGHT_UPDATES = 24
+
+# value of an attribute written by an action, which is not known statically
+ANY = object()
+
+class StormLimitExceeded(Exception):
+    """
+    Raised by checkLimits() if the rules may cause a storm or too many rule firings or light commands.
+
+    Report is the report of the analysis (see TriggerGraph.report()).
+    """
+
+    def __init__(self, message, report = None):
+        Exception.__init__(self, message)
+        self.report = report
+
+def _accepts(op, expected, value):
+    """ Return False if condition (op, expected) cannot be true for written value """
+    if value is ANY:
+        return True
+    try:
+        if op == "eq":
+            return value == expected
+        if op == "gt":
+            return value > expected
+        if op == "lt":
+            return value < expected
+    except TypeError:
+        pass
+    return True
+
+def _compatible(a, b):
+    """ Return False if conditions a and b (operator, value) on the same attribute cannot be true at once """
+    (opA, valueA), (opB, valueB) = sorted([a, b], key=lambda c: ["eq", "gt", "lt"].index(c[0]))
+    try:
+        if opA == "eq":
+            return _accepts(opB, valueB, valueA)
+        if opA == "gt" and opB == "lt":
+            return valueA < valueB
+    except TypeError:
+        pass
+    return True
+
+def _overlap(a, b):
+    """ Return False if time ranges a and b (weekdays, begin, end) do not overlap in time of day """
+    intervals = lambda begin, end: [(begin, end)] if begin <= end else [(begin, 86400), (0, end)]
+    return any(x[0] < y[1] and y[0] < x[1] for x in intervals(a[1], a[2]) for y in intervals(b[1], b[2]))
+
+def _commandKind(address, body):
+    """ Return kind of light command of request to address ("light", "group", "scene" or None) """
+    if address.startswith("/lights/"):
+        return "light"
+    if address.startswith("/groups/"):
+        return "scene" if "scene" in body else "group"
+    return None
+
+def _stronglyConnected(nodes, successors):
+    """ Return list of strongly connected components (lists of nodes) of graph (Tarjan's algorithm, iterative) """
+    index = {}
+    low = {}
+    onStack = set()
+    stack = []
+    components = []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        work = [(root, iter(successors(root)))]
+        index[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        onStack.add(root)
+        while work:
+            node, it = work[-1]
+            descended = False
+            for succ in it:
+                if not succ in index:
+                    index[succ] = low[succ] = counter
+                    counter += 1
+                    stack.append(succ)
+                    onStack.add(succ)
+                    work.append((succ, iter(successors(succ))))
+                    descended = True
+                    break
+                if succ in onStack:
+                    low[node] = min(low[node], index[succ])
+            if descended:
+                continue
+            work.pop()
+            if work:
+                low[work[-1][0]] = min(low[work[-1][0]], low[node])
+            if low[node] == index[node]:
+                component = []
+                while True:
+                    n = stack.pop()
+                    onStack.discard(n)
+                    component.append(n)
+                    if n == node:
+                        break
+                components.append(component)
+    return components
+
+class TriggerGraph():
+    """
+    Trigger graph of the enabled rules of bridge data (in the format returned by GET /api/<key>).
+
+    GroupLights and groupSensors are dictionaries of group ID to lists of light and sensor IDs
+    (as returned by Simulator.groupLights() and Simulator.groupSensors()).
+    """
+
+    def __init__(self, data, groupLights, groupSensors = None):
+        self.data = data
+        self.__groupLights = groupLights
+        self.__lightGroups = {}
+        for groupID, lights in groupLights.items():
+            for lightID in lights:
+                self.__lightGroups.setdefault(lightID, []).append(groupID)
+        self.__sensorGroups = {}
+        for groupID, sensors in (groupSensors or {}).items():
+            for sensorID in sensors:
+                self.__sensorGroups.setdefault(sensorID, []).append(groupID)
+
+        # compile enabled rules in the order of their IDs
+        self.rules = []
+        self.__byAddress = {}
+        for ruleID in sorted(data["rules"].keys(), key=lambda i: (len(i), i)):
+            rule = data["rules"][ruleID]
+            if rule.get("status", "enabled") != "enabled":
+                continue
+            pos = len(self.rules)
+            conditions = [compileCondition(c) for c in rule["conditions"]]
+            for address in set(a for a, op, v in conditions if a != "/config/localtime"):
+                self.__byAddress.setdefault(address, []).append(pos)
+            actions = [self.__compileAction(a["address"], a["method"], a.get("body", {})) for a in rule["actions"]]
+            self.rules.append((ruleID, rule["name"], conditions, actions))
+
+        # conditions on attributes, which are constant during an immediate cascade
+        written = set()
+        for ruleID, name, conditions, actions in self.rules:
+            for writes, delayed, kind in actions:
+                written.update(writes.keys())
+        self.__constant = [dict((address, (op, value)) for address, op, value in conditions
+                                if op in ["eq", "gt", "lt"] and not address in written)
+                           for ruleID, name, conditions, actions in self.rules]
+
+        # edges (successor position -> [immediate, delayed] count of actions triggering it),
+        # immediate successors per action and costs of the firing of each rule
+        self.__edges = []
+        self.__successors = []
+        self.__costs = []
+        for source, (ruleID, name, conditions, actions) in enumerate(self.rules):
+            edges = {}
+            successors = []
+            costs = [1, 0, len(actions), 0, 0, 0, 0, 0]
+            for (writes, delayed, kind), action in zip(actions, data["rules"][ruleID]["actions"]):
+                if not delayed:
+                    costs[1] += len(self.__candidates(writes))
+                    costs[3] += 1 if kind else 0
+                    costs[4] += 1 if kind == "group" else 0
+                    costs[5] += 1 if kind == "scene" else 0
+                    costs[6] += 1 if kind == "light" else 0
+                    costs[7] += self.__lightCount(action["address"], action.get("body", {})) if kind else 0
+                immediate = []
+                for pos, kind in self.__triggered(writes, delayed):
+                    if kind == 0:
+                        if not self.__consistent(source, pos):
+                            continue
+                        immediate.append(pos)
+                    edges.setdefault(pos, [0, 0])[kind] += 1
+                successors.append(immediate)
+            self.__edges.append(edges)
+            self.__successors.append(successors)
+            self.__costs.append(costs)
+        self.__exclusiveCache = {}
+
+    @staticmethod
+    def fromSimulator(sim):
+        """ Return trigger graph of rules loaded in Simulator sim """
+        return TriggerGraph(sim.data, sim.groupLights(), sim.groupSensors())
+
+    def __lightWrites(self, lights, body, writes):
+        groups = set()
+        for lightID in lights:
+            prefix = "/lights/" + lightID + "/state/"
+            for k, v in body.items():
+                if k == "bri_inc":
+                    writes[prefix + "bri"] = ANY
+                elif k != "transitiontime":
+                    writes[prefix + k] = v
+            groups.update(self.__lightGroups.get(lightID, []))
+        for groupID in groups:
+            writes["/groups/" + groupID + "/state/any_on"] = ANY
+            writes["/groups/" + groupID + "/state/all_on"] = ANY
+
+    def __writes(self, address, method, body):
+        """ Return dictionary of attributes changed by request to value (or ANY) """
+        writes = {}
+        parts = address.split("/")
+        tp = parts[1] if len(parts) > 2 and method == "PUT" else None
+        if tp == "sensors" and len(parts) == 4 and parts[3] == "state":
+            prefix = "/sensors/" + parts[2] + "/state/"
+            for k, v in body.items():
+                writes[prefix + k] = v
+            writes[prefix + "lastupdated"] = ANY
+            for groupID in self.__sensorGroups.get(parts[2], []):
+                if "presence" in body:
+                    writes["/groups/" + groupID + "/presence/state/presence"] = ANY
+                if "dark" in body:
+                    writes["/groups/" + groupID + "/lightlevel/state/dark"] = ANY
+        elif tp == "lights" and len(parts) == 4 and parts[3] == "state":
+            self.__lightWrites([parts[2]], body, writes)
+        elif tp == "groups" and len(parts) == 4 and parts[3] == "action" and parts[2] in self.__groupLights:
+            if "scene" in body:
+                scene = self.data["scenes"].get(body["scene"], {})
+                self.__lightWrites(scene.get("lights", []), {"on": ANY, "bri": ANY}, writes)
+            else:
+                self.__lightWrites(self.__groupLights[parts[2]], body, writes)
+                if "on" in body:
+                    # the whole group is switched
+                    writes["/groups/" + parts[2] + "/state/any_on"] = body["on"]
+                    writes["/groups/" + parts[2] + "/state/all_on"] = body["on"]
+        return writes
+
+    def __lightCount(self, address, body):
+        """ Return number of lights addressed by light command to address """
+        parts = address.split("/")
+        if parts[1] == "lights":
+            return 1
+        if "scene" in body:
+            return len(self.data["scenes"].get(body["scene"], {}).get("lights", []))
+        return len(self.__groupLights.get(parts[2], []))
+
+    def __compileAction(self, address, method, body):
+        """
+        Return tuple (writes, delayed, kind) of action.
+
+        Kind is "light", "group" or "scene" for light commands, None otherwise. Actions enabling
+        a schedule are delayed and return writes and kind of the command of the schedule.
+        """
+        parts = address.split("/")
+        if method == "PUT" and len(parts) == 3 and parts[1] == "schedules" and body.get("status") == "enabled":
+            schedule = self.data["schedules"].get(parts[2])
+            if not schedule:
+                return {}, False, None
+            command = schedule["command"]
+            # strip /api/<key>
+            target = "/" + command["address"].split("/", 3)[3]
+            return self.__writes(target, command["method"], command.get("body", {})), True, _commandKind(target, command.get("body", {}))
+        return self.__writes(address, method, body), False, _commandKind(address, body)
+
+    def __consistent(self, a, b):
+        """ Return False if rules at positions a and b contradict on a constant attribute """
+        constant = self.__constant[b]
+        for address, condition in self.__constant[a].items():
+            if address in constant and not _compatible(condition, constant[address]):
+                return False
+        return True
+
+    def __candidates(self, writes):
+        """ Return set of positions of rules evaluated after writes """
+        candidates = set()
+        for address in writes.keys():
+            candidates.update(self.__byAddress.get(address, ()))
+        return candidates
+
+    def __triggered(self, writes, delayed = False):
+        """ Return list of (rule position, 0 for immediate or 1 for delayed) of rules which can fire after writes """
+        result = []
+        for pos in sorted(self.__candidates(writes)):
+            conditions = self.rules[pos][2]
+            dx = set()
+            timed = False
+            ddx = False
+            accepted = True
+            for address, op, value in conditions:
+                if op == "dx":
+                    dx.add(address)
+                elif op == "ddx":
+                    ddx = True
+                if address in writes:
+                    if op in ["ddx", "stable"]:
+                        timed = True
+                    elif not _accepts(op, value, writes[address]):
+                        accepted = False
+                        break
+            if not accepted:
+                continue
+            if ddx or timed:
+                # fires only by its timer, when no attribute is changed
+                if timed and not dx:
+                    result.append((pos, 1))
+            elif dx.issubset(writes.keys()):
+                result.append((pos, 1 if delayed else 0))
+        return result
+
+    def inputs(self):
+        """ Return dictionary of input address to attributes changed by an external change of it """
+        inputs = {}
+        for ruleID, name, conditions, actions in self.rules:
+            for address, op, value in conditions:
+                if address in inputs or address == "/config/localtime":
+                    continue
+                parts = address.split("/")
+                if len(parts) != 5 or parts[3] != "state":
+                    # group aggregates change with their sensors
+                    continue
+                key = parts[4]
+                if parts[1] == "sensors":
+                    body = {} if key == "lastupdated" else {key: ANY}
+                    inputs[address] = self.__writes("/sensors/" + parts[2] + "/state", "PUT", body)
+                elif parts[1] == "lights":
+                    inputs[address] = self.__writes("/lights/" + parts[2] + "/state", "PUT", {key: ANY})
+                elif parts[1] == "groups" and parts[2] in self.__groupLights:
+                    inputs[address] = self.__writes("/groups/" + parts[2] + "/action", "PUT", {"on": ANY})
+        # lastupdated changes with each other attribute of the sensor
+        for address in [a for a in inputs.keys() if a.endswith("/lastupdated")]:
+            prefix = address[:-len("lastupdated")]
+            if any(a != address and a.startswith(prefix) for a in inputs.keys()):
+                del inputs[address]
+        return inputs
+
+    def inputValues(self, address):
+        """ Return list of values of input address distinguished by conditions (or [ANY]) """
+        values = []
+        for pos in self.__byAddress.get(address, ()):
+            for a, op, value in self.rules[pos][2]:
+                if a != address or not op in ["eq", "gt", "lt"]:
+                    continue
+                if op != "eq":
+                    if type(value) is not int:
+                        return [ANY]
+                    value = value + 1 if op == "gt" else value - 1
+                if not any(type(v) is type(value) and v == value for v in values):
+                    values.append(value)
+        return values if values else [ANY]
+
+    def __inputWrites(self, address, writes):
+        """ Return list of (value, writes) for distinguished values of input address """
+        result = []
+        for value in self.inputValues(address) if address.startswith("/sensors/") else [ANY]:
+            if value is not ANY:
+                writes = dict(writes)
+                writes[address] = value
+            result.append((value, writes))
+        return result
+
+    def __cycles(self, immediate):
+        """ Return list of cyclic components (lists of rule positions) of immediate or all edges """
+        if immediate:
+            successors = lambda pos: [s for s, (i, d) in self.__edges[pos].items() if i]
+        else:
+            successors = lambda pos: list(self.__edges[pos].keys())
+        result = []
+        for component in _stronglyConnected(range(len(self.rules)), successors):
+            if len(component) > 1 or component[0] in successors(component[0]):
+                result.append(sorted(component))
+        return result
+
+    def __reachable(self, start, immediate, excluded = ()):
+        seen = set(start)
+        todo = list(start)
+        while todo:
+            pos = todo.pop()
+            for succ, (i, d) in self.__edges[pos].items():
+                if (i or not immediate) and not succ in seen and not succ in excluded:
+                    seen.add(succ)
+                    todo.append(succ)
+        return seen
+
+    def worstCase(self, writes):
+        """
+        Return tuple (firings, light commands) of the immediate cascade after writes (upper bound).
+
+        Returns (None, None) if a rule storm is reachable.
+        """
+        costs = self.cascadeCosts(writes)
+        if costs is None:
+            return None, None
+        return costs["firings"], costs["commands"]
+
+    def cascadeCosts(self, writes):
+        """
+        Return dictionary of COSTS of the immediate cascade after writes (upper bounds) or None if a rule storm is reachable.
+
+        Rules triggered by the same change are evaluated in the same state, so of rules with
+        contradicting conditions (e.g., on the same state sensor or time of day) only one is counted.
+        """
+        # rules contradicting the input on an attribute, which is constant during the cascade
+        excluded = set(pos for pos, constant in enumerate(self.__constant)
+                       if any(a in writes and not _accepts(op, value, writes[a]) for a, (op, value) in constant.items()))
+        direct = [pos for pos, kind in self.__triggered(writes) if kind == 0 and not pos in excluded]
+        result = self.__cascade(direct, excluded)
+        if result is not None:
+            result["evaluations"] += len(self.__candidates(writes))
+        return result
+
+    def ruleCosts(self, pos):
+        """
+        Return dictionary of COSTS of a firing of the rule at position pos including its immediate cascade
+        (upper bounds) or None if a rule storm is reachable. Used for rules firing by their timers.
+        """
+        return self.__cascade([pos], ())
+
+    def __cascade(self, direct, excluded):
+        """ Return dictionary of COSTS of firing rules at positions direct and their immediate cascade or None """
+        reachable = self.__reachable(direct, True, excluded)
+        counts = dict((pos, 0) for pos in reachable)
+        for pos in direct:
+            counts[pos] += 1
+        # topological order of the cascade (Kahn's algorithm)
+        indegree = dict((pos, 0) for pos in reachable)
+        for pos in reachable:
+            for succ, (i, d) in self.__edges[pos].items():
+                if i and succ in reachable:
+                    indegree[succ] += 1
+        ready = [pos for pos, n in indegree.items() if n == 0]
+        order = []
+        while ready:
+            pos = ready.pop()
+            order.append(pos)
+            for succ, (i, d) in self.__edges[pos].items():
+                if i and succ in reachable:
+                    indegree[succ] -= 1
+                    if indegree[succ] == 0:
+                        ready.append(succ)
+        if len(order) < len(reachable):
+            return None
+        # worst case of each rule firing including the cascade caused by it
+        worst = {}
+        for pos in reversed(order):
+            costs = list(self.__costs[pos])
+            for successors in self.__successors[pos]:
+                successors = [s for s in successors if s in reachable]
+                for k in range(len(COSTS)):
+                    costs[k] += self.__bound(successors, lambda s: worst[s][k])
+            worst[pos] = costs
+        result = {}
+        for k, name in enumerate(COSTS):
+            result[name] = self.__bound(direct, lambda s: worst[s][k])
+        return result
+
+    def __exclusive(self, a, b):
+        """ Return True if rules at positions a and b cannot match in the same state """
+        key = (a, b) if a < b else (b, a)
+        result = self.__exclusiveCache.get(key)
+        if result is None:
+            result = False
+            conditions = self.rules[b][2]
+            for address, op, value in self.rules[a][2]:
+                for addressB, opB, valueB in conditions:
+                    if address != addressB:
+                        continue
+                    if op in ["eq", "gt", "lt"] and opB in ["eq", "gt", "lt"]:
+                        result = result or not _compatible((op, value), (opB, valueB))
+                    elif op in ["in", "not in"] and opB in ["in", "not in"]:
+                        if op != opB:
+                            result = result or value == valueB
+                        elif op == "in":
+                            result = result or not _overlap(value, valueB)
+            self.__exclusiveCache[key] = result
+        return result
+
+    def __bound(self, rules, weight):
+        """
+        Return upper bound of the total weight of rules (positions), which can match in the same state.
+
+        Rules are partitioned into sets of mutually exclusive rules, of which only one can match.
+        """
+        cliques = []
+        for pos in sorted(rules, key=weight, reverse=True):
+            for clique in cliques:
+                if all(self.__exclusive(pos, other) for other in clique):
+                    clique.append(pos)
+                    break
+            else:
+                cliques.append([pos])
+        return sum(weight(clique[0]) for clique in cliques)
+
+    def report(self, rules = None):
+        """
+        Return report of the analysis.
+
+        If rules (list of rule IDs) is given, only cycles including one of the rules and inputs
+        triggering one of the rules are reported.
+
+        Report is a dictionary with:
+           - rules, edges - number of enabled rules and edges of the trigger graph
+           - storms - cycles of immediate edges reachable from an input (lists of rule names)
+           - loops - other reachable cycles including delayed edges (lists of rule names)
+           - inputs - list of dictionaries with address, value (None for any value), firings and commands
+             (None if a storm is reachable) of the worst value per input, sorted by firings (worst first)
+           - worst - entry of inputs with most firings
+        """
+        selected = set(pos for pos, rule in enumerate(self.rules) if rules is None or rule[0] in rules)
+        inputs = []
+        reachable = set()
+        for address, writes in sorted(self.inputs().items()):
+            direct = [pos for pos, kind in self.__triggered(writes)]
+            if not direct:
+                continue
+            seen = self.__reachable(direct, False)
+            reachable.update(seen)
+            if not seen & selected:
+                continue
+            worst = None
+            for value, writes in self.__inputWrites(address, writes):
+                firings, commands = self.worstCase(writes)
+                if worst is None or worst["firings"] is not None and (firings is None or firings > worst["firings"]):
+                    worst = {"address": address, "value": None if value is ANY else value, "firings": firings, "commands": commands}
+            inputs.append(worst)
+        inputs.sort(key=lambda i: (i["firings"] is not None, -(i["firings"] or 0), i["address"]))
+
+        names = lambda component: [self.rules[pos][1] for pos in component]
+        storms = [c for c in self.__cycles(True) if c[0] in reachable and selected.intersection(c)]
+        stormRules = set(pos for c in storms for pos in c)
+        loops = [c for c in self.__cycles(False) if c[0] in reachable and selected.intersection(c) and not stormRules.issuperset(c)]
+        return {
+            "rules": len(self.rules),
+            "edges": sum(len(e) for e in self.__edges),
+            "storms": [names(c) for c in storms],
+            "loops": [names(c) for c in loops],
+            "inputs": inputs,
+            "worst": inputs[0] if inputs else None
+        }
+
+    def fanOut(self, rooms = None):
+        """
+        Return list of fan-out costs of an update of each input address, hottest first.
+
+        Rooms is a dictionary of room name to dictionary with list of rule IDs under "rules"
+        (as Simulator.rooms) to attribute rules to rooms, other rules are attributed to "other".
+
+        Each entry is a dictionary with:
+           - address, name - input address and name of its sensor or group
+           - rules - number of rules with a condition on the address
+           - rooms - dictionary of room name to number of these rules
+           - COSTS (firings, evaluations, actions, commands, groupCommands, sceneRecalls, lightCommands,
+             lightUpdates) - upper bounds of the cascade of an update (worst value per cost, None if a
+             storm is reachable)
+        """
+        roomOf = {}
+        for room, created in (rooms or {}).items():
+            for ruleID in created["rules"]:
+                roomOf[ruleID] = room
+        result = []
+        for address, writes in self.inputs().items():
+            parts = address.split("/")
+            entry = {
+                "address": address,
+                "name": self.data[parts[1]].get(parts[2], {}).get("name"),
+                "rules": len(self.__byAddress.get(address, ())),
+                "rooms": {}
+            }
+            for pos in self.__byAddress.get(address, ()):
+                room = roomOf.get(self.rules[pos][0], "other")
+                entry["rooms"][room] = entry["rooms"].get(room, 0) + 1
+            for name in COSTS:
+                entry[name] = 0
+            for value, w in self.__inputWrites(address, writes):
+                costs = self.cascadeCosts(w)
+                for name in COSTS:
+                    if entry[name] is not None:
+                        entry[name] = None if costs is None else max(entry[name], costs[name])
+            result.append(entry)
+        result.sort(key=lambda e: (e["evaluations"] is not None, -(e["evaluations"] or 0), -e["rules"], e["address"]))
+        return result
+
+    def bindingLoads(self, rooms = None, maxBroadcasts = MAX_BROADCASTS, maxUpdates = MAX_LIGHT_UPDATES):
+        """
+        Return list of light command loads of each binding, heaviest first.
+
+        Bindings are the distinguished values of input addresses (e.g., a button of a switch, an ID
+        written to ExternalInput or presence of a motion sensor) and rules firing by their ddx or stable
+        timers (e.g., dimming or turning off lights of a motion sensor room). Rooms is used as in fanOut().
+
+        Each entry is a dictionary with:
+           - binding - name of the sensor, light or group and the value or name of the timer rule
+           - address, value - input address and value (None for timer rules and any value)
+           - rooms - sorted list of rooms of the rules fired directly by the binding
+           - groupCommands, sceneRecalls, lightCommands - group broadcasts, scene recalls and unicast light
+             commands of the immediate cascade (including redirects via ExternalInput)
+           - lightUpdates - light commands weighted by the number of lights of groups and scenes
+           - dense - True if there are more than maxBroadcasts group broadcasts and scene recalls, more
+             than maxUpdates light updates or a rule storm is reachable (all costs None)
+        """
+        roomOf = {}
+        for room, created in (rooms or {}).items():
+            for ruleID in created["rules"]:
+                roomOf[ruleID] = room
+        def entry(binding, address, value, direct, costs):
+            result = {
+                "binding": binding,
+                "address": address,
+                "value": value,
+                "rooms": sorted(set(roomOf.get(self.rules[pos][0], "other") for pos in direct))
+            }
+            for name in ["groupCommands", "sceneRecalls", "lightCommands", "lightUpdates"]:
+                result[name] = None if costs is None else costs[name]
+            result["dense"] = costs is None or costs["groupCommands"] + costs["sceneRecalls"] > maxBroadcasts or \
+                costs["lightUpdates"] > maxUpdates
+            return result
+
+        result = []
+        for address, writes in sorted(self.inputs().items()):
+            parts = address.split("/")
+            name = self.data[parts[1]].get(parts[2], {}).get("name") or address
+            for value, w in self.__inputWrites(address, writes):
+                direct = [pos for pos, kind in self.__triggered(w) if kind == 0]
+                if not direct:
+                    continue
+                value = None if value is ANY else value
+                binding = name + " " + parts[4] + ("" if value is None else "=" + str(value))
+                result.append(entry(binding, address, value, direct, self.cascadeCosts(w)))
+        for pos, (ruleID, name, conditions, actions) in enumerate(self.rules):
+            if any(op in ["ddx", "stable"] for address, op, value in conditions):
+                result.append(entry(name, None, None, [pos], self.ruleCosts(pos)))
+        result.sort(key=lambda e: (e["lightUpdates"] is not None, -(e["lightUpdates"] or 0), e["binding"]))
+        return result
+
+def analyze(bridge, configs, rules = None):
+    """
+    Return report of the trigger graph of rules after planning configs (list of (config, name)) on HueBridge bridge.
+
+    Nothing is sent to the bridge. See TriggerGraph.report() for rules and the report.
+    """
+    sim = Simulator.fromBridge(bridge, configs, record=False)
+    return TriggerGraph.fromSimulator(sim).report(rules)
+
+def checkLimits(bridge, configs, maxFirings = None, maxCommands = None, allowLoops = True):
+    """
+    Raise StormLimitExceeded if the rules after planning configs on HueBridge bridge may cause a rule storm,
+    more than maxFirings rule firings or more than maxCommands light commands for a single input event
+    or (if not allowLoops) contain a feedback loop. Returns the report otherwise.
+    """
+    report = analyze(bridge, configs)
+    problems = []
+    for storm in report["storms"]:
+        problems.append("rule storm: " + " -> ".join(storm))
+    if not allowLoops:
+        for loop in report["loops"]:
+            problems.append("feedback loop: " + " -> ".join(loop))
+    for i in report["inputs"]:
+        if i["firings"] is None:
+            continue
+        if maxFirings is not None and i["firings"] > maxFirings:
+            problems.append("{} rule firings for {} (limit {})".format(i["firings"], i["address"], maxFirings))
+        if maxCommands is not None and i["commands"] > maxCommands:
+            problems.append("{} light commands for {} (limit {})".format(i["commands"], i["address"], maxCommands))
+    if problems:
+        raise StormLimitExceeded("Rule storm limits exceeded:" + "".join("\n - " + p for p in problems), report)
+    log.info("Trigger graph of %d rules: worst case %s", report["rules"], report["worst"])
+    return report
+
+def hotAddresses(bridge, configs = None):
+    """
+    Return fan-out costs (see TriggerGraph.fanOut()) of the rules of HueBridge bridge after planning configs
+    (list of (config, name), if any) without sending anything to the bridge.
+    """
+    sim = Simulator.fromBridge(bridge, configs or [], record=False)
+    return TriggerGraph.fromSimulator(sim).fanOut(sim.rooms)
+
+def printHotAddresses(costs, out = sys.stdout, limit = 20):
+    """ Print the first limit entries of fan-out costs returned by hotAddresses() as a table """
+    out.write("{:<36} {:<28} {:>5} {:>5} {:>5} {:>5} {:>5} {:>5}  {}\n".format(
+        "address", "name", "rules", "eval", "fire", "act", "group", "scene", "rooms"))
+    for e in costs[:limit]:
+        value = lambda name: "-" if e[name] is None else str(e[name])
+        out.write("{:<36} {:<28} {:>5} {:>5} {:>5} {:>5} {:>5} {:>5}  {}\n".format(
+            e["address"], (e["name"] or "")[:28], e["rules"], value("evaluations"), value("firings"), value("actions"),
+            value("groupCommands"), value("sceneRecalls"), ", ".join(r + ":" + str(n) for r, n in sorted(e["rooms"].items()))))
+
+def bindingLoads(bridge, configs = None, maxBroadcasts = MAX_BROADCASTS, maxUpdates = MAX_LIGHT_UPDATES):
+    """
+    Return light command loads (see TriggerGraph.bindingLoads()) of the bindings of HueBridge bridge after
+    planning configs (list of (config, name), if any) without sending anything to the bridge. Dense
+    bindings are logged as warnings.
+    """
+    sim = Simulator.fromBridge(bridge, configs or [], record=False)
+    loads = TriggerGraph.fromSimulator(sim).bindingLoads(sim.rooms, maxBroadcasts, maxUpdates)
+    for e in loads:
+        if e["dense"]:
+            log.warning("Dense binding %s: %s group broadcasts, %s scene recalls, %s light updates", e["binding"],
+                e["groupCommands"], e["sceneRecalls"], e["lightUpdates"])
+    return loads
+
+def printBindingLoads(loads, out = sys.stdout, limit = 20):
+    """ Print the first limit entries of light command loads returned by bindingLoads() as a table """
+    out.write("{:<44} {:>5} {:>5} {:>5} {:>6}  {:<5} {}\n".format(
+        "binding", "group", "scene", "light", "update", "dense", "rooms"))
+    for e in loads[:limit]:
+        value = lambda name: "-" if e[name] is None else str(e[name])
+        out.write("{:<44} {:>5} {:>5} {:>5} {:>6}  {:<5} {}\n".format(
+            e["binding"][:44], value("groupCommands"), value("sceneRecalls"), value("lightCommands"),
+            value("lightUpdates"), "yes" if e["dense"] else "", ", ".join(e["rooms"])))
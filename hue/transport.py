@@ -0,0 +1,135 @@
+'''
+Transports carrying requests from HueBridge to a bridge.
+
+A transport sends a request for a path relative to /api/<key> with a JSON body (already
+serialized) and returns tuple of HTTP status and response text. Three implementations
+are provided:
+   - HttpTransport - live bridge via HTTP (requires requests)
+   - MemoryTransport - in-memory bridge model, e.g., for benchmarks without a bridge
+   - CassetteTransport - records interactions of another transport and replays them
+'''
+import json
+import threading
+
+try:
+    import requests
+    from urllib3.exceptions import ConnectTimeoutError
+except ImportError:
+    requests = None
+
+from .memory_bridge import MemoryBridge
+
+class TransportError(Exception):
+    """ Request could not be sent or response could not be received (the bridge might have processed it) """
+    pass
+
+class TransportTimeout(TransportError):
+    """ Request was sent, but the response did not arrive in time (the bridge might have processed it) """
+    pass
+
+class TransportConnectError(TransportError):
+    """ Connection to the bridge could not be established, so the request was not sent """
+    pass
+
+class Transport():
+    """ Interface of a transport """
+
+    def request(self, method, path, data, timeout):
+        """ Send request with serialized body data (or None) and return (status, text) """
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+class HttpTransport(Transport):
+    """ Transport to a live bridge via HTTP """
+
+    def __init__(self, bridge, apiKey, poolSize = 4):
+        if not requests:
+            raise Exception("HTTP transport requires the requests package")
+        self.urlbase = "http://" + bridge + "/api/" + apiKey
+        # single session for all requests to reuse the connection(s) to the bridge
+        self.__session = requests.Session()
+        self.__session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=poolSize))
+
+    def request(self, method, path, data, timeout):
+        url = self.urlbase + "/" + path if path else self.urlbase
+        headers = {"Content-Type": "application/json"} if data is not None else None
+        try:
+            tmp = self.__session.request(method, url, data=data, headers=headers, timeout=timeout)
+        except requests.exceptions.ConnectTimeout as e:
+            raise TransportConnectError(str(e))
+        except requests.exceptions.ReadTimeout as e:
+            raise TransportTimeout(str(e))
+        except requests.exceptions.ConnectionError as e:
+            # failures connecting are wrapped in MaxRetryError (reason NewConnectionError, a subclass
+            # of ConnectTimeoutError), others (e.g., "Connection aborted" on a reused connection)
+            # may happen after the request was sent
+            reason = getattr(e.args[0], "reason", None) if e.args else None
+            if isinstance(reason, ConnectTimeoutError):
+                raise TransportConnectError(str(e))
+            raise TransportError(str(e))
+        except requests.exceptions.RequestException as e:
+            raise TransportError(str(e))
+        tmp.encoding = 'utf-8'
+        return tmp.status_code, tmp.text
+
+    def close(self):
+        self.__session.close()
+
+class MemoryTransport(Transport):
+    """ Transport to an in-memory bridge (see MemoryBridge) """
+
+    def __init__(self, bridge = None):
+        self.bridge = bridge if bridge else MemoryBridge()
+
+    def request(self, method, path, data, timeout):
+        body = json.loads(data) if data is not None else None
+        status, result = self.bridge.handle(method, path, body)
+        return status, json.dumps(result)
+
+class CassetteTransport(Transport):
+    """
+    Transport recording or replaying interactions stored in a JSON cassette file.
+
+    In record mode (transport given), all requests are forwarded to the transport and
+    interactions are written to the file on close(). In replay mode (no transport), responses
+    are served from the file. Since requests may be sent in parallel, responses are matched
+    by method, path and body and replayed in recorded order for identical requests.
+    """
+
+    def __init__(self, path, transport = None):
+        self.path = path
+        self.transport = transport
+        self.__lock = threading.Lock()
+        self.__interactions = []
+        self.__replay = {}
+        if not transport:
+            with open(path, "r", encoding="utf-8") as f:
+                for i in json.loads(f.read()):
+                    key = CassetteTransport.__key(i["method"], i["path"], i["body"])
+                    self.__replay.setdefault(key, []).append(i)
+
+    @staticmethod
+    def __key(method, path, data):
+        body = json.dumps(json.loads(data), sort_keys=True) if data is not None else None
+        return (method, path or "", body)
+
+    def request(self, method, path, data, timeout):
+        if self.transport:
+            status, text = self.transport.request(method, path, data, timeout)
+            with self.__lock:
+                self.__interactions.append({"method": method, "path": path or "", "body": data, "status": status, "text": text})
+            return status, text
+        key = CassetteTransport.__key(method, path, data)
+        with self.__lock:
+            if not key in self.__replay or not self.__replay[key]:
+                raise TransportError("No recorded interaction for " + method + " " + (path or "") + " in " + self.path)
+            i = self.__replay[key].pop(0)
+        return i["status"], i["text"]
+
+    def close(self):
+        if self.transport:
+            with open(self.path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(self.__interactions, indent=1))
+            self.transport.close()
@@ -7,12 +7,21 @@ The main function expects to find 'settings.json' in current directory with an o
 with the following attributes:
    - apiKey - string with API key under which to create rules
    - bridge - string with IP address of the bridge
+   - apiKey2/bridge2, apiKey3/bridge3, ... - API keys and addresses of further bridges
+     (rooms for each bridge are listed in BRIDGE_ROOMS, bridges are configured concurrently)
    - otherKeys - array of strings with other keys which should not be reported as foreign
      (e.g., other apps used to set up rules)
+   - deadline - optional time budget in seconds for configuring each bridge; when it runs out,
+     no further changes are sent and the program exits with status 2
+   - logLevel - optional log level (default WARNING), INFO lists created and deleted objects,
+     DEBUG also dumps bridge data and generated rules
 '''
 
 from hue import HueBridge
+from hue.orchestrator import BridgeJob, runBridgeJobs, printReport
 import json
+import logging
+import sys
 
 # Configuration for living room
 CONFIG_LR = [
@@ -924,46 +933,55 @@ CONFIG_TEST = [
 # Boot rule configuration to turn off lights on boot
 CONFIG_BOOT = [ { "type": "boot" } ]
 
+# Rooms to configure on individual bridges. Key is the suffix of "bridge" and "apiKey"
+# attributes in settings.json ("" for "bridge"/"apiKey", "2" for "bridge2"/"apiKey2", etc.).
+BRIDGE_ROOMS = {
+    "": [
+        (CONFIG_LR, "Wohnzimmer"),
+        (CONFIG_KITCHEN, "Küche"),
+        (CONFIG_DINING, "Esszimmer"),
+        (CONFIG_AZ, "Arbeitszimmer"),
+        (CONFIG_WC, "Gäste-WC"),
+        (CONFIG_HWEGUG, "Flure"),
+        (CONFIG_HWR, "HWR"),
+        (CONFIG_BASEMENT, "Keller"),
+        #(CONFIG_TEST, "Test"),    # not yet working correctly
+        #(CONFIG_BOOT, "Boot"),    # not yet working correctly
+    ],
+    # Example with second bridge to control further rooms
+    "2": [
+        (CONFIG_HWOG, "Gallerie"),
+        (CONFIG_B, "Schlafzimmer"),
+        (CONFIG_KIND1, "Julia"),
+        (CONFIG_KIND2, "Katarina"),
+        (CONFIG_BAD, "Badezimmer")
+    ]
+}
+
 if __name__ == '__main__':
     # load the bridge and key configuration from settings.json
     config = {}
     with open("settings.json", "r") as configFile:
         config = json.loads(configFile.read())
+    logging.basicConfig(level=config.get("logLevel", "WARNING"), format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 
-    h = HueBridge(config["bridge"], config["apiKey"])
-
-    # run configuration on individual resources/rooms
-    h.configure(CONFIG_LR, "Wohnzimmer")
-    h.configure(CONFIG_KITCHEN, "Küche")
-    h.configure(CONFIG_DINING, "Esszimmer")
-    h.configure(CONFIG_AZ, "Arbeitszimmer")
-    h.configure(CONFIG_WC, "Gäste-WC")
-    h.configure(CONFIG_HWEGUG, "Flure")
-    h.configure(CONFIG_HWR, "HWR")
-    h.configure(CONFIG_BASEMENT, "Keller")
-    #h.configure(CONFIG_TEST, "Test")    # not yet working correctly
-    #h.configure(CONFIG_BOOT, "Boot")    # not yet working correctly
+    # configure all bridges present in settings concurrently
+    jobs = []
+    for suffix, rooms in BRIDGE_ROOMS.items():
+        if "bridge" + suffix in config:
+            jobs.append(BridgeJob("bridge" + suffix, config["bridge" + suffix], config["apiKey" + suffix], rooms))
+    report = runBridgeJobs(jobs, timeout=config.get("deadline"))
+    printReport(report)
 
-    # refresh configuration from the bridge and report any foreign rules
-    #h.refresh()
+    # Maintenance on a single bridge: refresh configuration from the bridge and report any foreign rules
+    #h = HueBridge(config["bridge"], config["apiKey"])
     #h.findForeignData(config["otherKeys"])
     #h.fixLightScenes(False) # fix light scenes to be normal group scenes where possible (except wakeup and co)
     #h.fixSceneAppData(False) # fix appdata of scenes (if passed True) to properly display in the app
     #h.findUnusedLightScenes(False) # find (and delete, if passed True) scenes, which are not used anymore
     #h.listAll()
 
-    if "bridge2" in config:
-        # Example with second bridge to control further rooms
-        print("Processing second bridge")
-        h = HueBridge(config["bridge2"], config["apiKey2"])
-        h.configure(CONFIG_HWOG, "Gallerie")
-        h.configure(CONFIG_B, "Schlafzimmer")
-        h.configure(CONFIG_KIND1, "Julia")
-        h.configure(CONFIG_KIND2, "Katarina")
-        h.configure(CONFIG_BAD, "Badezimmer")
-        #h.refresh()
-        #h.findForeignData(config["otherKeys"])
-        #h.fixLightScenes(False) # fix light scenes to be normal group scenes where possible (except wakeup and co)
-        #h.fixSceneAppData(False) # fix appdata of scenes (if passed True) to properly display in the app
-        #h.findUnusedLightScenes(False) # find (and delete, if passed True) scenes, which are not used anymore
-        #h.listAll()
+    if any(r["status"] == "timeout" for r in report["bridges"]):
+        sys.exit(2)
+    if report["failed"]:
+        sys.exit(1)